@@ -18,6 +18,17 @@ DATABASES = {'default':
                   'PASSWORD': env('DATABASE_PASS'),
                   }
              }
+# Second connection to the same database, on which display ids are reserved in transactions of their own: the
+# sequences are not locked until the end of the transactions creating entities.
+DATABASES['sequences'] = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+
+# Shared by all the worker processes.
+CACHES['entities'] = {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': env('ENTITY_CACHE_DIR', default='/var/tmp/pywikibase/entities'),
+    'TIMEOUT': 24 * 60 * 60,
+    'OPTIONS': {'MAX_ENTRIES': 100000},
+}
 
 SECURE_SSL_REDIRECT = True
 SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
@@ -0,0 +1,220 @@
+from __future__ import annotations
+
+import json
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+from django.core.exceptions import ValidationError
+
+from pecunia.bulk import EntityBulkWriter, EntitySpec, StatementSpec, SnakSpec, DEFAULT_BATCH_SIZE
+from pecunia.models import Value, Item, Property, PropertySnak, Statement, Document, MonolingualTextValue, \
+    StringValue, UrlValue, QuantityValue, TimeValue, GlobeCoordinatesValue, ItemMapping
+
+SNAK_TYPES = {'value': PropertySnak.Type.VALUE, 'somevalue': PropertySnak.Type.SOME_VALUE,
+              'novalue': PropertySnak.Type.NO_VALUE}
+
+
+def json_to_value(type_name: str, value: dict) -> Value:
+    """
+    Builds a data value from its JSON form, as sent by the editors. The value is not saved.
+    :param type_name: the class name of the value
+    :raise ValueError: if the type is not a data value type
+    """
+    if type_name == 'MonolingualTextValue':
+        return MonolingualTextValue(language=value['language'], text=value['value'])
+    if type_name == 'StringValue':
+        return StringValue(value=value['value'])
+    if type_name == 'UrlValue':
+        return UrlValue(value=value['value'])
+    if type_name == 'QuantityValue':
+        return QuantityValue(number=value['number'])
+    if type_name == 'TimeValue':
+        return TimeValue(time=value['time'], timezone=0, precision=value['precision'], after=0, before=0,
+                         calendar_model=ItemMapping.get('person'))
+    if type_name == 'GlobeCoordinatesValue':
+        return GlobeCoordinatesValue(latitude=value['latitude'], longitude=value['longitude'], precision='0.0000001',
+                                     globe=ItemMapping.get('earth'))
+    raise ValueError(f"unknown value type '{type_name}'")
+
+
+@dataclass
+class _Snak:
+    property: int
+    type: int
+    datatype: str | None = None
+    # The JSON form of a data value, or the token id of an item.
+    value: dict | str | None = None
+
+
+@dataclass
+class _Statement:
+    mainsnak: _Snak
+    qualifiers: list[_Snak] = field(default_factory=list)
+    references: list[list[_Snak]] = field(default_factory=list)
+
+
+@dataclass
+class _Schema:
+    token: str
+    terms: list[tuple[str, str, str]] = field(default_factory=list)
+    statements: list[_Statement] = field(default_factory=list)
+
+
+@dataclass
+class _Plan:
+    document: int
+    new_items: list[str]
+    linked_items: dict[str, int]
+    schemas: list[_Schema]
+
+    def snaks(self):
+        for schema in self.schemas:
+            for statement in schema.statements:
+                yield statement.mainsnak
+                yield from statement.qualifiers
+                for reference in statement.references:
+                    yield from reference
+
+
+class AnnotationIngestion:
+    """
+    Writes the items, terms and statements tagged in a document with the annotator, in stages:
+    - parse: the payload is decoded and checked, without querying the database;
+    - resolve: the document, the properties and the linked items are loaded, with one query each;
+    - build: the entities to write are described as entity specs (see pecunia.bulk);
+    - write: the specs are written by EntityBulkWriter, which reserves the display ids of the new items in one block
+      and inserts each table in bulk.
+    Nothing is written if any stage fails. The time spent in each stage is kept in timings, in milliseconds.
+    """
+
+    def __init__(self, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.writer = EntityBulkWriter(batch_size)
+        self.timings: dict[str, float] = {}
+
+    def ingest(self, body: str | bytes) -> dict[str, int]:
+        """
+        :param body: the JSON payload sent by the annotator
+        :raise ValidationError: if the payload is malformed or refers to unknown entities
+        :return: the display ids of the new items, by token id
+        """
+        with self._stage('parse'):
+            plan = self.parse(body)
+        with self._stage('resolve'):
+            properties, items = self.resolve(plan)
+        with self._stage('build'):
+            specs = self.build(plan, properties, items)
+        with self._stage('write'):
+            # Linked items are only written if something is added to them.
+            self.writer.write([spec for spec in {id(spec): spec for spec in specs.values()}.values()
+                               if spec.entity.pk is None or spec.labels or spec.descriptions or spec.aliases
+                               or spec.statements])
+        return {token: specs[token].entity.display_id for token in plan.new_items}
+
+    @contextmanager
+    def _stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = round((time.perf_counter() - start) * 1000, 3)
+
+    def parse(self, body: str | bytes) -> _Plan:
+        try:
+            data = json.loads(body)
+            reconciliations = data['reconciliations']
+            plan = _Plan(
+                document=int(data['document']),
+                new_items=[new_item['tokenId'] for new_item in reconciliations['newItems']],
+                linked_items={linked['token']['tokenId']: int(linked['qid'])
+                              for linked in reconciliations['linkedItems']},
+                schemas=[self._parse_schema(schema) for schema in data['schemas']],
+            )
+        except (ValueError, KeyError, TypeError) as e:
+            raise ValidationError(f"malformed annotation payload: {e!r}")
+
+        tokens = set(plan.new_items) | set(plan.linked_items)
+        unknown = {schema.token for schema in plan.schemas} | {snak.value for snak in plan.snaks()
+                                                               if snak.datatype == 'Item'}
+        unknown -= tokens
+        if unknown:
+            raise ValidationError(f"tokens neither created nor linked: {', '.join(sorted(map(str, unknown)))}")
+        return plan
+
+    def _parse_schema(self, schema: dict) -> _Schema:
+        return _Schema(
+            token=schema['token']['tokenId'],
+            terms=[(term['type'], term['langCode'], term['value']) for term in schema['terms']],
+            statements=[
+                _Statement(
+                    mainsnak=self._parse_snak(json_statement['property'], snak['mainSnak']),
+                    qualifiers=[self._parse_snak(qualifier['property'], qualifier['snak'])
+                                for qualifier in snak['qualifiers']],
+                    references=[[self._parse_snak(reference['property'], reference['snak'])
+                                 for reference in record] for record in snak['referenceRecords']],
+                )
+                for json_statement in schema['statements'] for snak in json_statement['statements']
+            ],
+        )
+
+    @staticmethod
+    def _parse_snak(prop: int | str, snak: dict) -> _Snak:
+        snak_type = SNAK_TYPES.get(snak['snakType'], PropertySnak.Type.VALUE)
+        if snak_type != PropertySnak.Type.VALUE:
+            return _Snak(int(prop), snak_type)
+        if snak['type'] == 'Item':
+            return _Snak(int(prop), snak_type, 'Item', snak['value']['item']['tokenId'])
+        return _Snak(int(prop), snak_type, snak['type'], snak['value'])
+
+    @staticmethod
+    def resolve(plan: _Plan) -> tuple[dict[int, Property], dict[int, Item]]:
+        """
+        :return: the properties and the linked items used by the plan, by display id
+        """
+        if not Document.objects.filter(display_id=plan.document).exists():
+            raise ValidationError(f"unknown document {plan.document}")
+        property_ids = {snak.property for snak in plan.snaks()}
+        item_ids = set(plan.linked_items.values())
+        properties = Property.objects.select_related('data_type').in_bulk(property_ids, field_name='display_id')
+        items = Item.objects.in_bulk(item_ids, field_name='display_id')
+        errors = [f"unknown property P{pid}" for pid in sorted(property_ids - set(properties))]
+        errors += [f"unknown item Q{qid}" for qid in sorted(item_ids - set(items))]
+        if errors:
+            raise ValidationError(errors)
+        return properties, items
+
+    @staticmethod
+    def build(plan: _Plan, properties: dict[int, Property], items: dict[int, Item]) -> dict[str, EntitySpec]:
+        """
+        :return: the entity specs to write, by token id; tokens linked to the same item share their spec
+        """
+        specs = {token: EntitySpec(entity=Item()) for token in plan.new_items}
+        by_item = {}
+        for token, qid in plan.linked_items.items():
+            specs[token] = by_item.setdefault(qid, EntitySpec(entity=items[qid]))
+
+        def build_snak(snak: _Snak) -> SnakSpec:
+            if snak.type != PropertySnak.Type.VALUE:
+                return SnakSpec(properties[snak.property], type=snak.type)
+            if snak.datatype == 'Item':
+                return SnakSpec(properties[snak.property], specs[snak.value])
+            try:
+                return SnakSpec(properties[snak.property], json_to_value(snak.datatype, snak.value))
+            except (ValueError, KeyError, TypeError) as e:
+                raise ValidationError(f"malformed {snak.datatype} value: {e!r}")
+
+        for schema in plan.schemas:
+            spec = specs[schema.token]
+            for term_type, language, text in schema.terms:
+                if term_type == 'label':
+                    spec.labels[language] = text
+                elif term_type == 'description':
+                    spec.descriptions[language] = text
+                elif term_type == 'alias':
+                    spec.aliases.setdefault(language, []).append(text)
+            spec.statements += [StatementSpec(build_snak(statement.mainsnak), Statement.Rank.NORMAL,
+                                              [build_snak(qualifier) for qualifier in statement.qualifiers],
+                                              [[build_snak(snak) for snak in record]
+                                               for record in statement.references])
+                                for statement in schema.statements]
+        return specs
@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import threading
+import time
+from bisect import bisect_left, insort
+from dataclasses import dataclass, field
+from typing import Iterable
+
+from pecunia.models import Sequence, TermIndex, TermChange, normalize_term, term_tokens
+from pecunia.usage import EntityRef
+
+DEFAULT_LIMIT = 10
+# Seconds during which the index is used without checking the version of the terms.
+REFRESH_INTERVAL = 2.0
+# Number of keys read at most for a query, so that short prefixes are answered as fast as long ones.
+MAX_SCANNED_KEYS = 2000
+# Number of changed entities beyond which the index is reloaded rather than updated entity by entity.
+MAX_CHANGED_ENTITIES = 5000
+KINDS = {'Q': 'item', 'P': 'property'}
+
+
+@dataclass
+class EntityTerms:
+    """
+    The terms of an entity kept in memory: labels and aliases, normalized for the index, and the labels and
+    descriptions to display.
+    """
+    ref: EntityRef
+    # (normalized text, language, type, text) of each label and alias
+    terms: list[tuple[str, str, int, str]] = field(default_factory=list)
+    labels: dict[str, str] = field(default_factory=dict)
+    descriptions: dict[str, str] = field(default_factory=dict)
+
+    def keys(self, pk: int) -> Iterable[tuple[str, int, int]]:
+        """
+        :return: the keys of the entity in the index: each term from each of its words, with the term number
+        """
+        for n, (text, *_ignored) in enumerate(self.terms):
+            start = 0
+            for token in term_tokens(text):
+                start = text.index(token, start)
+                yield text[start:], pk, n
+                start += len(token)
+
+
+@dataclass
+class AutocompleteMatch:
+    ref: EntityRef
+    label: str | None
+    description: str | None
+    match_type: str
+    match_language: str
+    match_text: str
+
+
+class AutocompleteIndex:
+    """
+    Process-local prefix index over the labels and aliases of items and properties, for search-as-you-type without
+    querying the database.
+    Each term is indexed from each of its words, normalized (see normalize_term), in one sorted list of keys per kind of
+    entity: the keys starting with a prefix form a contiguous slice of it, found by binary search.
+    The index is loaded from TermIndex on first use. Afterwards, the version of the terms is checked at most every
+    refresh_interval seconds, and the entities changed since the version of the index are reloaded from the change
+    log (see TermChange). Changes committed by the current process are seen at once (see expire()).
+    """
+
+    def __init__(self, refresh_interval: float = REFRESH_INTERVAL):
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self) -> None:
+        """
+        Drops the index, which is loaded again on next use.
+        """
+        self._version = None
+        self._checked = 0.0
+        self._keys: dict[str, list[tuple[str, int, int]]] = {kind: [] for kind in KINDS.values()}
+        self._entities: dict[int, EntityTerms] = {}
+
+    def expire(self) -> None:
+        """
+        Makes the next search check the version of the terms.
+        """
+        self._checked = 0.0
+
+    def search(self, query: str, kind: str = 'item', language: str | None = None,
+               limit: int = DEFAULT_LIMIT) -> list[AutocompleteMatch]:
+        """
+        Ranks the entities whose terms match the query: the whole term, then a prefix of it, then a prefix of one of
+        its words; labels before aliases; shorter terms first.
+        :param kind: 'item' or 'property'
+        :param language: the language of the terms to search and of the labels and descriptions to return, all
+        languages and the labels and descriptions in the matching language if None
+        :return: the best matches, best first
+        """
+        prefix = normalize_term(query)
+        if not prefix:
+            return []
+        with self._lock:
+            self._refresh()
+            keys = self._keys[kind]
+            best = {}
+            i = bisect_left(keys, (prefix,))
+            for key, pk, n in keys[i:i + MAX_SCANNED_KEYS]:
+                if not key.startswith(prefix):
+                    break
+                text, term_language, term_type, original = self._entities[pk].terms[n]
+                if language is not None and term_language != language:
+                    continue
+                match = 0 if key == text == prefix else 1 if key == text else 2
+                rank = (match, term_type, len(text))
+                if pk not in best or rank < best[pk][0]:
+                    best[pk] = (rank, n)
+            ranked = sorted(best.items(), key=lambda entry: (entry[1][0], self._entities[entry[0]].ref.display_id))
+            return [self._match(self._entities[pk], n, language) for pk, (_, n) in ranked[:limit]]
+
+    @staticmethod
+    def _match(entity: EntityTerms, n: int, language: str | None) -> AutocompleteMatch:
+        _, term_language, term_type, text = entity.terms[n]
+        language = language or term_language
+        return AutocompleteMatch(entity.ref, entity.labels.get(language), entity.descriptions.get(language),
+                                 TermIndex.Type(term_type).label, term_language, text)
+
+    def _refresh(self) -> None:
+        now = time.monotonic()
+        if self._version is not None and now - self._checked < self.refresh_interval:
+            return
+        version = Sequence.current(TermChange.VERSION_SEQUENCE)
+        if self._version is None or not self._catch_up(version):
+            self.clear()
+            self._load_entities(None)
+        self._version = version
+        self._checked = now
+
+    def _catch_up(self, version: int) -> bool:
+        """
+        Reloads the entities changed since the version of the index.
+        :return: False if the changes are not all in the log, or too many, in which case nothing is done
+        """
+        if version == self._version:
+            return True
+        changes = list(TermChange.objects.filter(version__gt=self._version, version__lte=version)
+                       .values_list('version', 'entity_id'))
+        entity_ids = {entity_id for _, entity_id in changes}
+        if {v for v, _ in changes} != set(range(self._version + 1, version + 1)) or \
+                len(entity_ids) > MAX_CHANGED_ENTITIES:
+            return False
+        for pk in entity_ids:
+            self._remove(pk)
+        self._load_entities(entity_ids)
+        return True
+
+    def _remove(self, pk: int) -> None:
+        entity = self._entities.pop(pk, None)
+        if entity is not None:
+            keys = self._keys[KINDS[entity.ref.prefix]]
+            for key in entity.keys(pk):
+                del keys[bisect_left(keys, key)]
+
+    def _load_entities(self, entity_ids: set[int] | None) -> None:
+        """
+        Loads the terms of the given entities, or of all of them if None.
+        """
+        rows = TermIndex.objects.order_by('entity_id', 'term_id')
+        if entity_ids is not None:
+            rows = rows.filter(entity_id__in=entity_ids)
+        rows = rows.values_list('entity_id', 'type', 'language', 'text', 'term__text',
+                                'entity__item__display_id', 'entity__property__display_id')
+        loaded = {}
+        for pk, term_type, language, text, original, item_id, property_id in rows.iterator(chunk_size=2000):
+            if item_id is None and property_id is None:
+                continue
+            entity = loaded.get(pk)
+            if entity is None:
+                entity = loaded[pk] = EntityTerms(EntityRef.from_ids(item_id, property_id))
+            if term_type == TermIndex.Type.DESCRIPTION:
+                entity.descriptions[language] = original
+            else:
+                entity.terms.append((text, language, term_type, original))
+                if term_type == TermIndex.Type.LABEL:
+                    entity.labels[language] = original
+        for pk, entity in loaded.items():
+            self._entities[pk] = entity
+            keys = self._keys[KINDS[entity.ref.prefix]]
+            if entity_ids is None:
+                keys.extend(entity.keys(pk))
+            else:
+                for key in entity.keys(pk):
+                    insort(keys, key)
+        if entity_ids is None:
+            for keys in self._keys.values():
+                keys.sort()
+
+
+autocomplete_index = AutocompleteIndex()
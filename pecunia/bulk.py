@@ -0,0 +1,312 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from dataclasses import dataclass, field
+from itertools import chain
+
+from django.core.exceptions import ValidationError
+from django.db import connections, router, transaction
+
+from pecunia.autocomplete import autocomplete_index
+from pecunia.models import Value, Entity, DescribedEntity, Item, Property, Datatype, PropertySnak, Statement, \
+    Qualifier, ReferenceRecord, ReferenceSnak, Label, Description, Alias, InstanceOf, SubclassOf, Backlink, \
+    PropertyUsage, TermIndex
+
+DEFAULT_BATCH_SIZE = 500
+
+
+@dataclass
+class SnakSpec:
+    """
+    A snak to be written. value is either a Value (saved or not) or the EntitySpec of an entity written in the same
+    batch.
+    """
+    property: Property
+    value: Value | EntitySpec | None = None
+    type: int = PropertySnak.Type.VALUE
+
+
+@dataclass
+class StatementSpec:
+    mainsnak: SnakSpec
+    rank: int = Statement.Rank.NORMAL
+    qualifiers: list[SnakSpec] = field(default_factory=list)
+    references: list[list[SnakSpec]] = field(default_factory=list)
+
+
+@dataclass
+class EntitySpec:
+    """
+    An entity to be written. If entity is not saved yet, it is created; otherwise its terms are replaced and the
+    statements are added to the existing ones.
+    """
+    entity: DescribedEntity = field(default_factory=Item)
+    labels: dict[str, str] = field(default_factory=dict)
+    descriptions: dict[str, str] = field(default_factory=dict)
+    aliases: dict[str, list[str]] = field(default_factory=dict)
+    statements: list[StatementSpec] = field(default_factory=list)
+
+
+def bulk_create_values(values: list[Value], using: str | None = None,
+                       batch_size: int = DEFAULT_BATCH_SIZE) -> list[Value]:
+    """
+    Inserts new Value instances of any subclass.
+    Django's bulk_create does not support multi-table inheritance, so the rows are inserted table by table, from
+    Value down to the concrete model, with one INSERT per table and per batch.
+    :param values: the values to insert, which must not be saved yet
+    :param using: the database alias to use
+    :param batch_size: the maximum number of rows per INSERT
+    :return: the values, with their primary keys set
+    """
+    using = using or router.db_for_write(Value)
+    connection = connections[using]
+    by_model = defaultdict(list)
+    for value in values:
+        by_model[value._meta.concrete_model].append(value)
+
+    for model, objs in by_model.items():
+        chain_models = [*reversed(model._meta.get_parent_list()), model]
+        root = chain_models[0]
+        for obj in objs:
+            obj._prepare_related_fields_for_save(operation_name='bulk_create_values')
+            obj.concrete_type = obj.concrete_type or obj.get_concrete_type()
+
+        root_fields = [f for f in root._meta.local_concrete_fields if not f.primary_key]
+        for batch in _batches(objs, root_fields, connection, batch_size):
+            if connection.features.can_return_rows_from_bulk_insert:
+                rows = root._base_manager._insert(batch, fields=root_fields, using=using,
+                                                  returning_fields=root._meta.db_returning_fields)
+            else:
+                rows = list(chain.from_iterable(
+                    root._base_manager._insert([obj], fields=root_fields, using=using,
+                                               returning_fields=root._meta.db_returning_fields)
+                    for obj in batch
+                ))
+            for obj, row in zip(batch, rows):
+                setattr(obj, root._meta.pk.attname, row[0])
+
+        for child in chain_models[1:]:
+            for obj in objs:
+                for link in child._meta.parents.values():
+                    setattr(obj, link.attname, getattr(obj, root._meta.pk.attname))
+            fields = child._meta.local_concrete_fields
+            for batch in _batches(objs, fields, connection, batch_size):
+                child._base_manager._insert(batch, fields=fields, using=using)
+
+        for obj in objs:
+            obj._state.adding = False
+            obj._state.db = using
+    return values
+
+
+def _batches(objs: list, fields: list, connection, batch_size: int):
+    size = max(min(batch_size, connection.ops.bulk_batch_size(fields or [None], objs)), 1)
+    for i in range(0, len(objs), size):
+        yield objs[i:i + size]
+
+
+class EntityBulkWriter:
+    """
+    Writes many entities, with their terms, statements, qualifiers and references, in a handful of queries.
+    Rows are inserted with one INSERT per table and per batch, in dependency order. Validation is done for the whole
+    batch before anything is written, and no model save() nor signal is triggered: the materialized indexes are
+    updated here.
+    """
+
+    def __init__(self, batch_size: int = DEFAULT_BATCH_SIZE, using: str | None = None):
+        self.batch_size = batch_size
+        self.using = using or router.db_for_write(Value)
+
+    def write(self, specs: list[EntitySpec]) -> list[DescribedEntity]:
+        """
+        Persists the given entity specs.
+        :param specs: the entities to write
+        :raise ValidationError: if any of the specs is invalid; nothing is written in this case
+        :return: the written entities, in the order of the specs
+        """
+        self._load_datatypes(specs)
+        self.validate(specs)
+
+        with transaction.atomic(using=self.using):
+            new_entities = [spec.entity for spec in specs if spec.entity.pk is None]
+            existing = [spec for spec in specs if spec.entity.pk is not None]
+            self._assign_display_ids(new_entities)
+            bulk_create_values(new_entities, self.using, self.batch_size)
+
+            new_values = self._write_terms(specs, existing)
+            new_terms = list(new_values.values())
+            snaks = {}
+            for snak_spec in self._snak_specs(specs):
+                value = snak_spec.value
+                if isinstance(value, EntitySpec):
+                    value = value.entity
+                elif value is not None and value.pk is None and id(value) not in new_values:
+                    new_values[id(value)] = value
+                snaks[id(snak_spec)] = (snak_spec, value)
+            bulk_create_values(list(new_values.values()), self.using, self.batch_size)
+            TermIndex.add(new_terms, self.using)
+
+            snak_objs = {key: self._build_snak(snak_spec, value) for key, (snak_spec, value) in snaks.items()}
+            PropertySnak.objects.using(self.using).bulk_create(snak_objs.values(), batch_size=self.batch_size)
+
+            statements = []
+            for spec in specs:
+                for statement_spec in spec.statements:
+                    statement = Statement(subject=spec.entity, mainsnak=snak_objs[id(statement_spec.mainsnak)],
+                                          rank=statement_spec.rank)
+                    statements.append((statement_spec, statement))
+            Statement.objects.using(self.using).bulk_create([s for _, s in statements], batch_size=self.batch_size)
+            InstanceOf.objects.using(self.using).bulk_create(InstanceOf.entries_for(s for _, s in statements),
+                                                             batch_size=self.batch_size)
+            SubclassOf.refresh(SubclassOf.edge_subjects(s for _, s in statements), self.using)
+            PropertyUsage.add((s for _, s in statements), using=self.using)
+
+            qualifiers = []
+            records = []
+            for statement_spec, statement in statements:
+                qualifiers += [Qualifier(statement=statement, snak=snak_objs[id(q)])
+                               for q in statement_spec.qualifiers]
+                records += [(ReferenceRecord(statement=statement), reference)
+                            for reference in statement_spec.references]
+            Qualifier.objects.using(self.using).bulk_create(qualifiers, batch_size=self.batch_size)
+            ReferenceRecord.objects.using(self.using).bulk_create([r for r, _ in records],
+                                                                  batch_size=self.batch_size)
+            ReferenceSnak.objects.using(self.using).bulk_create(
+                [ReferenceSnak(reference=record, snak=snak_objs[id(snak_spec)])
+                 for record, reference in records for snak_spec in reference],
+                batch_size=self.batch_size
+            )
+
+            backlinks = [Backlink.entry_for(statement.mainsnak, statement, Backlink.Role.MAINSNAK)
+                         for _, statement in statements]
+            backlinks += [Backlink.entry_for(qualifier.snak, qualifier.statement, Backlink.Role.QUALIFIER)
+                          for qualifier in qualifiers]
+            backlinks += [Backlink.entry_for(snak_objs[id(snak_spec)], record.statement, Backlink.Role.REFERENCE)
+                          for record, reference in records for snak_spec in reference]
+            Backlink.objects.using(self.using).bulk_create([b for b in backlinks if b is not None],
+                                                           batch_size=self.batch_size)
+            if existing:
+                Entity.bump_revision(self.using, pk__in=[spec.entity.pk for spec in existing])
+            transaction.on_commit(autocomplete_index.expire, using=self.using)
+
+        for spec in specs:
+            spec.entity._claim_index = None
+        return [spec.entity for spec in specs]
+
+    def validate(self, specs: list[EntitySpec]) -> None:
+        """
+        Checks the given specs without querying the database.
+        :raise ValidationError: with one entry per invalid element
+        """
+        errors = defaultdict(list)
+        for i, spec in enumerate(specs):
+            if not isinstance(spec.entity, DescribedEntity):
+                errors[f'{i}'].append(f"{spec.entity!r} is not a described entity")
+            for kind, terms in (('labels', spec.labels), ('descriptions', spec.descriptions),
+                                ('aliases', spec.aliases)):
+                for language in terms:
+                    if not language or len(language) > 3:
+                        errors[f'{i}.{kind}'].append(f"invalid language code '{language}'")
+            for j, statement_spec in enumerate(spec.statements):
+                path = f'{i}.statements.{j}'
+                if statement_spec.rank not in Statement.Rank.values:
+                    errors[path].append(f"invalid rank {statement_spec.rank}")
+                self._validate_snak(statement_spec.mainsnak, f'{path}.mainsnak', errors)
+                for k, qualifier in enumerate(statement_spec.qualifiers):
+                    self._validate_snak(qualifier, f'{path}.qualifiers.{k}', errors)
+                for k, reference in enumerate(statement_spec.references):
+                    for n, snak_spec in enumerate(reference):
+                        self._validate_snak(snak_spec, f'{path}.references.{k}.{n}', errors)
+        if errors:
+            raise ValidationError(dict(errors))
+
+    @staticmethod
+    def _validate_snak(snak_spec: SnakSpec, path: str, errors: dict[str, list[str]]) -> None:
+        if snak_spec.type not in PropertySnak.Type.values:
+            errors[path].append(f"invalid snak type {snak_spec.type}")
+            return
+        if snak_spec.type != PropertySnak.Type.VALUE:
+            if snak_spec.value is not None:
+                errors[path].append("value is not accessible if type is not VALUE")
+            return
+        value = snak_spec.value.entity if isinstance(snak_spec.value, EntitySpec) else snak_spec.value
+        if value is None:
+            errors[path].append("value should be specified if type is VALUE")
+            return
+        if value.__class__ is not snak_spec.property.data_type.type:
+            errors[path].append(f"{snak_spec.property} expects {snak_spec.property.data_type.class_name} values, "
+                                f"got {value.__class__.__name__}")
+            return
+        if value.pk is None and not isinstance(value, DescribedEntity):
+            try:
+                value.clean_fields(exclude=[f.name for f in value._meta.concrete_fields if f.is_relation])
+            except ValidationError as e:
+                errors[path] += e.messages
+
+    @staticmethod
+    def _build_snak(snak_spec: SnakSpec, value: Value | None) -> PropertySnak:
+        if snak_spec.type == PropertySnak.Type.VALUE:
+            return PropertySnak(property=snak_spec.property, type=snak_spec.type, value=value)
+        return PropertySnak(property=snak_spec.property, type=snak_spec.type)
+
+    def _load_datatypes(self, specs: list[EntitySpec]) -> None:
+        """
+        Loads, in one query, the datatypes of the properties used by the specs that are not loaded yet.
+        """
+        field = Property._meta.get_field('data_type')
+        properties = [snak_spec.property for snak_spec in self._snak_specs(specs)
+                      if not field.is_cached(snak_spec.property)]
+        if properties:
+            datatypes = Datatype.objects.using(self.using).in_bulk({p.data_type_id for p in properties})
+            for prop in properties:
+                field.set_cached_value(prop, datatypes[prop.data_type_id])
+
+    @staticmethod
+    def _snak_specs(specs: list[EntitySpec]):
+        for spec in specs:
+            for statement_spec in spec.statements:
+                yield statement_spec.mainsnak
+                yield from statement_spec.qualifiers
+                for reference in statement_spec.references:
+                    yield from reference
+
+    @staticmethod
+    def _assign_display_ids(entities: list[DescribedEntity]) -> None:
+        by_model = defaultdict(list)
+        for entity in entities:
+            if getattr(entity, 'display_id', 0) is None:
+                by_model[entity._meta.concrete_model].append(entity)
+        for model, objs in by_model.items():
+            model.assign_display_ids(objs)
+
+    def _write_terms(self, specs: list[EntitySpec], existing: list[EntitySpec]) -> dict[int, Value]:
+        """
+        Updates the labels and descriptions already defined for the existing entities and returns the terms to insert.
+        """
+        new_terms = {}
+        for model, attr in ((Label, 'labels'), (Description, 'descriptions')):
+            current = {}
+            entities = [spec.entity for spec in existing if getattr(spec, attr)]
+            if entities:
+                current = {(term.described_entity_id, term.language): term
+                           for term in model.objects.using(self.using).filter(described_entity__in=entities)}
+            updated = []
+            for spec in specs:
+                for language, text in getattr(spec, attr).items():
+                    term = current.get((spec.entity.pk, language))
+                    if term is None:
+                        term = model(described_entity=spec.entity, language=language, text=text)
+                        new_terms[id(term)] = term
+                    elif term.text != text:
+                        term.text = text
+                        updated.append(term)
+            if updated:
+                model.objects.using(self.using).bulk_update(updated, ['text'], batch_size=self.batch_size)
+                TermIndex.replace(updated, self.using)
+
+        for spec in specs:
+            for language, texts in spec.aliases.items():
+                for text in texts:
+                    alias = Alias(described_entity=spec.entity, language=language, text=text)
+                    new_terms[id(alias)] = alias
+        return new_terms
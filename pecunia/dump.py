@@ -0,0 +1,347 @@
+from __future__ import annotations
+
+import bz2
+import gzip
+import json
+from collections import Counter
+from decimal import Decimal
+from typing import Iterable, Iterator, TextIO
+
+from django.db import transaction, router
+
+from pecunia.bulk import EntityBulkWriter, EntitySpec, StatementSpec, SnakSpec
+from pecunia.models import Value, DescribedEntity, Item, Property, Datatype, PropertySnak, Statement, StringValue, \
+    UrlValue, QuantityValue, TimeValue, GlobeCoordinatesValue, MonolingualTextValue, DumpImport, ImportedEntity
+
+DEFAULT_BATCH_SIZE = 1000
+
+# Class names of the datatypes standing for Wikibase datatypes.
+DATATYPES = {
+    'wikibase-item': 'Item',
+    'wikibase-property': 'Property',
+    'string': 'StringValue',
+    'external-id': 'StringValue',
+    'commonsMedia': 'StringValue',
+    'math': 'StringValue',
+    'musical-notation': 'StringValue',
+    'geo-shape': 'StringValue',
+    'tabular-data': 'StringValue',
+    'url': 'UrlValue',
+    'quantity': 'QuantityValue',
+    'time': 'TimeValue',
+    'globe-coordinate': 'GlobeCoordinatesValue',
+    'monolingualtext': 'MonolingualTextValue',
+}
+RANKS = {rank.label: rank.value for rank in Statement.Rank}
+SNAK_TYPES = {snak_type.label: snak_type.value for snak_type in PropertySnak.Type}
+ENTITY_MODELS = {'Q': Item, 'P': Property}
+MAX_LANGUAGE_LENGTH = MonolingualTextValue._meta.get_field('language').max_length
+
+
+def open_dump(path: str) -> TextIO:
+    """
+    Opens a dump as text, decompressing it on the fly if it is compressed with gzip or bzip2.
+    """
+    with open(path, 'rb') as f:
+        magic = f.read(3)
+    if magic[:2] == b'\x1f\x8b':
+        return gzip.open(path, 'rt', encoding='utf-8')
+    if magic == b'BZh':
+        return bz2.open(path, 'rt', encoding='utf-8')
+    return open(path, encoding='utf-8')
+
+
+def read_records(lines: Iterable[str], start: int = 0) -> Iterator[tuple[int, dict]]:
+    """
+    Reads the entities of a dump with one JSON entity per line, either as JSON lines or as a JSON array laid out one
+    element per line (the layout of the Wikidata dumps).
+    :param start: the number of lines to skip
+    :return: the entities, each with the number of lines read so far
+    """
+    for position, line in enumerate(lines, 1):
+        if position <= start:
+            continue
+        line = line.strip().rstrip(',')
+        if line and line not in ('[', ']'):
+            yield position, json.loads(line)
+
+
+def entity_id(uri: str) -> str:
+    """
+    :return: the id of an entity given its concept URI, such as http://www.wikidata.org/entity/Q1985727
+    """
+    return uri.rsplit('/', 1)[-1]
+
+
+class DumpImporter:
+    """
+    Imports a Wikibase entity dump as a stream, a batch of records at a time.
+    Each batch is written by EntityBulkWriter in a single transaction, along with the position reached in the dump,
+    so that an interrupted import resumes after the last written batch. Only the current batch is held in memory.
+    The ids of the dump are mapped to local entities with new display ids (see ImportedEntity). An entity referenced
+    before its record is read is created empty and completed later; records already imported are skipped.
+    Terms and values in languages with codes too long for this instance are skipped, as well as snaks whose values
+    cannot be represented.
+    """
+
+    def __init__(self, source: str, batch_size: int = DEFAULT_BATCH_SIZE, using: str | None = None):
+        """
+        :param source: the name of the dump, identifying its id mapping and progress across runs
+        :param batch_size: the number of records written per transaction
+        """
+        self.using = using or router.db_for_write(Value)
+        self.dump, _ = DumpImport.objects.using(self.using).get_or_create(source=source)
+        self.batch_size = batch_size
+        self.writer = EntityBulkWriter(batch_size, self.using)
+        self.datatypes = {datatype.class_name: datatype for datatype in Datatype.objects.using(self.using)}
+        self.stats = Counter()
+
+    def restart(self) -> None:
+        """
+        Reads the dump from its start on the next run. Records already imported are still skipped.
+        """
+        self.dump.position = 0
+        self.dump.save(update_fields=['position'], using=self.using)
+
+    def run(self, lines: Iterable[str]) -> Counter:
+        """
+        Imports the records of a dump from the position reached by the previous runs.
+        :param lines: the lines of the dump, from its start
+        :return: the number of entities and statements imported, and of records and snaks skipped
+        """
+        batch = []
+        position = self.dump.position
+        for position, record in read_records(lines, self.dump.position):
+            batch.append(record)
+            if len(batch) >= self.batch_size:
+                self.import_batch(batch, position)
+                batch = []
+        if batch or position != self.dump.position:
+            self.import_batch(batch, position)
+        return self.stats
+
+    def import_batch(self, records: list[dict], position: int) -> None:
+        """
+        Writes a batch of records, then records the position reached in the dump.
+        """
+        with transaction.atomic(using=self.using):
+            batch = _Batch(self, records)
+            self.writer.write(batch.specs())
+            batch.save_ids()
+            self.dump.position = position
+            self.dump.save(update_fields=['position'], using=self.using)
+
+
+class _Batch:
+    def __init__(self, importer: DumpImporter, records: list[dict]):
+        self.importer = importer
+        self.stats = importer.stats
+        self.datatypes = importer.datatypes
+        # Specs of the entities written by the batch, by external id.
+        self.records: dict[str, EntitySpec] = {}
+        self.placeholders: dict[str, EntitySpec] = {}
+        # Entities of the previous batches, by external id, with whether their record has been imported.
+        self.known: dict[str, tuple[DescribedEntity, bool]] = {}
+
+        records = [record for record in records if self._accept(record)]
+        self._load_known(records)
+        for record in records:
+            self._add_entity(record)
+        for record in records:
+            if record['id'] in self.records:
+                self._add_content(self.records[record['id']], record)
+
+    def _accept(self, record: dict) -> bool:
+        if str(record.get('id', ''))[:1] not in ENTITY_MODELS:
+            self.stats['skipped records'] += 1
+            return False
+        return True
+
+    def _load_known(self, records: list[dict]) -> None:
+        """
+        Loads the entities of the previous batches referenced by the records, in three queries.
+        """
+        ids = set()
+        for record in records:
+            ids.add(record['id'])
+            for snak in self._snaks(record):
+                ids.add(snak.get('property'))
+                value = snak.get('datavalue', {}).get('value')
+                if isinstance(value, dict):
+                    ids.update(entity_id(value[key]) for key in ('unit', 'calendarmodel', 'globe')
+                               if isinstance(value.get(key), str))
+                    if 'id' in value:
+                        ids.add(value['id'])
+        rows = (ImportedEntity.objects.using(self.importer.using)
+                .filter(dump=self.importer.dump, external_id__in=ids - {None})
+                .values_list('external_id', 'entity_id', 'imported'))
+        by_pk = {pk: (external_id, imported) for external_id, pk, imported in rows}
+        items = Item.objects.using(self.importer.using).in_bulk(list(by_pk))
+        properties = Property.objects.using(self.importer.using).select_related('data_type').in_bulk(list(by_pk))
+        for pk, entity in (items | properties).items():
+            external_id, imported = by_pk[pk]
+            self.known[external_id] = (entity, imported)
+
+    @staticmethod
+    def _snaks(record: dict) -> Iterator[dict]:
+        for statements in record.get('claims', {}).values():
+            for statement in statements:
+                yield statement['mainsnak']
+                for snaks in statement.get('qualifiers', {}).values():
+                    yield from snaks
+                for reference in statement.get('references', []):
+                    for snaks in reference.get('snaks', {}).values():
+                        yield from snaks
+
+    def _add_entity(self, record: dict) -> None:
+        external_id = record['id']
+        entity, imported = self.known.get(external_id, (None, False))
+        if imported or external_id in self.records:
+            self.stats['skipped records'] += 1
+            return
+        if entity is None:
+            entity = self._new_entity(external_id, record.get('datatype'))
+            if entity is None:
+                self.stats['skipped records'] += 1
+                return
+        self.records[external_id] = EntitySpec(entity=entity)
+        self.stats['entities'] += 1
+
+    def _new_entity(self, external_id: str, datatype: str | None) -> DescribedEntity | None:
+        if external_id[0] == 'Q':
+            return Item()
+        if datatype in DATATYPES:
+            return Property(data_type=self.datatypes[DATATYPES[datatype]])
+        return None
+
+    def _add_content(self, spec: EntitySpec, record: dict) -> None:
+        for kind in ('labels', 'descriptions'):
+            setattr(spec, kind, {language: term['value'] for language, term in record.get(kind, {}).items()
+                                 if self._accept_language(language)})
+        spec.aliases = {language: [alias['value'] for alias in aliases]
+                        for language, aliases in record.get('aliases', {}).items() if self._accept_language(language)}
+        for statements in record.get('claims', {}).values():
+            for statement in statements:
+                statement_spec = self._statement(statement)
+                if statement_spec is None:
+                    self.stats['skipped snaks'] += 1
+                else:
+                    spec.statements.append(statement_spec)
+                    self.stats['statements'] += 1
+
+    def _accept_language(self, language: str) -> bool:
+        if len(language) > MAX_LANGUAGE_LENGTH:
+            self.stats['skipped terms'] += 1
+            return False
+        return True
+
+    def _statement(self, statement: dict) -> StatementSpec | None:
+        mainsnak = self._snak(statement['mainsnak'])
+        if mainsnak is None:
+            return None
+        qualifiers = [self._snak(snak) for snaks in statement.get('qualifiers', {}).values() for snak in snaks]
+        references = [[self._snak(snak) for snaks in reference.get('snaks', {}).values() for snak in snaks]
+                      for reference in statement.get('references', [])]
+        self.stats['skipped snaks'] += qualifiers.count(None) + sum(reference.count(None) for reference in references)
+        return StatementSpec(mainsnak, RANKS.get(statement.get('rank'), Statement.Rank.NORMAL),
+                             [snak for snak in qualifiers if snak is not None],
+                             [[snak for snak in reference if snak is not None] for reference in references])
+
+    def _snak(self, snak: dict) -> SnakSpec | None:
+        prop = self._resolve_entity(snak['property'], Property, snak.get('datatype'))
+        if prop is None:
+            return None
+        snak_type = SNAK_TYPES.get(snak.get('snaktype'))
+        if snak_type is None:
+            return None
+        if snak_type != PropertySnak.Type.VALUE:
+            return SnakSpec(prop, type=snak_type)
+        try:
+            value = self._value(prop.data_type.class_name, snak['datavalue']['value'])
+        except (KeyError, TypeError, ValueError, ArithmeticError):
+            return None
+        return SnakSpec(prop, value) if value is not None else None
+
+    def _value(self, class_name: str, value) -> Value | EntitySpec | None:
+        if class_name in ('Item', 'Property'):
+            target = self._resolve(value['id'])
+            entity = target.entity if isinstance(target, EntitySpec) else target
+            return target if isinstance(entity, self.datatypes[class_name].type) else None
+        if class_name == 'StringValue':
+            return StringValue(value=value)
+        if class_name == 'UrlValue':
+            return UrlValue(value=value)
+        if class_name == 'MonolingualTextValue':
+            if len(value['language']) > MAX_LANGUAGE_LENGTH:
+                return None
+            return MonolingualTextValue(language=value['language'], text=value['text'])
+        if class_name == 'QuantityValue':
+            unit = self._resolve_item(value['unit']) if value.get('unit', '1') != '1' else None
+            return QuantityValue(number=float(value['amount']),
+                                 lower=float(value['lowerBound']) if 'lowerBound' in value else None,
+                                 upper=float(value['upperBound']) if 'upperBound' in value else None, unit=unit)
+        if class_name == 'TimeValue':
+            return TimeValue(time=value['time'], timezone=value.get('timezone', 0), precision=value.get('precision'),
+                             before=value.get('before'), after=value.get('after'),
+                             calendar_model=self._resolve_item(value['calendarmodel']))
+        if class_name == 'GlobeCoordinatesValue':
+            return GlobeCoordinatesValue(latitude=round(Decimal(str(value['latitude'])), 9),
+                                         longitude=round(Decimal(str(value['longitude'])), 9),
+                                         precision=round(Decimal(str(value.get('precision') or '0.0000001')), 9),
+                                         globe=self._resolve_item(value['globe']))
+        return None
+
+    def _resolve_item(self, uri: str) -> Item:
+        """
+        :return: the item with the given concept URI; new items are saved along with the batch entities
+        """
+        item = self._resolve_entity(entity_id(uri), Item)
+        if item is None:
+            raise ValueError(f"{uri} is not an item")
+        return item
+
+    def _resolve_entity(self, external_id: str, model: type[DescribedEntity],
+                        datatype: str | None = None) -> DescribedEntity | None:
+        """
+        :return: the entity with the given external id if it is an instance of the model, None otherwise
+        """
+        entity = self._resolve(external_id, datatype)
+        if isinstance(entity, EntitySpec):
+            entity = entity.entity
+        return entity if isinstance(entity, model) else None
+
+    def _resolve(self, external_id: str, datatype: str | None = None) -> DescribedEntity | EntitySpec | None:
+        """
+        :param datatype: the Wikibase datatype of the entity, if it is a property
+        :return: the entity with the given external id, or its spec if it is written by the batch, None if it is not
+          known and cannot be created
+        """
+        spec = self.records.get(external_id) or self.placeholders.get(external_id)
+        if spec is not None:
+            return spec
+        if external_id in self.known:
+            return self.known[external_id][0]
+        entity = self._new_entity(external_id, datatype) if external_id[:1] in ENTITY_MODELS else None
+        if entity is None:
+            return None
+        self.placeholders[external_id] = EntitySpec(entity=entity)
+        return self.placeholders[external_id]
+
+    def specs(self) -> list[EntitySpec]:
+        return [*self.records.values(), *self.placeholders.values()]
+
+    def save_ids(self) -> None:
+        """
+        Records the local entities of the external ids met in the batch.
+        """
+        using = self.importer.using
+        dump = self.importer.dump
+        completed = [external_id for external_id in self.records if external_id in self.known]
+        ImportedEntity.objects.using(using).filter(dump=dump, external_id__in=completed).update(imported=True)
+        ImportedEntity.objects.using(using).bulk_create(
+            [ImportedEntity(dump=dump, external_id=external_id, entity=spec.entity, imported=True)
+             for external_id, spec in self.records.items() if external_id not in self.known] +
+            [ImportedEntity(dump=dump, external_id=external_id, entity=spec.entity, imported=False)
+             for external_id, spec in self.placeholders.items()],
+            batch_size=self.importer.batch_size
+        )
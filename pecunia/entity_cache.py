@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import hashlib
+from typing import Any, Callable, Iterable
+
+from django.conf import settings
+from django.core.cache import caches, BaseCache
+
+ENTITY_CACHE_ALIAS = 'entities'
+
+
+def get_entity_cache() -> BaseCache:
+    """
+    :return: the 'entities' cache if it is configured, the default cache otherwise
+    """
+    return caches[ENTITY_CACHE_ALIAS if ENTITY_CACHE_ALIAS in settings.CACHES else 'default']
+
+
+def make_etag(entity_id: str, revision: int, fields: Iterable[str], representation: str = 'json') -> str:
+    """
+    Builds a strong ETag for a serialized entity, which changes whenever its revision does.
+    :param representation: the format of the response, since each one has its own body
+    """
+    digest = hashlib.md5(f"{','.join(sorted(fields))}:{representation}".encode()).hexdigest()[:12]
+    return f'"{entity_id}-{revision}-{digest}"'
+
+
+class EntityJsonCache:
+    """
+    Serialized entities, keyed by entity id, revision and serialized fields.
+    Since the revision of an entity changes with any write to its terms or statements, a cached entry is never stale:
+    it is simply not read anymore once the entity has changed, and expires with the cache timeout.
+    """
+
+    def __init__(self, cache: BaseCache | None = None):
+        self.cache = cache or get_entity_cache()
+
+    @staticmethod
+    def make_key(entity_id: str, revision: int, fields: Iterable[str]) -> str:
+        """
+        :param entity_id: the prefixed display id of the entity, e.g. Q12, which is never reused
+        """
+        return f"entity:{entity_id}:{revision}:{','.join(sorted(fields))}"
+
+    def get_or_set(self, entity_id: str, revision: int, fields: Iterable[str], serialize: Callable[[], Any]) -> Any:
+        """
+        :param serialize: computes the serialized entity if it is not cached
+        :return: the serialized entity
+        """
+        key = self.make_key(entity_id, revision, fields)
+        data = self.cache.get(key)
+        if data is None:
+            data = serialize()
+            self.cache.set(key, data)
+        return data
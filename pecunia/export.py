@@ -0,0 +1,448 @@
+from __future__ import annotations
+
+import bz2
+import csv
+import gzip
+import json
+import os
+import shutil
+import sys
+import tempfile
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import nullcontext
+from dataclasses import dataclass
+from datetime import datetime
+from itertools import repeat
+from math import ceil
+from typing import Iterator, TextIO
+from urllib.parse import quote
+
+import django
+from django.apps import apps
+from django.db import connections
+from django.db.models import QuerySet, Min, Max
+
+from pecunia.models import Value, DescribedEntity, Item, Property, Datatype, PropertySnak, Statement, StringValue, \
+    UrlValue, QuantityValue, TimeValue, GlobeCoordinatesValue, MonolingualTextValue, instance_of_q
+from pecunia.serializers import CLAIM_PREFETCHES, CLAIM_SNAKS
+
+EXPORT_CHUNK_SIZE = 500
+# Number of shards per worker of a parallel export, so that a worker done early takes over some of the work left.
+SHARDS_PER_WORKER = 4
+DEFAULT_BASE_URI = 'https://pecunia-app.huma-num.fr/'
+
+# Wikibase datatypes of the datatypes, by class name (see pecunia.dump.DATATYPES).
+WIKIBASE_DATATYPES = {
+    'Item': 'wikibase-item',
+    'Property': 'wikibase-property',
+    'StringValue': 'string',
+    'UrlValue': 'url',
+    'QuantityValue': 'quantity',
+    'TimeValue': 'time',
+    'GlobeCoordinatesValue': 'globe-coordinate',
+    'MonolingualTextValue': 'monolingualtext',
+}
+
+
+def open_output(path: str) -> TextIO:
+    """
+    Opens a file to write text to, compressed with gzip or bzip2 if its name ends with .gz or .bz2; '-' stands for
+    the standard output.
+    """
+    if path == '-':
+        return open(sys.stdout.fileno(), 'w', encoding='utf-8', newline='', closefd=False)
+    if path.endswith('.gz'):
+        return gzip.open(path, 'wt', encoding='utf-8', newline='')
+    if path.endswith('.bz2'):
+        return bz2.open(path, 'wt', encoding='utf-8', newline='')
+    return open(path, 'w', encoding='utf-8', newline='')
+
+
+@dataclass(frozen=True)
+class Shard:
+    """
+    Range of display ids of the entities of a model, from start included to stop excluded.
+    """
+    model: type[DescribedEntity]
+    start: int
+    stop: int
+
+
+class DumpExporter:
+    """
+    Exports the entities with their terms and statements, chunk by chunk.
+    Entities are read by display_id ranges, properties first, and each chunk is loaded with its terms, statements and
+    values in a constant number of queries, so that memory use does not depend on the number of entities.
+    Entities can be restricted to the instances of a class (items only), to those whose revision is at least a given
+    one, or to those modified since a given time.
+    Large exports can be split into shards of display ids serialized in parallel (see export_parallel()).
+    """
+
+    def __init__(self, base_uri: str = DEFAULT_BASE_URI, chunk_size: int = EXPORT_CHUNK_SIZE,
+                 models: tuple[type[DescribedEntity], ...] = (Property, Item), item_class: Item | None = None,
+                 min_revision: int | None = None, modified_since: datetime | None = None):
+        """
+        :param base_uri: the URI under which entity URIs are built, ending with a slash
+        """
+        self.base_uri = base_uri
+        self.chunk_size = chunk_size
+        self.models = models
+        self.item_class = item_class
+        self.min_revision = min_revision
+        self.modified_since = modified_since
+        self.datatypes = dict(Datatype.objects.values_list('pk', 'class_name'))
+
+    def get_queryset(self, model: type[DescribedEntity]) -> QuerySet:
+        return self.filter_queryset(model, model.objects.prefetch_related('labels', 'descriptions', 'aliases',
+                                                                          *CLAIM_PREFETCHES)
+                                    .prefetch_values(*CLAIM_SNAKS))
+
+    def filter_queryset(self, model: type[DescribedEntity], queryset: QuerySet) -> QuerySet:
+        if self.item_class is not None and model is Item:
+            queryset = queryset.filter(instance_of_q(self.item_class)).distinct()
+        if self.min_revision is not None:
+            queryset = queryset.filter(revision__gte=self.min_revision)
+        if self.modified_since is not None:
+            queryset = queryset.filter(modified__gte=self.modified_since)
+        return queryset
+
+    def chunks(self, shard: Shard | None = None) -> Iterator[list[DescribedEntity]]:
+        """
+        :param shard: the range of entities to read, all of them if None
+        :return: the entities to export, by chunks of chunk_size entities at most
+        """
+        for model in [shard.model] if shard else self.models:
+            queryset = self.get_queryset(model)
+            if shard:
+                queryset = queryset.filter(display_id__gte=shard.start, display_id__lt=shard.stop)
+            after = None
+            while True:
+                chunk = queryset.filter(display_id__gt=after) if after is not None else queryset
+                chunk = list(chunk.order_by('display_id')[:self.chunk_size])
+                if not chunk:
+                    break
+                after = chunk[-1].display_id
+                yield chunk
+
+    def export(self, out: TextIO, format_name: str = 'json', shard: Shard | None = None, header: bool = True) -> int:
+        """
+        :param format_name: a key of FORMATS
+        :param shard: the range of entities to write, all of them if None
+        :param header: whether to start with the header of the format, if it has one
+        :return: the number of entities written
+        """
+        writer = FORMATS[format_name](self, out)
+        if header:
+            writer.write_header()
+        count = 0
+        for chunk in self.chunks(shard):
+            for entity in chunk:
+                writer.write(entity)
+            count += len(chunk)
+        return count
+
+    def shards(self, count: int) -> list[Shard]:
+        """
+        Splits the display ids of the entities to export into about count ranges of the same size, in export order.
+        """
+        bounds = []
+        for model in self.models:
+            bound = self.filter_queryset(model, model.objects.all()).aggregate(first=Min('display_id'),
+                                                                                last=Max('display_id'))
+            if bound['first'] is not None:
+                bounds.append((model, bound['first'], bound['last'] + 1))
+        total = sum(stop - start for _, start, stop in bounds)
+        shards = []
+        for model, start, stop in bounds:
+            size = ceil((stop - start) / max(round(count * (stop - start) / total), 1))
+            shards += [Shard(model, low, min(low + size, stop)) for low in range(start, stop, size)]
+        return shards
+
+    def export_parallel(self, path: str, format_name: str = 'json', workers: int | None = None, parts: bool = False,
+                        executor_class: type[Executor] = ProcessPoolExecutor) -> int:
+        """
+        Exports the entities by shards of display ids (see shards()), serialized in parallel by a pool of workers,
+        each with its own database connection. Each shard is written to a part file, compressed as the output.
+        The parts are then either concatenated in order into the output, which gives the same content as export(),
+        or kept along with a manifest describing them.
+        :param path: the output; with parts, the path from which the names of the parts and of the manifest are derived,
+          e.g. dump-00000.json.gz and dump.manifest.json for dump.json.gz
+        :param workers: the number of workers, the number of processors by default
+        :return: the number of entities written
+        """
+        workers = workers or os.cpu_count() or 1
+        shards = self.shards(workers * SHARDS_PER_WORKER) or [Shard(self.models[0], 0, 0)]
+        directory, name = os.path.split(path)
+        stem, dot, suffix = name.partition('.')
+        if not parts:
+            directory = tempfile.mkdtemp(dir=directory if path != '-' else None)
+        part_paths = [os.path.join(directory, f'{stem}-{i:05d}{dot}{suffix}') for i in range(len(shards))]
+        if issubclass(executor_class, ProcessPoolExecutor):
+            # Forked workers must not share the connections of this process.
+            connections.close_all()
+        try:
+            with executor_class(workers, initializer=_init_worker) as executor:
+                counts = list(executor.map(_export_shard, repeat(self), repeat(format_name), shards, part_paths,
+                                           [parts or i == 0 for i in range(len(shards))]))
+            if parts:
+                self._write_manifest(os.path.join(directory, f'{stem}.manifest.json'), format_name, shards,
+                                     part_paths, counts)
+            else:
+                with open(path, 'wb') if path != '-' else nullcontext(sys.stdout.buffer) as out:
+                    for part_path in part_paths:
+                        with open(part_path, 'rb') as part:
+                            shutil.copyfileobj(part, out)
+        finally:
+            if not parts:
+                shutil.rmtree(directory)
+        return sum(counts)
+
+    @staticmethod
+    def _write_manifest(path: str, format_name: str, shards: list[Shard], part_paths: list[str],
+                        counts: list[int]) -> None:
+        manifest = {
+            'format': format_name,
+            'entities': sum(counts),
+            'parts': [{'path': os.path.basename(part_path), 'type': shard.model._meta.model_name,
+                       'start': shard.start, 'stop': shard.stop, 'entities': count}
+                      for shard, part_path, count in zip(shards, part_paths, counts)],
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+
+    def entity_uri(self, entity: DescribedEntity) -> str:
+        return f'{self.base_uri}entity/{entity.pretty_display_id}'
+
+    def datatype(self, prop: Property) -> str:
+        return self.datatypes[prop.data_type_id]
+
+    @staticmethod
+    def statements(entity: DescribedEntity) -> list[tuple[Property, list[Statement]]]:
+        """
+        :return: the statements of the entity grouped by property, in the order of their first statement
+        """
+        by_property = {}
+        for statement in entity.statements.all():
+            prop = statement.mainsnak.property
+            by_property.setdefault(prop.pk, (prop, []))[1].append(statement)
+        return list(by_property.values())
+
+
+class DumpFormat:
+    def __init__(self, exporter: DumpExporter, out: TextIO):
+        self.exporter = exporter
+        self.out = out
+
+    def write_header(self) -> None:
+        pass
+
+    def write(self, entity: DescribedEntity) -> None:
+        raise NotImplementedError(f"{self.__class__.__name__} must implement write().")
+
+
+class JsonLinesFormat(DumpFormat):
+    """
+    Wikibase JSON, one entity per line, as read by the import_dump command.
+    """
+
+    def write(self, entity: DescribedEntity) -> None:
+        self.out.write(json.dumps(self.entity(entity), ensure_ascii=False))
+        self.out.write('\n')
+
+    def entity(self, entity: DescribedEntity) -> dict:
+        data = {'type': 'property' if isinstance(entity, Property) else 'item', 'id': entity.pretty_display_id}
+        if isinstance(entity, Property):
+            data['datatype'] = WIKIBASE_DATATYPES.get(self.exporter.datatype(entity))
+        data['labels'] = {term.language: {'language': term.language, 'value': term.text}
+                          for term in entity.labels.all()}
+        data['descriptions'] = {term.language: {'language': term.language, 'value': term.text}
+                                for term in entity.descriptions.all()}
+        data['aliases'] = {}
+        for alias in entity.aliases.all():
+            data['aliases'].setdefault(alias.language, []).append({'language': alias.language, 'value': alias.text})
+        data['claims'] = {prop.pretty_display_id: [self.statement(statement) for statement in statements]
+                          for prop, statements in self.exporter.statements(entity)}
+        return data
+
+    def statement(self, statement: Statement) -> dict:
+        data = {'mainsnak': self.snak(statement.mainsnak), 'type': 'statement', 'rank': statement.get_rank_display()}
+        qualifiers = {}
+        for qualifier in statement.qualifiers.all():
+            qualifiers.setdefault(qualifier.snak.property.pretty_display_id, []).append(self.snak(qualifier.snak))
+        if qualifiers:
+            data['qualifiers'] = qualifiers
+        references = []
+        for record in statement.reference_records.all():
+            snaks = {}
+            for reference in record.snaks.all():
+                snaks.setdefault(reference.snak.property.pretty_display_id, []).append(self.snak(reference.snak))
+            references.append({'snaks': snaks})
+        if references:
+            data['references'] = references
+        return data
+
+    def snak(self, snak: PropertySnak) -> dict:
+        data = {'snaktype': snak.get_type_display(), 'property': snak.property.pretty_display_id,
+                'datatype': WIKIBASE_DATATYPES.get(self.exporter.datatype(snak.property))}
+        if snak.type == PropertySnak.Type.VALUE and snak.value is not None:
+            data['datavalue'] = self.datavalue(snak.value)
+        return data
+
+    def datavalue(self, value: Value) -> dict:
+        if isinstance(value, (Item, Property)):
+            return {'value': {'entity-type': 'item' if isinstance(value, Item) else 'property',
+                              'numeric-id': value.display_id, 'id': value.pretty_display_id},
+                    'type': 'wikibase-entityid'}
+        if isinstance(value, (StringValue, UrlValue)):
+            return {'value': value.value, 'type': 'string'}
+        if isinstance(value, MonolingualTextValue):
+            return {'value': {'text': value.text, 'language': value.language}, 'type': 'monolingualtext'}
+        if isinstance(value, QuantityValue):
+            data = {'amount': f'{value.number:+}', 'unit': self.exporter.entity_uri(value.unit) if value.unit else '1'}
+            if value.lower is not None:
+                data['lowerBound'] = f'{value.lower:+}'
+            if value.upper is not None:
+                data['upperBound'] = f'{value.upper:+}'
+            return {'value': data, 'type': 'quantity'}
+        if isinstance(value, TimeValue):
+            return {'value': {'time': value.time, 'timezone': value.timezone, 'before': value.before,
+                              'after': value.after, 'precision': value.precision,
+                              'calendarmodel': self.exporter.entity_uri(value.calendar_model)},
+                    'type': 'time'}
+        if isinstance(value, GlobeCoordinatesValue):
+            return {'value': {'latitude': float(value.latitude), 'longitude': float(value.longitude), 'altitude': None,
+                              'precision': float(value.precision), 'globe': self.exporter.entity_uri(value.globe)},
+                    'type': 'globecoordinate'}
+        return {'value': str(value), 'type': 'string'}
+
+
+class NTriplesFormat(DumpFormat):
+    """
+    RDF as N-Triples: the terms of the entities, and the values of their best-ranked statements as direct claims, as
+    in the "truthy" dumps of Wikidata. Qualifiers and references are left out.
+    """
+    RDF_TYPE = '<http://www.w3.org/1999/02/22-rdf-syntax-ns#type>'
+    LABEL = '<http://www.w3.org/2000/01/rdf-schema#label>'
+    DESCRIPTION = '<http://schema.org/description>'
+    ALIAS = '<http://www.w3.org/2004/02/skos/core#altLabel>'
+    WIKIBASE = 'http://wikiba.se/ontology#'
+    XSD = 'http://www.w3.org/2001/XMLSchema#'
+    WKT = 'http://www.opengis.net/ont/geosparql#wktLiteral'
+    # Characters left as they are in the IRIs of URL values.
+    IRI_SAFE = ":/?#[]@!$&'()*+,;=%~"
+
+    def write(self, entity: DescribedEntity) -> None:
+        subject = f'<{self.exporter.entity_uri(entity)}>'
+        kind = 'Property' if isinstance(entity, Property) else 'Item'
+        lines = [f'{subject} {self.RDF_TYPE} <{self.WIKIBASE}{kind}> .']
+        for predicate, terms in ((self.LABEL, entity.labels.all()), (self.DESCRIPTION, entity.descriptions.all()),
+                                 (self.ALIAS, entity.aliases.all())):
+            lines += [f'{subject} {predicate} {self.literal(term.text)}@{term.language} .' for term in terms]
+        for prop, statements in self.exporter.statements(entity):
+            predicate = f'<{self.exporter.base_uri}prop/direct/{prop.pretty_display_id}>'
+            for statement in self.best(statements):
+                obj = self.object(statement.mainsnak.value)
+                if obj is not None:
+                    lines.append(f'{subject} {predicate} {obj} .')
+        self.out.write('\n'.join(lines))
+        self.out.write('\n')
+
+    @staticmethod
+    def best(statements: list[Statement]) -> list[Statement]:
+        """
+        :return: the statements with a value of the best rank among the given ones, deprecated statements excluded
+        """
+        statements = [statement for statement in statements if statement.rank != Statement.Rank.DEPRECATED
+                      and statement.mainsnak.type == PropertySnak.Type.VALUE]
+        best = max((statement.rank for statement in statements), default=None)
+        return [statement for statement in statements if statement.rank == best]
+
+    @staticmethod
+    def literal(text: str, datatype: str | None = None) -> str:
+        escaped = text.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n').replace('\r', '\\r')
+        return f'"{escaped}"^^<{datatype}>' if datatype else f'"{escaped}"'
+
+    def object(self, value: Value | None) -> str | None:
+        if isinstance(value, (Item, Property)):
+            return f'<{self.exporter.entity_uri(value)}>'
+        if isinstance(value, UrlValue):
+            return f'<{quote(value.value, safe=self.IRI_SAFE)}>'
+        if isinstance(value, StringValue):
+            return self.literal(value.value)
+        if isinstance(value, MonolingualTextValue):
+            return f'{self.literal(value.text)}@{value.language}'
+        if isinstance(value, QuantityValue):
+            return self.literal(f'{value.number:+}', f'{self.XSD}decimal')
+        if isinstance(value, TimeValue):
+            return self.literal(value.time.lstrip('+'), f'{self.XSD}dateTime')
+        if isinstance(value, GlobeCoordinatesValue):
+            return self.literal(f'Point({value.longitude} {value.latitude})', self.WKT)
+        return None
+
+
+class CsvFormat(DumpFormat):
+    """
+    One row per term and per statement main snak. Qualifiers and references are left out.
+    """
+    COLUMNS = ['id', 'field', 'property', 'rank', 'snaktype', 'datatype', 'language', 'value']
+
+    def __init__(self, exporter: DumpExporter, out: TextIO):
+        super().__init__(exporter, out)
+        self.writer = csv.writer(out)
+
+    def write_header(self) -> None:
+        self.writer.writerow(self.COLUMNS)
+
+    def write(self, entity: DescribedEntity) -> None:
+        entity_id = entity.pretty_display_id
+        rows = []
+        for field, terms in (('label', entity.labels.all()), ('description', entity.descriptions.all()),
+                             ('alias', entity.aliases.all())):
+            rows += [(entity_id, field, '', '', '', '', term.language, term.text) for term in terms]
+        for prop, statements in self.exporter.statements(entity):
+            datatype = WIKIBASE_DATATYPES.get(self.exporter.datatype(prop))
+            for statement in statements:
+                snak = statement.mainsnak
+                language, value = self.value(snak.value) if snak.type == PropertySnak.Type.VALUE else ('', '')
+                rows.append((entity_id, 'claim', prop.pretty_display_id, statement.get_rank_display(),
+                             snak.get_type_display(), datatype, language, value))
+        self.writer.writerows(rows)
+
+    @staticmethod
+    def value(value: Value | None) -> tuple[str, str]:
+        """
+        :return: the language and the text of a value
+        """
+        if isinstance(value, (Item, Property)):
+            return '', value.pretty_display_id
+        if isinstance(value, (StringValue, UrlValue)):
+            return '', value.value
+        if isinstance(value, MonolingualTextValue):
+            return value.language, value.text
+        if isinstance(value, QuantityValue):
+            return '', f'{value.number}'
+        if isinstance(value, TimeValue):
+            return '', value.time
+        if isinstance(value, GlobeCoordinatesValue):
+            return '', f'{value.latitude},{value.longitude}'
+        return '', '' if value is None else str(value)
+
+
+def _init_worker() -> None:
+    """
+    Sets Django up in the workers started without a copy of this process (spawn and forkserver start methods).
+    """
+    if not apps.ready:
+        django.setup()
+
+
+def _export_shard(exporter: DumpExporter, format_name: str, shard: Shard, path: str, header: bool) -> int:
+    with open_output(path) as out:
+        return exporter.export(out, format_name, shard, header)
+
+
+FORMATS = {
+    'json': JsonLinesFormat,
+    'nt': NTriplesFormat,
+    'csv': CsvFormat,
+}
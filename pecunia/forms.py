@@ -2,13 +2,12 @@ from django import forms
 from django.utils.translation import gettext_lazy as _, gettext_lazy, get_language
 
 import pecunia.models as m
-from .models import ItemMapping, PropertyMapping
+from .models import ItemMapping
 from .templatetags import pecunia_tags as tags
 
 
 def get_instances_of(item):
-    return m.Item.objects.filter(statements__mainsnak__property=PropertyMapping.get('is_a'),
-                                 statements__mainsnak__value=item)  # TODO: get subclasses
+    return m.Item.objects.filter(m.instance_of_q(item)).distinct()
 
 
 class DocumentTextForm(forms.Form):
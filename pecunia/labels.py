@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Iterable, Sequence
+
+from django.db.models import Value
+
+from pecunia.models import DescribedEntity, Label, Description
+
+TERM_MODELS = {'labels': Label, 'descriptions': Description}
+
+
+@dataclass
+class _Scope:
+    # Primary keys of the entities registered during the request.
+    registered: set[int] = field(default_factory=set)
+    # Texts by language, by (kind, entity primary key).
+    terms: dict[tuple[str, int], dict[str, str]] = field(default_factory=dict)
+    # Entities whose terms are loaded, by language.
+    loaded: dict[str, set[int]] = field(default_factory=dict)
+
+
+class LabelResolver:
+    """
+    Labels and descriptions of described entities, fetched in bulk for the current request.
+    Views register the entities they are going to display (see register()). The first term asked for in a chain of
+    languages loads the labels and descriptions of all the registered entities in these languages with a single
+    query; an entity asked for without being registered is loaded along with the entities registered since. Terms
+    already prefetched on an entity are used as they are.
+    Terms are kept until the end of the request (see scope()), except those of the entities changed meanwhile (see
+    forget()). Outside of a scope, nothing is kept and each term costs a query.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    @contextmanager
+    def scope(self):
+        """
+        Within the block, terms are fetched in bulk and kept. Every request runs in such a scope.
+        """
+        previous = getattr(self._local, 'scope', None)
+        self._local.scope = _Scope()
+        try:
+            yield
+        finally:
+            self._local.scope = previous
+
+    def start_scope(self) -> None:
+        self._local.scope = _Scope()
+
+    def end_scope(self) -> None:
+        self._local.scope = None
+
+    def register(self, entities: Iterable[DescribedEntity | int]) -> None:
+        """
+        Declares entities whose terms are going to be displayed, to be loaded with the next batch.
+        :param entities: described entities or their primary keys
+        """
+        scope = getattr(self._local, 'scope', None)
+        if scope is not None:
+            pks = (entity if isinstance(entity, int) else entity.pk for entity in entities)
+            scope.registered.update(pk for pk in pks if pk is not None)
+
+    def forget(self, entity_id: int) -> None:
+        """
+        Drops the terms of an entity, so that they are loaded again when asked for.
+        """
+        scope = getattr(self._local, 'scope', None)
+        if scope is not None:
+            for kind in TERM_MODELS:
+                scope.terms.pop((kind, entity_id), None)
+            for entity_ids in scope.loaded.values():
+                entity_ids.discard(entity_id)
+
+    def label(self, entity: DescribedEntity, languages: Sequence[str]) -> str | None:
+        """
+        :param languages: the languages to try, in order
+        :return: the text of the label of the entity in the first of the languages it has one, None if it has none
+        """
+        return self.get_term('labels', entity, languages)
+
+    def description(self, entity: DescribedEntity, languages: Sequence[str]) -> str | None:
+        return self.get_term('descriptions', entity, languages)
+
+    def get_term(self, kind: str, entity: DescribedEntity, languages: Sequence[str]) -> str | None:
+        """
+        :param kind: 'labels' or 'descriptions'
+        """
+        prefetched = getattr(entity, '_prefetched_objects_cache', {}).get(kind)
+        if prefetched is not None:
+            texts = {term.language: term.text for term in prefetched}
+        else:
+            texts = self._get_texts(kind, entity.pk, languages)
+        return next((texts[language] for language in languages if language in texts), None)
+
+    def _get_texts(self, kind: str, entity_id: int, languages: Sequence[str]) -> dict[str, str]:
+        scope = getattr(self._local, 'scope', None)
+        if scope is None:
+            return dict(TERM_MODELS[kind].objects.filter(described_entity_id=entity_id, language__in=languages)
+                        .values_list('language', 'text'))
+        missing = {language: scope.registered - scope.loaded.get(language, set()) | {entity_id}
+                   for language in languages if entity_id not in scope.loaded.get(language, ())}
+        if missing:
+            self._load(scope, missing)
+        return scope.terms.get((kind, entity_id), {})
+
+    @staticmethod
+    def _load(scope: _Scope, missing: dict[str, set[int]]) -> None:
+        """
+        Loads the labels and descriptions of the given entities, by language, with a single query.
+        """
+        entity_ids = set().union(*missing.values())
+        queries = [model.objects.filter(described_entity_id__in=entity_ids, language__in=missing)
+                   .values_list(Value(kind), 'described_entity_id', 'language', 'text')
+                   for kind, model in TERM_MODELS.items()]
+        for kind, entity_id, language, text in queries[0].union(*queries[1:], all=True):
+            if entity_id in missing[language]:
+                scope.terms.setdefault((kind, entity_id), {})[language] = text
+        for language, loaded in missing.items():
+            scope.loaded.setdefault(language, set()).update(loaded)
+
+
+label_resolver = LabelResolver()
@@ -0,0 +1,159 @@
+"""
+Rendering of EpiDoc (TEI) transcriptions in the Leiden conventions.
+
+The tree is walked once with an explicit stack, and the output is written into a list of parts joined at the end,
+so the rendering time is linear in the size of the transcription whatever its depth.
+"""
+from __future__ import annotations
+
+import re
+from collections.abc import Callable
+
+from lxml import etree
+
+# Tags replaced by a marker: their own text is not rendered.
+MARKER_TAGS = {'lb', 'gap', 'space', 'g'}
+
+
+def underdot(text: str) -> str:
+    return ''.join(c + ("\u0323" if not c.isspace() else "") for c in text)
+
+
+class LeidenRenderer:
+    """
+    Renders one transcription. Text transformations (<orig>, <unclear>) apply to the text nodes they enclose,
+    not to the markup generated for the nested tags.
+    """
+
+    def __init__(self):
+        self.parts: list[str] = []
+        # Text transformations of the open tags, outermost first.
+        self.transforms: list[Callable[[str], str]] = []
+
+    def write_text(self, text: str | None):
+        if not text:
+            return
+        for transform in reversed(self.transforms):
+            text = transform(text)
+        self.parts.append(text)
+
+    def render(self, root: etree._Element) -> str:
+        self.write_text(root.text)
+        # (element, state) pairs; state is None until the element is opened, then holds what closing it needs.
+        stack = [(child, None) for child in reversed(root)]
+        while stack:
+            el, state = stack.pop()
+            if state is None:
+                if el.tag == 'sic':
+                    # Neither the subtree nor the tail is rendered.
+                    continue
+                state = self.open(el)
+                stack.append((el, state))
+                stack.extend((child, None) for child in reversed(el))
+            else:
+                self.close(el, state)
+                self.write_text(el.tail)
+        return ''.join(self.parts)
+
+    def open(self, el: etree._Element) -> tuple:
+        """
+        Writes the beginning of the element and its text.
+        :return: what close() needs: the closing string and the position of the content in the parts
+        """
+        closing = ''
+        tag = el.tag
+        if tag == 'w' and not el.get("part", None):
+            w_type = el.get("type", "")
+            w_id = el.get("qid", "")
+            classes = f'tagged-element {"typed type-" + w_type if w_type else ""}'
+            if w_id:
+                self.parts.append(f'<a class="{classes}" href="/item/{w_id}">')
+                closing = '</a>'
+            else:
+                self.parts.append(f'<span class="{classes}">')
+                closing = '</span>'
+        elif tag == 'lb':
+            if int(el.attrib['n']) != 0:
+                if el.get('break') == "no" or el.get('type') == "worddiv":
+                    self.parts.append('-')
+                self.parts.append('<br>')
+        elif tag == 'orig':
+            self.transforms.append(str.upper)
+        elif tag == 'unclear':
+            self.transforms.append(underdot)
+        elif tag == 'gap':
+            res = ''
+            if 'quantity' in el.attrib:
+                res = "." * int(el.attrib['quantity'])
+            elif 'extent' in el.attrib:
+                res = "----"
+            if el.attrib['reason'] == 'lost':
+                res = f"[{res}]"
+            self.parts.append(res)
+        elif tag == 'del':
+            self.parts.append("〚")
+            closing = "〛"
+        elif tag == 'supplied':
+            reason = el.attrib['reason']
+            if reason == 'lost':
+                self.parts.append("[")
+                closing = "]"
+            elif reason == 'omitted':
+                self.parts.append("&#60;")
+                closing = "&#62;"
+        elif tag == 'surplus':
+            self.parts.append("{")
+            closing = "}"
+        elif tag == 'choice':
+            self.parts.append("&#60;")
+            closing = "&#62;"
+        elif tag == 'ex':
+            self.parts.append("(")
+            closing = "?)" if el.get('cert') == 'low' else ")"
+        elif tag == 'space':
+            self.parts.append('v.')
+        elif tag == 'g':
+            self.parts.append(f"(({el.attrib['type']}))")
+        start = len(self.parts)
+        if tag not in MARKER_TAGS:
+            self.write_text(el.text)
+        return closing, start
+
+    def close(self, el: etree._Element, state: tuple):
+        closing, start = state
+        if el.tag in ('orig', 'unclear'):
+            self.transforms.pop()
+        elif el.tag == 'del':
+            self.strip_brackets(start)
+        self.parts.append(closing)
+
+    def strip_brackets(self, start: int):
+        """
+        Removes the brackets enclosing the whole content written from the given position, if any.
+        """
+        first, last = start, len(self.parts) - 1
+        while first <= last and not self.parts[first]:
+            first += 1
+        while last >= first and not self.parts[last]:
+            last -= 1
+        if first <= last and self.parts[first][0] == '[' and self.parts[last][-1] == ']':
+            if first == last:
+                self.parts[first] = self.parts[first][1:-1]
+            else:
+                self.parts[first] = self.parts[first][1:]
+                self.parts[last] = self.parts[last][:-1]
+
+
+def render_leiden(value: str) -> str:
+    """
+    Renders a fragment of EpiDoc XML as HTML in the Leiden conventions.
+    :param value: the XML fragment, without a root element
+    :return: the HTML, not marked safe
+    """
+    root = etree.fromstring(f"<xml>{value}</xml>")
+    output = LeidenRenderer().render(root)
+    # Remove first <br>
+    if output.startswith('<br>'):
+        output = output[4:]
+    output = output.replace('\n', '')
+    return re.sub(r'](\s*)\[', r'\1', output)
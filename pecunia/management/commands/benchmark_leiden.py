@@ -0,0 +1,59 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from pecunia.leiden import render_leiden
+
+# Tags nested in turn in the deep synthetic inscriptions. <orig> and <unclear> are left out since their effects add up.
+NESTED_TAGS = [('supplied', ' reason="lost"'), ('del', ' rend="erasure"'), ('surplus', ''), ('w', ' part="I"'),
+               ('hi', ' rend="ligature"')]
+
+
+def synthetic_line(n: int) -> str:
+    return (f'<lb n="{n}"/><w type="name" qid="Q{n}">ἡ <unclear>βουλὴ</unclear></w> '
+            f'<supplied reason="lost">καὶ</supplied> <expan><abbr>δ</abbr><ex cert="low">ῆμος</ex></expan> '
+            f'<gap reason="lost" quantity="3" unit="character"/><choice><corr>ἔτους</corr><sic>ἔτος</sic></choice> '
+            f'<g type="denarius"/><space quantity="1" unit="character"/>\n')
+
+
+def synthetic_inscription(lines: int, depth: int) -> str:
+    """
+    Builds a transcription of the given number of lines, whose content is nested in the given number of tags.
+    """
+    tags = [NESTED_TAGS[i % len(NESTED_TAGS)] for i in range(depth)]
+    opening = ''.join(f'<{tag}{attributes}>' for tag, attributes in tags)
+    closing = ''.join(f'</{tag}>' for tag, _ in reversed(tags))
+    return opening + ''.join(synthetic_line(n) for n in range(1, lines + 1)) + closing
+
+
+class Command(BaseCommand):
+    help = ("Times the Leiden rendering of synthetic inscriptions of growing size. The time per line stays about the "
+            "same when the rendering is linear.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=int, default=1000,
+                            help="Lines of the smallest inscription, doubled at each step. Defaults to 1000.")
+        parser.add_argument('--steps', type=int, default=5, help="Number of sizes. Defaults to 5.")
+        parser.add_argument('--depth', type=int, default=100,
+                            help="Number of tags enclosing the lines, at most 250 as the XML parser limits the depth "
+                                 "of the documents. Defaults to 100.")
+        parser.add_argument('--repeat', type=int, default=3,
+                            help="Renderings per size, the fastest one is kept. Defaults to 3.")
+
+    def handle(self, *args, **options):
+        if options['lines'] < 1 or options['steps'] < 1 or options['repeat'] < 1:
+            raise CommandError("The lines, steps and repeat options must be positive.")
+        if not 0 <= options['depth'] <= 250:
+            raise CommandError("The depth must be between 0 and 250.")
+        lines = options['lines']
+        for _ in range(options['steps']):
+            inscription = synthetic_inscription(lines, options['depth'])
+            timings = []
+            for _ in range(options['repeat']):
+                start = time.perf_counter()
+                render_leiden(inscription)
+                timings.append(time.perf_counter() - start)
+            best = min(timings)
+            self.stdout.write(f"{lines} lines, {len(inscription) // 1024} KiB: {best * 1000:.1f} ms, "
+                              f"{best * 1e6 / lines:.2f} µs per line")
+            lines *= 2
@@ -0,0 +1,66 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from pecunia.export import DumpExporter, FORMATS, EXPORT_CHUNK_SIZE, DEFAULT_BASE_URI, open_output
+from pecunia.models import Item, Property
+
+ENTITY_MODELS = {'items': Item, 'properties': Property}
+
+
+class Command(BaseCommand):
+    help = ("Exports the entities as Wikibase JSON lines, N-Triples or CSV, compressed with gzip or bzip2 if the name "
+            "of the output ends with .gz or .bz2.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Path of the output, - for the standard output.")
+        parser.add_argument('--format', choices=list(FORMATS), default='json', help="Defaults to json.")
+        parser.add_argument('--entities', nargs='+', choices=list(ENTITY_MODELS), default=['properties', 'items'],
+                            help="Kinds of entities to export. Defaults to all of them.")
+        parser.add_argument('--class', dest='item_class', metavar='QID',
+                            help="Only exports the items that are instances of this class or of its subclasses.")
+        parser.add_argument('--min-revision', type=int, help="Only exports the entities with this revision or later.")
+        parser.add_argument('--modified-since', metavar='DATETIME',
+                            help="Only exports the entities modified since this ISO 8601 date and time.")
+        parser.add_argument('--base-uri', default=DEFAULT_BASE_URI,
+                            help=f"Base of the entity URIs. Defaults to {DEFAULT_BASE_URI}.")
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE,
+                            help=f"Number of entities read at once. Defaults to {EXPORT_CHUNK_SIZE}.")
+        parser.add_argument('--workers', type=int, default=1,
+                            help="Number of processes serializing the entities, by ranges of display ids. Defaults "
+                                 "to 1, 0 for the number of processors.")
+        parser.add_argument('--parts', action='store_true',
+                            help="Leaves the ranges in separate files along with a manifest, named after the output: "
+                                 "dump-00000.json.gz, ..., dump.manifest.json for dump.json.gz.")
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError("The chunk size must be positive.")
+        if options['workers'] < 0:
+            raise CommandError("The number of workers cannot be negative.")
+        if options['parts'] and options['path'] == '-':
+            raise CommandError("Parts cannot be written to the standard output.")
+        item_class = None
+        if options['item_class']:
+            try:
+                item_class = Item.objects.get(display_id=int(options['item_class'].upper().lstrip('Q')))
+            except (ValueError, Item.DoesNotExist):
+                raise CommandError(f"Unknown class: {options['item_class']}")
+        modified_since = None
+        if options['modified_since']:
+            modified_since = parse_datetime(options['modified_since'])
+            if modified_since is None:
+                raise CommandError(f"Invalid date and time: {options['modified_since']}")
+            if timezone.is_naive(modified_since):
+                modified_since = timezone.make_aware(modified_since)
+
+        exporter = DumpExporter(options['base_uri'], options['chunk_size'],
+                                tuple(ENTITY_MODELS[name] for name in dict.fromkeys(options['entities'])),
+                                item_class, options['min_revision'], modified_since)
+        if options['workers'] == 1 and not options['parts']:
+            with open_output(options['path']) as out:
+                count = exporter.export(out, options['format'])
+        else:
+            count = exporter.export_parallel(options['path'], options['format'], options['workers'] or None,
+                                             options['parts'])
+        (self.stderr if options['path'] == '-' else self.stdout).write(f"{count} entities exported")
@@ -0,0 +1,40 @@
+import os
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from pecunia.dump import DumpImporter, DEFAULT_BATCH_SIZE, open_dump
+
+
+class Command(BaseCommand):
+    help = ("Imports a Wikibase JSON entity dump, plain or compressed with gzip or bzip2. An interrupted import "
+            "resumes where it stopped when run again with the same source.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Path of the dump.")
+        parser.add_argument('--source', help="Name of the dump, identifying its progress and the mapping of its ids "
+                                             "across runs. Defaults to the name of the file.")
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                            help=f"Number of entities written per transaction. Defaults to {DEFAULT_BATCH_SIZE}.")
+        parser.add_argument('--restart', action='store_true',
+                            help="Reads the dump from its start. Entities already imported are skipped.")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("The batch size must be positive.")
+        try:
+            stream = open_dump(options['path'])
+        except OSError as e:
+            raise CommandError(e)
+        importer = DumpImporter(options['source'] or os.path.basename(options['path']), options['batch_size'])
+        if options['restart']:
+            importer.restart()
+        elif importer.dump.position:
+            self.stdout.write(f"Resuming after line {importer.dump.position}")
+        try:
+            with stream:
+                stats = importer.run(stream)
+        except (ValueError, ValidationError) as e:
+            raise CommandError(f"Import stopped after line {importer.dump.position}: {e}")
+        self.stdout.write(", ".join(f"{stats[key]} {key}" for key in
+                                    ('entities', 'statements', 'skipped records', 'skipped snaks', 'skipped terms')))
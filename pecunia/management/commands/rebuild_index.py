@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from pecunia.models import INDEXES
+
+
+class Command(BaseCommand):
+    help = "Recomputes materialized indexes from the statements."
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', metavar='index',
+                            help=f"Indexes to rebuild, among {', '.join(INDEXES)}. Defaults to all of them.")
+
+    def handle(self, *args, **options):
+        names = options['names'] or list(INDEXES)
+        unknown = [name for name in names if name not in INDEXES]
+        if unknown:
+            raise CommandError(f"Unknown index: {', '.join(unknown)}")
+        for name in names:
+            count = INDEXES[name].rebuild()
+            self.stdout.write(f"{name}: {count} entries")
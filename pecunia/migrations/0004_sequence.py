@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:26
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def create_display_id_sequences(apps, *_ignored):
+    sequence = apps.get_model('pecunia', 'Sequence')
+    for model_name in ('Item', 'Property'):
+        model = apps.get_model('pecunia', model_name)
+        last_id = model.objects.aggregate(largest=Max('display_id'))['largest'] or 0
+        sequence.objects.create(name=model_name.lower(), value=last_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pecunia', '0003_domain'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Sequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='item',
+            name='display_id',
+            field=models.IntegerField(blank=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='property',
+            name='display_id',
+            field=models.IntegerField(blank=True, unique=True),
+        ),
+        migrations.RunPython(create_display_id_sequences, migrations.RunPython.noop),
+    ]
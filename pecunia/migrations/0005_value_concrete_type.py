@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:29
+
+from django.db import migrations, models
+
+
+def fill_concrete_types(apps, *_ignored):
+    value = apps.get_model('pecunia', 'Value')
+    value.objects.update(concrete_type='value')
+    subclasses = [model for model in apps.get_app_config('pecunia').get_models()
+                  if not model._meta.proxy and value in model._meta.get_parent_list()]
+    # Deepest classes last, so that each value ends up with its most specific class.
+    for model in sorted(subclasses, key=lambda model: len(model._meta.get_parent_list())):
+        value.objects.filter(pk__in=model.objects.values('pk')).update(concrete_type=model._meta.model_name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pecunia', '0004_sequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='value',
+            name='concrete_type',
+            field=models.CharField(blank=True, editable=False, max_length=50),
+        ),
+        migrations.RunPython(fill_concrete_types, migrations.RunPython.noop),
+    ]
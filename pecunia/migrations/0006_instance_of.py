@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_instance_of(apps, *_ignored):
+    property_mapping = apps.get_model('pecunia', 'PropertyMapping')
+    statement = apps.get_model('pecunia', 'Statement')
+    instance_of = apps.get_model('pecunia', 'InstanceOf')
+    mapping = property_mapping.objects.filter(key='is_a', property__isnull=False).first()
+    if mapping is None:
+        return
+    rows = (statement.objects.filter(mainsnak__property_id=mapping.property_id, mainsnak__type=0,
+                                     mainsnak__value__isnull=False)
+            .values_list('pk', 'subject_id', 'mainsnak__value_id'))
+    instance_of.objects.bulk_create([instance_of(statement_id=pk, entity_id=subject_id, item_class_id=value_id)
+                                     for pk, subject_id, value_id in rows], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pecunia', '0005_value_concrete_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InstanceOf',
+            fields=[
+                ('statement', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='instance_of_entry', serialize=False, to='pecunia.statement')),
+                ('entity', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='instance_of', to='pecunia.entity')),
+                ('item_class', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='instances', to='pecunia.item')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['item_class', 'entity'], name='pecunia_ins_item_cl_c32444_idx')],
+            },
+        ),
+        migrations.RunPython(fill_instance_of, migrations.RunPython.noop),
+    ]
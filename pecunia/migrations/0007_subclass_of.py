@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:35
+
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F
+
+from pecunia.models.indexes import compute_closure
+
+
+def map_subclass_of(apps, *_ignored):
+    """
+    Maps the 'subclass of' property created by 0003_domain, and fills the closure from its statements.
+    """
+    label = apps.get_model('pecunia', 'Label')
+    property_mapping = apps.get_model('pecunia', 'PropertyMapping')
+    sequence = apps.get_model('pecunia', 'Sequence')
+    statement = apps.get_model('pecunia', 'Statement')
+    subclass_of = apps.get_model('pecunia', 'SubclassOf')
+
+    mapping = property_mapping.objects.filter(key='subclass_of').first()
+    if mapping is None:
+        prop_id = (label.objects.filter(language='en', text='subclass of', described_entity__property__isnull=False)
+                   .values_list('described_entity_id', flat=True).first())
+        if prop_id is None or property_mapping.objects.filter(property_id=prop_id).exists():
+            return
+        mapping = property_mapping.objects.create(key='subclass_of', property_id=prop_id)
+        # Historical models do not send the signals that invalidate the mapping registry.
+        if not sequence.objects.filter(name='mappings').update(value=F('value') + 1):
+            sequence.objects.create(name='mappings', value=1)
+
+    parents = defaultdict(set)
+    for child, parent in (statement.objects.filter(mainsnak__property_id=mapping.property_id, mainsnak__type=0,
+                                                   mainsnak__value__isnull=False)
+                          .values_list('subject_id', 'mainsnak__value_id')):
+        parents[child].add(parent)
+    closure = compute_closure(parents, list(parents))
+    subclass_of.objects.bulk_create([subclass_of(ancestor_id=ancestor, descendant_id=descendant, depth=depth)
+                                     for (ancestor, descendant), depth in closure.items()], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pecunia', '0006_instance_of'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubclassOf',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveIntegerField()),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='subclass_closure', to='pecunia.item')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='superclass_closure', to='pecunia.item')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['descendant', 'ancestor'], name='pecunia_sub_descend_f12fdb_idx')],
+                'unique_together': {('ancestor', 'descendant')},
+            },
+        ),
+        migrations.RunPython(map_subclass_of, migrations.RunPython.noop),
+    ]
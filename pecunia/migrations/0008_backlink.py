@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_backlinks(apps, *_ignored):
+    backlink = apps.get_model('pecunia', 'Backlink')
+    sources = (
+        ('Statement', 'mainsnak', 'pk', 'subject_id', 0),
+        ('Qualifier', 'snak', 'statement_id', 'statement__subject_id', 1),
+        ('ReferenceSnak', 'snak', 'reference__statement_id', 'reference__statement__subject_id', 2),
+    )
+    for model_name, snak, statement, subject, role in sources:
+        rows = (apps.get_model('pecunia', model_name).objects
+                .filter(**{f'{snak}__type': 0, f'{snak}__value__entity__isnull': False})
+                .values_list(f'{snak}_id', statement, subject, f'{snak}__value_id'))
+        backlink.objects.bulk_create([backlink(snak_id=snak_id, statement_id=statement_id, source_id=source_id,
+                                               target_id=target_id, role=role)
+                                      for snak_id, statement_id, source_id, target_id in rows], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pecunia', '0007_subclass_of'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Backlink',
+            fields=[
+                ('snak', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='backlink', serialize=False, to='pecunia.propertysnak')),
+                ('role', models.IntegerField(choices=[(0, 'mainsnak'), (1, 'qualifier'), (2, 'reference')])),
+                ('source', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='outgoing_links', to='pecunia.entity')),
+                ('statement', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='backlinks', to='pecunia.statement')),
+                ('target', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='incoming_links', to='pecunia.entity')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['target', 'source'], name='pecunia_bac_target__1b6f96_idx')],
+            },
+        ),
+        migrations.RunPython(fill_backlinks, migrations.RunPython.noop),
+    ]
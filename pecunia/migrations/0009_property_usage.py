@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_property_usage(apps, *_ignored):
+    statement = apps.get_model('pecunia', 'Statement')
+    property_usage = apps.get_model('pecunia', 'PropertyUsage')
+    property_value_usage = apps.get_model('pecunia', 'PropertyValueUsage')
+    rows = (statement.objects.order_by().values('mainsnak__property_id').annotate(n=Count('pk'))
+            .values_list('mainsnak__property_id', 'n'))
+    property_usage.objects.bulk_create([property_usage(property_id=prop_id, count=n) for prop_id, n in rows],
+                                       batch_size=1000)
+    rows = (statement.objects.filter(mainsnak__type=0, mainsnak__value__entity__isnull=False)
+            .order_by().values('mainsnak__property_id', 'mainsnak__value_id').annotate(n=Count('pk'))
+            .values_list('mainsnak__property_id', 'mainsnak__value_id', 'n'))
+    property_value_usage.objects.bulk_create([property_value_usage(property_id=prop_id, value_id=value_id, count=n)
+                                              for prop_id, value_id, n in rows], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pecunia', '0008_backlink'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PropertyUsage',
+            fields=[
+                ('property', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='usage', serialize=False, to='pecunia.property')),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PropertyValueUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('property', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='value_usages', to='pecunia.property')),
+                ('value', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='property_usages', to='pecunia.entity')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['property', '-count'], name='pecunia_pro_propert_5a6f75_idx')],
+                'unique_together': {('property', 'value')},
+            },
+        ),
+        migrations.RunPython(fill_property_usage, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pecunia', '0010_entity_revision'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='entity',
+            name='modified',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from pecunia.models.indexes import normalize_term, term_tokens
+
+
+def fill_term_index(apps, *_ignored):
+    term_index = apps.get_model('pecunia', 'TermIndex')
+    term_token = apps.get_model('pecunia', 'TermToken')
+    for term_type, model_name in enumerate(('Label', 'Alias', 'Description')):
+        rows = apps.get_model('pecunia', model_name).objects.values_list('pk', 'described_entity_id', 'language',
+                                                                          'text')
+        entries = [term_index(term_id=pk, entity_id=entity_id, language=language, type=term_type,
+                              text=normalize_term(text)[:255])
+                   for pk, entity_id, language, text in rows.iterator(chunk_size=1000)]
+        term_index.objects.bulk_create(entries, batch_size=1000)
+        term_token.objects.bulk_create([term_token(entry_id=entry.term_id, token=token[:64])
+                                        for entry in entries for token in term_tokens(entry.text)], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pecunia', '0011_entity_modified'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TermIndex',
+            fields=[
+                ('term', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_entry', serialize=False, to='pecunia.monolingualtextvalue')),
+                ('language', models.CharField(max_length=3)),
+                ('type', models.IntegerField(choices=[(0, 'label'), (1, 'alias'), (2, 'description')])),
+                ('text', models.CharField(db_index=True, max_length=255)),
+                ('entity', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='pecunia.describedentity')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TermToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(db_index=True, max_length=64)),
+                ('entry', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tokens', to='pecunia.termindex')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='termindex',
+            index=models.Index(fields=['entity', 'type'], name='pecunia_ter_entity__0dbfed_idx'),
+        ),
+        migrations.RunPython(fill_term_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:26
+
+from django.db import migrations, models
+
+
+def create_terms_sequence(apps, *_ignored):
+    apps.get_model('pecunia', 'Sequence').objects.get_or_create(name='terms')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pecunia', '0012_term_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TermChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField(db_index=True)),
+                ('entity_id', models.BigIntegerField()),
+            ],
+        ),
+        migrations.RunPython(create_terms_sequence, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pecunia', '0013_term_change'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DumpImport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=255, unique=True)),
+                ('position', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ImportedEntity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('external_id', models.CharField(max_length=64)),
+                ('imported', models.BooleanField(default=False)),
+                ('dump', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entities', to='pecunia.dumpimport')),
+                ('entity', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='pecunia.describedentity')),
+            ],
+            options={
+                'unique_together': {('dump', 'external_id')},
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:06
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pecunia', '0014_dump_import'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='entity',
+            name='modified',
+            field=models.DateTimeField(blank=True, default=django.utils.timezone.now, editable=False, null=True),
+        ),
+        migrations.AlterField(
+            model_name='entity',
+            name='revision',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
@@ -1,4 +1,7 @@
+from .sequences import *
 from .base import *
 from .datatypes import *
 from .mappings import *
-from .domain import *
\ No newline at end of file
+from .indexes import *
+from .domain import *
+from .imports import *
\ No newline at end of file
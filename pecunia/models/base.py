@@ -1,23 +1,180 @@
 from __future__ import annotations
 
-from django.core.exceptions import ValidationError, FieldDoesNotExist
-from django.db import models
+from collections import defaultdict
+from functools import cache
+from itertools import chain
+from typing import Iterable
+
+from django.core.exceptions import ValidationError, FieldDoesNotExist, ObjectDoesNotExist
+from django.db import models, router
 from django.db.models import OneToOneField
+from django.db.models.constants import LOOKUP_SEP
+from django.db.models.functions import Now
+from django.db.models.query import ModelIterable
 from django.db.models.fields.related_descriptors import ForwardManyToOneDescriptor
-from model_utils.managers import InheritanceManager
+from django.utils import timezone
+from model_utils.managers import InheritanceManagerMixin, InheritanceQuerySet
+
+from .sequences import Sequence, get_sequence_database
+
+
+class ValuePrefetchQuerySet(models.QuerySet):
+    """
+    QuerySet able to resolve the concrete values of the snaks reachable from its results once it is evaluated.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._value_lookups = ()
+
+    def prefetch_values(self, *lookups: str) -> ValuePrefetchQuerySet:
+        """
+        Works like prefetch_related, but for the polymorphic values of snaks: the values of all the snaks are resolved
+        in a constant number of queries, see prefetch_values().
+        :param lookups: paths from the objects of the queryset to snaks, e.g. 'mainsnak' or 'qualifiers__snak';
+        none if the queryset returns snaks
+        """
+        clone = self.prefetch_related(*lookups) if lookups else self._chain()
+        clone._value_lookups = self._value_lookups + (lookups or ('',))
+        return clone
+
+    def _clone(self):
+        clone = super()._clone()
+        clone._value_lookups = self._value_lookups
+        return clone
+
+    def _fetch_all(self):
+        first_fetch = self._result_cache is None
+        super()._fetch_all()
+        if first_fetch and self._value_lookups and issubclass(self._iterable_class, ModelIterable):
+            prefetch_values(chain.from_iterable(follow_lookup(self._result_cache, lookup)
+                                                for lookup in self._value_lookups), self.db)
+
+
+class ValueQuerySet(ValuePrefetchQuerySet, InheritanceQuerySet):
+    """
+    QuerySet of values, able to select their subclasses and to resolve the values of the snaks of their statements.
+    """
+
+
+class ValueManager(InheritanceManagerMixin, models.Manager.from_queryset(ValueQuerySet)):
+    _queryset_class = ValueQuerySet
+
+
+def follow_lookup(objs: Iterable[models.Model], lookup: str) -> list[models.Model]:
+    """
+    Returns the objects reachable from the given objects through a lookup such as 'qualifiers__snak', using the
+    prefetched or cached related objects when there are some.
+    """
+    objs = list(objs)
+    for part in lookup.split(LOOKUP_SEP) if lookup else []:
+        related_objs = []
+        for obj in objs:
+            try:
+                related = getattr(obj, part)
+            except ObjectDoesNotExist:
+                continue
+            if isinstance(related, models.Manager):
+                related_objs.extend(related.all())
+            elif related is not None:
+                related_objs.append(related)
+        objs = related_objs
+    return objs
+
+
+def prefetch_values(snaks: Iterable[PropertySnak], using: str | None = None) -> None:
+    """
+    Loads the concrete values of the given snaks and caches them on the snaks.
+    Instead of one select_subclasses() query per snak, which joins every table of the Value hierarchy, the concrete
+    types of all the values are found with one query, then each concrete type is loaded with one query.
+    :param snaks: the snaks, whose values are not loaded yet
+    :param using: the database alias to use
+    """
+    value_field = PropertySnak._meta.get_field('value')
+    pending = [snak for snak in snaks if snak.type == PropertySnak.Type.VALUE
+               and snak.value_id is not None and not value_field.is_cached(snak)]
+    if not pending:
+        return
+    values = resolve_values({snak.value_id for snak in pending}, using)
+    for snak in pending:
+        value_field.set_cached_value(snak, values.get(snak.value_id))
+
+
+def resolve_values(pks: Iterable[int], using: str | None = None) -> dict[int, Value]:
+    """
+    Loads values given their primary keys, as instances of their concrete classes.
+    The concrete class of each value is read from Value.concrete_type, then each concrete class is loaded with one
+    query on its own table.
+    :param pks: the primary keys of the values
+    :param using: the database alias to use
+    :return: the values, indexed by primary key
+    """
+    concrete_models = Value.get_concrete_models()
+    by_model = defaultdict(list)
+    untyped = []
+    for pk, concrete_type in Value.objects.using(using).filter(pk__in=pks).values_list('pk', 'concrete_type'):
+        if concrete_type in concrete_models:
+            by_model[concrete_models[concrete_type]].append(pk)
+        else:
+            untyped.append(pk)
+
+    values = {}
+    for model, model_pks in by_model.items():
+        related = [f.name for f in model._meta.concrete_fields if f.many_to_one and f.related_model is Item]
+        values.update(model._base_manager.using(using).select_related(*related).in_bulk(model_pks))
+    if untyped:
+        values.update(Value.objects.using(using).filter(pk__in=untyped).select_subclasses().in_bulk())
+    return values
 
 
 class InheritanceForwardManyToOneDescriptor(ForwardManyToOneDescriptor):
     def get_queryset(self, **hints):
         return self.field.remote_field.model.objects.db_manager(hints=hints).select_subclasses()
 
+    def get_object(self, instance):
+        """
+        Loads the related value from the table of its concrete class, instead of joining every subclass table.
+        """
+        model = self.field.remote_field.model
+        pk = getattr(instance, self.field.attname)
+        using = router.db_for_read(model, instance=instance)
+        if len(model.get_concrete_models()) == 1:
+            return model._base_manager.using(using).get(pk=pk)
+        try:
+            return resolve_values([pk], using)[pk]
+        except KeyError:
+            raise model.DoesNotExist(f"{model._meta.object_name} matching query does not exist.")
+
 
 class InheritanceForeignKey(models.ForeignKey):
     forward_related_accessor_class = InheritanceForwardManyToOneDescriptor
 
 
 class Value(models.Model):
-    objects = InheritanceManager()
+    objects = ValueManager()
+    # Model name of the concrete class of the value, so that it can be loaded without joining every subclass table.
+    concrete_type = models.CharField(max_length=50, blank=True, editable=False)
+
+    def save(self, *args, **kwargs):
+        if not self.concrete_type:
+            self.concrete_type = self.get_concrete_type()
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def get_concrete_type(cls) -> str:
+        return cls._meta.concrete_model._meta.model_name
+
+    @classmethod
+    @cache
+    def get_concrete_models(cls) -> dict[str, type[Value]]:
+        """
+        Returns the concrete subclasses of the class, including itself, indexed by their concrete type.
+        """
+        models_by_type = {cls.get_concrete_type(): cls._meta.concrete_model}
+        for subclass in cls.__subclasses__():
+            if not subclass._meta.abstract and not subclass._meta.proxy:
+                models_by_type |= subclass.get_concrete_models()
+        return models_by_type
 
     def get_datatype(self):
         raise NotImplementedError(f"{self.__class__.__name__} must implement get_datatype().")
@@ -36,8 +193,45 @@ class Value(models.Model):
 
 
 class Entity(Value):
+    # 1 at creation, then incremented by every write to the terms or the statements of the entity, see
+    # bump_revision(). Set from the field defaults, so that entities created in bulk have them too.
+    revision = models.PositiveIntegerField(default=1, editable=False)
+    # Time of the creation, then of the last revision. None for the entities created before it was recorded.
+    modified = models.DateTimeField(null=True, blank=True, editable=False, default=timezone.now)
+    _claim_index = None
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            # The revision is only written by bump_revision(), so that saving a stale instance cannot roll it back.
+            kwargs['update_fields'] = [f.name for f in self._meta.concrete_fields
+                                       if not f.primary_key and f.name not in ('revision', 'modified')]
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def bump_revision(cls, using: str | None = None, **lookups) -> None:
+        """
+        Increments the revision of the entities matching the given lookups, e.g. statements=statement_id.
+        """
+        Entity.objects.using(using).filter(**lookups).update(revision=models.F('revision') + 1, modified=Now())
+
+    def get_claims(self) -> dict[int, list[Statement]]:
+        """
+        Returns the statements of the entity grouped by property id.
+        The index is built on first access, with one query for the statements and their snaks and a constant number
+        of queries for the concrete values, then kept up to date by add_value and set_value.
+        :return: a dict mapping a property id to the statements using it, in creation order
+        """
+        if self._claim_index is None:
+            statements = self.statements.select_related('mainsnak__property').order_by('pk').prefetch_values('mainsnak')
+            index = defaultdict(list)
+            for statement in statements:
+                Statement.subject.field.set_cached_value(statement, self)
+                index[statement.mainsnak.property_id].append(statement)
+            self._claim_index = dict(index)
+        return self._claim_index
+
     def get_value(self, prop: Property) -> Value | None:
-        statements = self.statements.filter(mainsnak__property=prop)
+        statements = self.get_claims().get(prop.pk)
         # FIXME changer le zéro
         return statements[0].mainsnak.value if statements else None
 
@@ -54,22 +248,27 @@ class Entity(Value):
         statement = Statement(subject=self, mainsnak=snak, rank=rank)
         statement.clean_fields()
         statement.save()
+        if self._claim_index is not None:
+            self._claim_index.setdefault(prop.pk, []).append(statement)
         return statement
 
     def set_value(self, prop: Property, value: Value) -> None:
-        statement = self.statements.filter(mainsnak__property=prop)
+        statements = self.get_claims().get(prop.pk)
         # TODO quel comportement s’il y a plusieurs statements ?
-        if statement:
-            statement[0].mainsnak.value = value
-            statement[0].mainsnak.save()
+        if statements:
+            statements[0].mainsnak.value = value
+            statements[0].mainsnak.save()
 
     def add_or_set_value(self, prop: Property, value: Value):
-        statements = self.statements.filter(mainsnak__property=prop)
-        if statements:
+        if self.get_claims().get(prop.pk):
             self.set_value(prop, value)
         else:
             self.add_value(prop, value)
 
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using, fields, from_queryset)
+        self._claim_index = None
+
     def delete(self, using=None, keep_parents=False):
         
         super().delete(using, keep_parents)
@@ -80,7 +279,27 @@ class DescribedEntity(Entity):
         return self.labels.all()
 
     def get_label(self, language: str):
-        return self.labels.get(language=language)
+        return self.get_term('labels', language)
+
+    def get_description(self, language: str):
+        return self.get_term('descriptions', language)
+
+    def get_term(self, kind: str, language: str):
+        """
+        Returns the term of the given kind in the given language.
+        No query is made if the terms of this kind have been prefetched.
+        :param kind: 'labels' or 'descriptions'
+        :param language: language code of the term
+        :raise ObjectDoesNotExist: if there is no such term
+        """
+        manager = getattr(self, kind)
+        prefetched = getattr(self, '_prefetched_objects_cache', {})
+        if kind not in prefetched:
+            return manager.get(language=language)
+        for term in prefetched[kind]:
+            if term.language == language:
+                return term
+        raise manager.model.DoesNotExist(f"{self} has no {kind} in '{language}'")
 
     def set_label(self, language: str, text: str) -> None:
         """
@@ -89,6 +308,7 @@ class DescribedEntity(Entity):
         :param language: language code of the label
         :param text: value of the label
         """
+        getattr(self, '_prefetched_objects_cache', {}).pop('labels', None)
         if self.labels.filter(language=language).exists():
             label = self.labels.get(language=language)
             label.text = text
@@ -97,6 +317,7 @@ class DescribedEntity(Entity):
             self.labels.create(language=language, text=text)
 
     def set_description(self, language: str, text: str) -> None:
+        getattr(self, '_prefetched_objects_cache', {}).pop('descriptions', None)
         if self.descriptions.filter(language=language).exists():
             description = self.descriptions.get(language=language)
             description.text = text
@@ -111,16 +332,52 @@ class DescribedEntity(Entity):
     def pretty_display_id(self):
         raise NotImplementedError("DescribedEntity.pretty_display_id not implemented")
 
+    @classmethod
+    def reserve_display_ids(cls, count: int) -> range:
+        """
+        Reserves a block of display ids, to be assigned to entities before saving them.
+        They are reserved on the sequence database, so that the sequence is not locked until the current transaction
+        ends when that database is a connection of its own.
+        :param count: the number of display ids to reserve
+        :return: the reserved display ids
+        """
+        model = cls._meta.concrete_model
+        return Sequence.reserve(
+            model._meta.model_name,
+            count,
+            initial=lambda: model._base_manager.aggregate(largest=models.Max('display_id'))['largest'] or 0,
+            using=get_sequence_database()
+        )
+
+    @classmethod
+    def assign_display_ids(cls, entities: list[DescribedEntity]) -> None:
+        """
+        Gives reserved display ids to new entities. Saving them does not advance the sequence again.
+        """
+        for entity, display_id in zip(entities, cls.reserve_display_ids(len(entities))):
+            entity.display_id = display_id
+            entity._reserved_display_id = display_id
+
+    @classmethod
+    def advance_display_ids(cls, display_id: int) -> None:
+        """
+        Keeps a display id given explicitly from being reserved later on.
+        """
+        Sequence.advance(cls._meta.concrete_model._meta.model_name, display_id, using=get_sequence_database())
+
+    def _prepare_display_id(self) -> None:
+        if self.pk is None and self.display_id is None:
+            self.assign_display_ids([self])
+        elif self._state.adding and self.display_id is not None \
+                and self.display_id != getattr(self, '_reserved_display_id', None):
+            self.advance_display_ids(self.display_id)
+
 
 class Item(DescribedEntity):
-    display_id = models.IntegerField(default=1, unique=True)
+    display_id = models.IntegerField(unique=True, blank=True)
 
     def save(self, *args, **kwargs):
-        if self.pk is None:
-            last_id = Item.objects.all().aggregate(largest=models.Max('display_id'))['largest']
-
-            if last_id is not None:
-                self.display_id = last_id + 1
+        self._prepare_display_id()
 
         super().save(*args, **kwargs)
 
@@ -143,15 +400,11 @@ class Item(DescribedEntity):
 
 
 class Property(DescribedEntity):
-    display_id = models.IntegerField(default=1, unique=True)
+    display_id = models.IntegerField(unique=True, blank=True)
     data_type = models.ForeignKey('Datatype', on_delete=models.PROTECT, related_name='properties')
 
     def save(self, *args, **kwargs):
-        if self.pk is None:
-            last_id = Property.objects.all().aggregate(largest=models.Max('display_id'))['largest']
-
-            if last_id is not None:
-                self.display_id = last_id + 1
+        self._prepare_display_id()
 
         super(Property, self).save(*args, **kwargs)
 
@@ -164,6 +417,8 @@ class Property(DescribedEntity):
 
 
 class PropertySnak(models.Model):
+    objects = ValuePrefetchQuerySet.as_manager()
+
     class Type(models.IntegerChoices):
         VALUE = 0, "value"
         SOME_VALUE = 1, "somevalue"
@@ -225,6 +480,8 @@ class PropertySnak(models.Model):
 
 
 class Statement(models.Model):
+    objects = ValuePrefetchQuerySet.as_manager()
+
     class Rank(models.IntegerChoices):
         DEPRECATED = -1, "deprecated"
         NORMAL = 0, "normal"
@@ -243,15 +500,21 @@ class Statement(models.Model):
 
 
 class ReferenceRecord(models.Model):
+    objects = ValuePrefetchQuerySet.as_manager()
+
     statement = models.ForeignKey(Statement, on_delete=models.CASCADE, related_name='reference_records')
 
 
 class ReferenceSnak(models.Model):
+    objects = ValuePrefetchQuerySet.as_manager()
+
     reference = models.ForeignKey(ReferenceRecord, on_delete=models.CASCADE, related_name='snaks')
     snak = models.OneToOneField(PropertySnak, on_delete=models.CASCADE, related_name='references')
 
 
 class Qualifier(models.Model):
+    objects = ValuePrefetchQuerySet.as_manager()
+
     statement = models.ForeignKey(Statement, on_delete=models.CASCADE, related_name='qualifiers')
     snak = models.ForeignKey(PropertySnak, on_delete=models.CASCADE)
 
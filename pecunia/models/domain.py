@@ -2,15 +2,12 @@ from __future__ import annotations
 
 from django.db import models
 
-from pecunia.models import Item, PropertyMapping, ItemMapping, MonolingualTextValue
+from pecunia.models import Item, PropertyMapping, ItemMapping, MonolingualTextValue, Statement, instance_of_q
 
 
 class DocumentManager(models.Manager):
     def get_queryset(self):
-        return super().get_queryset().filter(
-            statements__mainsnak__property=PropertyMapping.get('is_a'),
-            statements__mainsnak__value=ItemMapping.get('document')
-        )
+        return super().get_queryset().filter(instance_of_q(ItemMapping.get('document'))).distinct()
 
 
 class Document(Item):
@@ -31,15 +28,19 @@ class Document(Item):
 
     @classmethod
     def get_by_id(cls, display_id: int) -> Document:
-        return cls.objects.get(display_id=display_id,
-                               statements__mainsnak__property=PropertyMapping.get('is_a'),
-                               statements__mainsnak__value=ItemMapping.get('document'))
+        return cls.objects.get(display_id=display_id)
 
     def set_title(self, title) -> None:
         self.add_or_set_value(PropertyMapping.get('title'), title)
 
     def get_title(self) -> MonolingualTextValue:
-        return self.statements.get(mainsnak__property=PropertyMapping.get('title')).mainsnak.value
+        """
+        :raise Statement.DoesNotExist: if the document has no title
+        """
+        statements = self.get_claims().get(PropertyMapping.get('title').pk)
+        if not statements:
+            raise Statement.DoesNotExist(f"{self} has no title")
+        return statements[0].mainsnak.value
 
     def set_author(self, author) -> None:
         self.add_or_set_value(PropertyMapping.get('author'), author)
@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+from django.db import models
+
+from pecunia.models import DescribedEntity
+
+
+class DumpImport(models.Model):
+    """
+    Progress of the import of an entity dump (see pecunia.dump), so that an interrupted import can be resumed.
+    """
+    source = models.CharField(max_length=255, unique=True)
+    # Number of lines of the dump already imported.
+    position = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.source} ({self.position})"
+
+
+class ImportedEntity(models.Model):
+    """
+    Local entity standing for an entity id of a dump.
+    An entity referenced before its own record is read is created empty, then completed when its record is imported.
+    """
+    dump = models.ForeignKey(DumpImport, on_delete=models.CASCADE, related_name='entities')
+    external_id = models.CharField(max_length=64)
+    entity = models.ForeignKey(DescribedEntity, on_delete=models.CASCADE, related_name='+')
+    # False as long as the record of the entity has not been imported.
+    imported = models.BooleanField(default=False)
+
+    class Meta:
+        unique_together = ('dump', 'external_id')
@@ -0,0 +1,691 @@
+from __future__ import annotations
+
+import re
+import unicodedata
+from collections import Counter, defaultdict, deque
+from typing import Iterable
+
+from django.db import models, router, transaction
+from django.db.models import Count, Q
+
+from .base import Entity, DescribedEntity, Item, Property, PropertySnak, Statement, Qualifier, ReferenceSnak
+from .datatypes import MonolingualTextValue, Label, Alias, Description
+from .mappings import PropertyMapping, UnknownMappingException
+from .sequences import Sequence
+
+REBUILD_BATCH_SIZE = 1000
+
+
+def get_property_id(key: str) -> int | None:
+    """
+    :return: the primary key of the property mapped to the given key, None if the mapping does not exist
+    """
+    try:
+        prop = PropertyMapping.get(key)
+    except UnknownMappingException:
+        return None
+    return prop.pk if prop else None
+
+
+class InstanceOf(models.Model):
+    """
+    Materialized 'is a' statements: one row per statement stating that an entity is an instance of an item, so that
+    the members of a class can be listed with a single indexed query.
+    Rows are kept up to date when statements are saved (see pecunia.signals) and by EntityBulkWriter, and deleted
+    along with their statement. The property of a snak is not expected to change once it is saved.
+    """
+    statement = models.OneToOneField(Statement, on_delete=models.CASCADE, primary_key=True,
+                                     related_name='instance_of_entry')
+    entity = models.ForeignKey(Entity, on_delete=models.CASCADE, related_name='instance_of')
+    item_class = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='instances')
+
+    class Meta:
+        indexes = [models.Index(fields=['item_class', 'entity'])]
+
+    @classmethod
+    def entries_for(cls, statements: Iterable[Statement]) -> list[InstanceOf]:
+        """
+        Builds the unsaved entries for the given statements, whose main snaks must be loaded.
+        """
+        prop_id = get_property_id('is_a')
+        return [cls(statement=statement, entity_id=statement.subject_id, item_class_id=statement.mainsnak.value_id)
+                for statement in statements
+                if prop_id is not None and cls._is_item_snak(statement.mainsnak, prop_id)]
+
+    @classmethod
+    def sync(cls, statement: Statement) -> None:
+        """
+        Creates, updates or deletes the entry of the given statement.
+        """
+        entries = cls.entries_for([statement])
+        if entries:
+            cls.objects.update_or_create(statement=statement, defaults={'entity_id': entries[0].entity_id,
+                                                                        'item_class_id': entries[0].item_class_id})
+        else:
+            cls.objects.filter(statement=statement).delete()
+
+    @classmethod
+    def sync_snak(cls, snak: PropertySnak) -> None:
+        """
+        Updates the entry of the statement whose main snak is the given one, after its value has changed.
+        """
+        prop_id = get_property_id('is_a')
+        if prop_id is not None and snak.property_id == prop_id:
+            statement = Statement.objects.filter(mainsnak=snak).select_related('mainsnak').first()
+            if statement is not None:
+                cls.sync(statement)
+
+    @classmethod
+    def rebuild(cls, using: str | None = None) -> int:
+        """
+        Recomputes the whole table from the statements.
+        :return: the number of entries
+        """
+        using = using or router.db_for_write(cls)
+        with transaction.atomic(using=using):
+            cls.objects.using(using).all().delete()
+            prop_id = get_property_id('is_a')
+            if prop_id is None:
+                return 0
+            rows = (Statement.objects.using(using)
+                    .filter(mainsnak__property_id=prop_id, mainsnak__type=PropertySnak.Type.VALUE)
+                    .values_list('pk', 'subject_id', 'mainsnak__value_id'))
+            entries = [cls(statement_id=pk, entity_id=subject_id, item_class_id=value_id)
+                       for pk, subject_id, value_id in rows.iterator(chunk_size=REBUILD_BATCH_SIZE)]
+            cls.objects.using(using).bulk_create(entries, batch_size=REBUILD_BATCH_SIZE)
+        return len(entries)
+
+    @staticmethod
+    def _is_item_snak(snak: PropertySnak, prop_id: int) -> bool:
+        return snak.property_id == prop_id and snak.type == PropertySnak.Type.VALUE and snak.value_id is not None
+
+    def __str__(self):
+        return f"{self.entity_id} is a {self.item_class_id}"
+
+
+def compute_closure(parents: dict[int, Iterable[int]], descendants: Iterable[int]) -> dict[tuple[int, int], int]:
+    """
+    Computes the ancestors of the given classes with a breadth-first search, which terminates on cycles.
+    :param parents: the direct superclasses of each class; it must contain every class reachable from descendants
+    :param descendants: the classes whose ancestors are computed
+    :return: the length of the shortest path for each (ancestor, descendant) pair; a class is never its own ancestor
+    """
+    closure = {}
+    for descendant in descendants:
+        depths = {descendant: 0}
+        queue = deque([descendant])
+        while queue:
+            current = queue.popleft()
+            for parent in parents.get(current, ()):
+                if parent not in depths:
+                    depths[parent] = depths[current] + 1
+                    closure[parent, descendant] = depths[parent]
+                    queue.append(parent)
+    return closure
+
+
+class SubclassOf(models.Model):
+    """
+    Transitive closure of the 'subclass of' statements: one row per pair of items such that descendant is a direct or
+    indirect subclass of ancestor, with the length of the shortest path between them.
+    Only the rows of the changed class and of its subclasses are recomputed when a 'subclass of' statement changes.
+    """
+    ancestor = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='subclass_closure')
+    descendant = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='superclass_closure')
+    depth = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ('ancestor', 'descendant')
+        indexes = [models.Index(fields=['descendant', 'ancestor'])]
+
+    @classmethod
+    def edge_subjects(cls, statements: Iterable[Statement]) -> set[int]:
+        """
+        :return: the subjects of the given statements stating that their subject is a subclass of an item
+        """
+        prop_id = get_property_id('subclass_of')
+        if prop_id is None:
+            return set()
+        return {statement.subject_id for statement in statements
+                if InstanceOf._is_item_snak(statement.mainsnak, prop_id)}
+
+    @classmethod
+    def sync_snak(cls, snak: PropertySnak) -> None:
+        """
+        Updates the ancestors of the subject of the statement whose main snak is the given one, after its value has
+        changed.
+        """
+        prop_id = get_property_id('subclass_of')
+        if prop_id is not None and snak.property_id == prop_id:
+            cls.refresh(Statement.objects.filter(mainsnak=snak).values_list('subject_id', flat=True))
+
+    @classmethod
+    def refresh(cls, class_ids: Iterable[int], using: str | None = None) -> None:
+        """
+        Recomputes the ancestors of the given classes and of all their subclasses, after a change of their
+        'subclass of' statements.
+        """
+        using = using or router.db_for_write(cls)
+        prop_id = get_property_id('subclass_of')
+        affected = set(class_ids)
+        if prop_id is None or not affected:
+            return
+        with transaction.atomic(using=using):
+            affected |= set(cls.objects.using(using).filter(ancestor_id__in=affected)
+                            .values_list('descendant_id', flat=True))
+            parents = defaultdict(set)
+            frontier = set(affected)
+            while frontier:
+                for child, parent in cls._edges(prop_id, using).filter(subject_id__in=frontier):
+                    parents[child].add(parent)
+                visited = frontier | parents.keys()
+                frontier = {parent for node in frontier for parent in parents.get(node, ())} - visited
+                # Keep track of the classes already looked up, even those without superclass.
+                for node in visited:
+                    parents.setdefault(node, set())
+            cls.objects.using(using).filter(descendant_id__in=affected).delete()
+            cls.objects.using(using).bulk_create(
+                [cls(ancestor_id=ancestor, descendant_id=descendant, depth=depth)
+                 for (ancestor, descendant), depth in compute_closure(parents, affected).items()],
+                batch_size=REBUILD_BATCH_SIZE
+            )
+
+    @classmethod
+    def rebuild(cls, using: str | None = None) -> int:
+        """
+        Recomputes the whole table from the statements.
+        :return: the number of entries
+        """
+        using = using or router.db_for_write(cls)
+        with transaction.atomic(using=using):
+            cls.objects.using(using).all().delete()
+            prop_id = get_property_id('subclass_of')
+            if prop_id is None:
+                return 0
+            parents = defaultdict(set)
+            for child, parent in cls._edges(prop_id, using).iterator(chunk_size=REBUILD_BATCH_SIZE):
+                parents[child].add(parent)
+            closure = compute_closure(parents, list(parents))
+            cls.objects.using(using).bulk_create(
+                [cls(ancestor_id=ancestor, descendant_id=descendant, depth=depth)
+                 for (ancestor, descendant), depth in closure.items()],
+                batch_size=REBUILD_BATCH_SIZE
+            )
+        return len(closure)
+
+    @staticmethod
+    def _edges(prop_id: int, using: str):
+        return (Statement.objects.using(using)
+                .filter(mainsnak__property_id=prop_id, mainsnak__type=PropertySnak.Type.VALUE,
+                        mainsnak__value__isnull=False)
+                .values_list('subject_id', 'mainsnak__value_id'))
+
+    def __str__(self):
+        return f"{self.descendant_id} subclass of {self.ancestor_id} ({self.depth})"
+
+
+def instance_of_q(item_class: Item) -> Q:
+    """
+    Filters the entities that are instances of the given class or of any of its subclasses.
+    """
+    return (Q(instance_of__item_class=item_class) |
+            Q(instance_of__item_class__in=SubclassOf.objects.filter(ancestor=item_class).values('descendant')))
+
+
+class Backlink(models.Model):
+    """
+    Materialized links between entities: one row per snak whose value is an entity, from the subject of the statement
+    using the snak to this entity, so that "what links here" is a single indexed query.
+    Rows are kept up to date when snaks, statements, qualifiers and references are saved or deleted (see
+    pecunia.signals) and by EntityBulkWriter.
+    """
+
+    class Role(models.IntegerChoices):
+        MAINSNAK = 0, "mainsnak"
+        QUALIFIER = 1, "qualifier"
+        REFERENCE = 2, "reference"
+
+    snak = models.OneToOneField(PropertySnak, on_delete=models.CASCADE, primary_key=True, related_name='backlink')
+    statement = models.ForeignKey(Statement, on_delete=models.CASCADE, related_name='backlinks')
+    source = models.ForeignKey(Entity, on_delete=models.CASCADE, related_name='outgoing_links')
+    target = models.ForeignKey(Entity, on_delete=models.CASCADE, related_name='incoming_links')
+    role = models.IntegerField(choices=Role)
+
+    class Meta:
+        indexes = [models.Index(fields=['target', 'source'])]
+
+    @classmethod
+    def entry_for(cls, snak: PropertySnak, statement: Statement, role: int) -> Backlink | None:
+        """
+        Builds the unsaved entry for a snak used in the given statement, None if its value is not an entity.
+        """
+        if snak.type != PropertySnak.Type.VALUE or snak.value_id is None or not isinstance(snak.value, Entity):
+            return None
+        return cls(snak=snak, statement=statement, source_id=statement.subject_id, target_id=snak.value_id, role=role)
+
+    @classmethod
+    def link(cls, snak: PropertySnak, statement: Statement, role: int) -> None:
+        """
+        Creates or updates the entry of a snak that has just been attached to the given statement.
+        """
+        entry = cls.entry_for(snak, statement, role)
+        if entry is not None:
+            cls.objects.update_or_create(snak=snak, defaults={'statement': statement, 'source_id': entry.source_id,
+                                                              'target_id': entry.target_id, 'role': role})
+
+    @classmethod
+    def unlink(cls, snak_id: int) -> None:
+        cls.objects.filter(snak_id=snak_id).delete()
+
+    @classmethod
+    def sync_snak(cls, snak: PropertySnak) -> None:
+        """
+        Updates the entry of the given snak after its value has changed.
+        """
+        if snak.type != PropertySnak.Type.VALUE or snak.value_id is None or not isinstance(snak.value, Entity):
+            cls.unlink(snak.pk)
+        elif not cls.objects.filter(snak=snak).update(target_id=snak.value_id):
+            usage = cls._find_usage(snak)
+            if usage is not None:
+                cls.link(snak, *usage)
+
+    @staticmethod
+    def _find_usage(snak: PropertySnak) -> tuple[Statement, int] | None:
+        statement = Statement.objects.filter(mainsnak=snak).first()
+        if statement is not None:
+            return statement, Backlink.Role.MAINSNAK
+        qualifier = Qualifier.objects.filter(snak=snak).select_related('statement').first()
+        if qualifier is not None:
+            return qualifier.statement, Backlink.Role.QUALIFIER
+        reference = ReferenceSnak.objects.filter(snak=snak).select_related('reference__statement').first()
+        if reference is not None:
+            return reference.reference.statement, Backlink.Role.REFERENCE
+        return None
+
+    @classmethod
+    def rebuild(cls, using: str | None = None) -> int:
+        """
+        Recomputes the whole table from the statements, qualifiers and references.
+        :return: the number of entries
+        """
+        using = using or router.db_for_write(cls)
+        with transaction.atomic(using=using):
+            cls.objects.using(using).all().delete()
+            count = 0
+            sources = (
+                (Statement, 'mainsnak', 'pk', 'subject_id', cls.Role.MAINSNAK),
+                (Qualifier, 'snak', 'statement_id', 'statement__subject_id', cls.Role.QUALIFIER),
+                (ReferenceSnak, 'snak', 'reference__statement_id', 'reference__statement__subject_id',
+                 cls.Role.REFERENCE),
+            )
+            for model, snak, statement, subject, role in sources:
+                rows = (model.objects.using(using)
+                        .filter(**{f'{snak}__type': PropertySnak.Type.VALUE, f'{snak}__value__entity__isnull': False})
+                        .values_list(f'{snak}_id', statement, subject, f'{snak}__value_id'))
+                entries = [cls(snak_id=snak_id, statement_id=statement_id, source_id=source_id, target_id=target_id,
+                               role=role)
+                           for snak_id, statement_id, source_id, target_id
+                           in rows.iterator(chunk_size=REBUILD_BATCH_SIZE)]
+                cls.objects.using(using).bulk_create(entries, batch_size=REBUILD_BATCH_SIZE)
+                count += len(entries)
+        return count
+
+    def __str__(self):
+        return f"{self.source_id} --{self.get_role_display()}--> {self.target_id}"
+
+
+def add_to_counter(model: type[models.Model], fields: tuple[str, ...], counts: Counter, using: str) -> None:
+    """
+    Adds amounts to the count column of a counter table in a constant number of queries, creating the missing rows
+    and deleting the rows whose count drops to zero.
+    The existing rows are locked until the end of the transaction, so that concurrent writers cannot lose updates.
+    :param fields: the names of the fields identifying a row
+    :param counts: the amount to add to each row, by tuple of values of these fields
+    """
+    counts = {key: delta for key, delta in counts.items() if delta}
+    if not counts:
+        return
+    with transaction.atomic(using=using):
+        # Selects a superset of the rows, which is narrowed down below, rather than one condition per row.
+        candidates = model.objects.using(using).select_for_update().filter(
+            **{f'{field}__in': {key[i] for key in counts} for i, field in enumerate(fields)}
+        )
+        rows = {key: row for row in candidates if (key := tuple(getattr(row, f) for f in fields)) in counts}
+        for key, row in rows.items():
+            row.count += counts[key]
+        updated = [row for row in rows.values() if row.count > 0]
+        deleted = [row.pk for row in rows.values() if row.count <= 0]
+        created = [model(**dict(zip(fields, key)), count=delta) for key, delta in counts.items()
+                   if key not in rows and delta > 0]
+        if updated:
+            model.objects.using(using).bulk_update(updated, ['count'], batch_size=REBUILD_BATCH_SIZE)
+        if deleted:
+            model.objects.using(using).filter(pk__in=deleted).delete()
+        if created:
+            model.objects.using(using).bulk_create(created, batch_size=REBUILD_BATCH_SIZE)
+
+
+class PropertyUsage(models.Model):
+    """
+    Number of statements using each property as main snak property, so that the usage of a property can be counted
+    without scanning its statements.
+    Counts are kept up to date when statements are created or deleted (see pecunia.signals) and by EntityBulkWriter.
+    """
+    property = models.OneToOneField(Property, on_delete=models.CASCADE, primary_key=True, related_name='usage')
+    count = models.PositiveIntegerField(default=0)
+
+    @classmethod
+    def add(cls, statements: Iterable[Statement], sign: int = 1, using: str | None = None) -> None:
+        """
+        Counts the given statements, whose main snaks must be loaded, as new (sign=1) or deleted (sign=-1) usages.
+        """
+        using = using or router.db_for_write(cls)
+        statements = list(statements)
+        counts = Counter((s.mainsnak.property_id,) for s in statements)
+        add_to_counter(cls, ('property_id',), Counter({key: sign * n for key, n in counts.items()}), using)
+        PropertyValueUsage.add(statements, sign, using)
+
+    @classmethod
+    def remove(cls, statement_ids: Iterable[int], using: str | None = None) -> None:
+        """
+        Counts the given statements as deleted usages. Their properties and values are read from the database rather
+        than from instances which may be stale, so it must be called before the statements are deleted.
+        """
+        using = using or router.db_for_write(cls)
+        statement_ids = list(statement_ids)
+        counts = Counter(Statement.objects.using(using).filter(pk__in=statement_ids)
+                         .values_list('mainsnak__property_id'))
+        add_to_counter(cls, ('property_id',), Counter({key: -n for key, n in counts.items()}), using)
+        PropertyValueUsage.remove(statement_ids, using)
+
+    @classmethod
+    def get_count(cls, prop: Property) -> int:
+        return cls.objects.filter(property=prop).values_list('count', flat=True).first() or 0
+
+    @classmethod
+    def rebuild(cls, using: str | None = None) -> int:
+        """
+        Recomputes the whole table, and the one of the values, from the statements.
+        :return: the number of entries
+        """
+        using = using or router.db_for_write(cls)
+        with transaction.atomic(using=using):
+            cls.objects.using(using).all().delete()
+            rows = (Statement.objects.using(using).order_by().values('mainsnak__property_id')
+                    .annotate(n=Count('pk')).values_list('mainsnak__property_id', 'n'))
+            entries = [cls(property_id=prop_id, count=n) for prop_id, n in rows]
+            cls.objects.using(using).bulk_create(entries, batch_size=REBUILD_BATCH_SIZE)
+            PropertyValueUsage.rebuild(using)
+        return len(entries)
+
+    def __str__(self):
+        return f"{self.property_id} used by {self.count} statements"
+
+
+class PropertyValueUsage(models.Model):
+    """
+    Number of statements using each entity as value of each property, so that the most used values of a property
+    can be listed without scanning its statements.
+    Only the main snaks whose value is an entity are counted. Rows are maintained along with PropertyUsage, and when
+    the value of a main snak changes.
+    """
+    property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='value_usages')
+    value = models.ForeignKey(Entity, on_delete=models.CASCADE, related_name='property_usages')
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('property', 'value')
+        indexes = [models.Index(fields=['property', '-count'])]
+
+    @classmethod
+    def add(cls, statements: Iterable[Statement], sign: int = 1, using: str | None = None) -> None:
+        using = using or router.db_for_write(cls)
+        counts = Counter((s.mainsnak.property_id, s.mainsnak.value_id) for s in statements
+                         if Backlink.entry_for(s.mainsnak, s, Backlink.Role.MAINSNAK) is not None)
+        add_to_counter(cls, ('property_id', 'value_id'), Counter({key: sign * n for key, n in counts.items()}), using)
+
+    @classmethod
+    def remove(cls, statement_ids: Iterable[int], using: str | None = None) -> None:
+        """
+        Counts the given statements as deleted usages, reading their values from the backlinks of their main snaks.
+        """
+        using = using or router.db_for_write(cls)
+        counts = Counter(Backlink.objects.using(using)
+                         .filter(statement_id__in=statement_ids, role=Backlink.Role.MAINSNAK)
+                         .values_list('snak__property_id', 'target_id'))
+        add_to_counter(cls, ('property_id', 'value_id'), Counter({key: -n for key, n in counts.items()}), using)
+
+    @classmethod
+    def sync_snak(cls, snak: PropertySnak) -> None:
+        """
+        Moves the usage of the given main snak from its previous value to its new one.
+        It must be called before the backlink of the snak is updated, since the previous value is read from it.
+        """
+        using = router.db_for_write(cls)
+        previous = (Backlink.objects.filter(snak=snak, role=Backlink.Role.MAINSNAK)
+                    .values_list('target_id', flat=True).first())
+        statement = Statement.objects.filter(mainsnak=snak).first()
+        if statement is None:
+            return
+        counts = Counter()
+        if previous is not None:
+            counts[snak.property_id, previous] -= 1
+        if Backlink.entry_for(snak, statement, Backlink.Role.MAINSNAK) is not None:
+            counts[snak.property_id, snak.value_id] += 1
+        add_to_counter(cls, ('property_id', 'value_id'), counts, using)
+
+    @classmethod
+    def top(cls, prop: Property, limit: int) -> list[tuple[int, int]]:
+        """
+        :return: the (value id, count) pairs of the most used values of the given property, most used first
+        """
+        return list(cls.objects.filter(property=prop).order_by('-count', 'value_id')
+                    .values_list('value_id', 'count')[:limit])
+
+    @classmethod
+    def rebuild(cls, using: str | None = None) -> int:
+        using = using or router.db_for_write(cls)
+        with transaction.atomic(using=using):
+            cls.objects.using(using).all().delete()
+            rows = (Statement.objects.using(using)
+                    .filter(mainsnak__type=PropertySnak.Type.VALUE, mainsnak__value__entity__isnull=False)
+                    .order_by().values('mainsnak__property_id', 'mainsnak__value_id').annotate(n=Count('pk'))
+                    .values_list('mainsnak__property_id', 'mainsnak__value_id', 'n'))
+            entries = [cls(property_id=prop_id, value_id=value_id, count=n) for prop_id, value_id, n in rows]
+            cls.objects.using(using).bulk_create(entries, batch_size=REBUILD_BATCH_SIZE)
+        return len(entries)
+
+    def __str__(self):
+        return f"{self.property_id} --> {self.value_id} used by {self.count} statements"
+
+
+def normalize_term(text: str) -> str:
+    """
+    :return: the text casefolded, without accents nor diacritics (Greek ones included) and with single spaces, as
+    stored in the term index
+    """
+    decomposed = unicodedata.normalize('NFKD', text.casefold())
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return ' '.join(unicodedata.normalize('NFC', stripped).split())
+
+
+def term_tokens(text: str) -> list[str]:
+    """
+    :return: the distinct words of the normalized text, in order of appearance
+    """
+    return list(dict.fromkeys(re.findall(r'\w+', text)))
+
+
+class TermIndex(models.Model):
+    """
+    Normalized labels, aliases and descriptions (see normalize_term), one row per term, with their words in
+    TermToken, so that entities can be found by prefix of a term or of its words with indexed queries.
+    Rows are kept up to date when terms are saved (see pecunia.signals) and by EntityBulkWriter, and deleted along
+    with their term.
+    """
+
+    class Type(models.IntegerChoices):
+        # Also the order of the search results matching equally well.
+        LABEL = 0, "label"
+        ALIAS = 1, "alias"
+        DESCRIPTION = 2, "description"
+
+    TERM_MODELS = {Label: Type.LABEL, Alias: Type.ALIAS, Description: Type.DESCRIPTION}
+
+    term = models.OneToOneField(MonolingualTextValue, on_delete=models.CASCADE, primary_key=True,
+                                related_name='search_entry')
+    entity = models.ForeignKey(DescribedEntity, on_delete=models.CASCADE, related_name='search_terms')
+    language = models.CharField(max_length=3)
+    type = models.IntegerField(choices=Type)
+    text = models.CharField(max_length=255, db_index=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['entity', 'type'])]
+
+    @classmethod
+    def entry_for(cls, term: Label | Alias | Description) -> TermIndex:
+        return cls(term_id=term.pk, entity_id=term.described_entity_id, language=term.language,
+                   type=cls.TERM_MODELS[type(term)], text=normalize_term(term.text)[:255])
+
+    @classmethod
+    def add(cls, terms: Iterable[Label | Alias | Description], using: str | None = None) -> None:
+        """
+        Indexes terms that are not indexed yet.
+        """
+        using = using or router.db_for_write(cls)
+        terms = list(terms)
+        cls._insert(terms, using)
+        TermChange.log({term.described_entity_id for term in terms}, using)
+
+    @classmethod
+    def replace(cls, terms: Iterable[Label | Alias | Description], using: str | None = None) -> None:
+        """
+        Indexes terms again, after their text has changed.
+        """
+        using = using or router.db_for_write(cls)
+        terms = list(terms)
+        with transaction.atomic(using=using):
+            cls.objects.using(using).filter(term__in=[term.pk for term in terms]).delete()
+            cls.add(terms, using)
+
+    @classmethod
+    def _insert(cls, terms: list[Label | Alias | Description], using: str) -> None:
+        entries = [cls.entry_for(term) for term in terms]
+        cls.objects.using(using).bulk_create(entries, batch_size=REBUILD_BATCH_SIZE)
+        TermToken.objects.using(using).bulk_create(
+            [token for entry in entries for token in TermToken.entries_for(entry)], batch_size=REBUILD_BATCH_SIZE
+        )
+
+    @classmethod
+    def rebuild(cls, using: str | None = None) -> int:
+        """
+        Recomputes the whole table from the labels, aliases and descriptions.
+        :return: the number of entries
+        """
+        using = using or router.db_for_write(cls)
+        count = 0
+        with transaction.atomic(using=using):
+            cls.objects.using(using).all().delete()
+            for model in cls.TERM_MODELS:
+                terms = model.objects.using(using).only('described_entity_id', 'language', 'text')
+                batch = []
+                for term in terms.iterator(chunk_size=REBUILD_BATCH_SIZE):
+                    batch.append(term)
+                    if len(batch) == REBUILD_BATCH_SIZE:
+                        cls._insert(batch, using)
+                        count += len(batch)
+                        batch = []
+                cls._insert(batch, using)
+                count += len(batch)
+            TermChange.reset(using)
+        return count
+
+    def __str__(self):
+        return f"{self.entity_id} {self.get_type_display()} ({self.language}) {self.text}"
+
+
+class TermToken(models.Model):
+    """
+    The words of an indexed term, for word prefix search.
+    """
+    entry = models.ForeignKey(TermIndex, on_delete=models.CASCADE, related_name='tokens')
+    token = models.CharField(max_length=64, db_index=True)
+
+    @classmethod
+    def entries_for(cls, entry: TermIndex) -> list[TermToken]:
+        return [cls(entry_id=entry.term_id, token=token[:64]) for token in term_tokens(entry.text)]
+
+    def __str__(self):
+        return self.token
+
+
+class TermChange(models.Model):
+    """
+    Log of the entities whose terms have changed, by version of the terms (the 'terms' sequence), from which
+    process-local copies of the terms catch up (see pecunia.autocomplete).
+    Every version is logged with at least one row, except the versions that invalidate all the copies (see reset()),
+    so a copy that finds a version missing from the log must be reloaded.
+    """
+    VERSION_SEQUENCE = 'terms'
+    # Number of versions kept in the log. Older ones are deleted every PRUNE_INTERVAL versions; the copies of the terms
+    # which have not caught up with them are reloaded.
+    RETENTION = 10000
+    PRUNE_INTERVAL = 1000
+
+    version = models.BigIntegerField(db_index=True)
+    # Not a foreign key: the changes of deleted entities are logged too.
+    entity_id = models.BigIntegerField()
+
+    @classmethod
+    def log(cls, entity_ids: Iterable[int], using: str | None = None) -> None:
+        """
+        Logs a change to the terms of the given entities under a new version, once the current transaction commits.
+        The version is reserved in a short transaction of its own, so that the writers of terms do not wait for each
+        other on the version sequence until they commit. A change is not logged if the process stops in between.
+        """
+        entity_ids = set(entity_ids)
+        if entity_ids:
+            using = using or router.db_for_write(cls)
+            transaction.on_commit(lambda: cls._write(entity_ids, using), using=using)
+
+    @classmethod
+    def _write(cls, entity_ids: set[int], using: str) -> None:
+        # The rows are committed along with their version, so a copy which reads a version finds all its changes.
+        with transaction.atomic(using=using):
+            version = Sequence.reserve(cls.VERSION_SEQUENCE, using=using)[0]
+            cls.objects.using(using).bulk_create(
+                [cls(version=version, entity_id=entity_id) for entity_id in entity_ids], batch_size=REBUILD_BATCH_SIZE
+            )
+        if version % cls.PRUNE_INTERVAL == 0:
+            cls.prune(version - cls.RETENTION, using)
+
+    @classmethod
+    def prune(cls, version: int, using: str | None = None) -> int:
+        """
+        Deletes the log up to the given version. The copies older than that find versions missing from the log and
+        reload the terms.
+        :return: the number of deleted rows
+        """
+        return cls.objects.using(using or router.db_for_write(cls)).filter(version__lte=version).delete()[0]
+
+    @classmethod
+    def reset(cls, using: str | None = None) -> None:
+        """
+        Clears the log and makes all the copies reload the terms.
+        """
+        using = using or router.db_for_write(cls)
+        cls.objects.using(using).all().delete()
+        Sequence.reserve(cls.VERSION_SEQUENCE, using=using)
+
+    def __str__(self):
+        return f"{self.entity_id} changed in version {self.version}"
+
+
+# Indexes that can be rebuilt with the rebuild_index command, by name.
+INDEXES = {
+    'instance_of': InstanceOf,
+    'subclass_of': SubclassOf,
+    'backlinks': Backlink,
+    'property_usage': PropertyUsage,
+    'terms': TermIndex,
+}
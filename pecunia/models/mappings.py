@@ -1,19 +1,118 @@
 from __future__ import annotations
 
+import threading
+from contextlib import contextmanager
+
 from django.db import models
 
-from pecunia.models import Property, Item
+from pecunia.models import Property, Item, Sequence
 
 
 class UnknownMappingException(Exception):
     pass
 
 
+class MappingRegistry:
+    """
+    Process-local copy of the item and property mappings, which are read very often and almost never written.
+    The mappings are loaded once, then served from memory. Any write to a mapping clears the copy of the current
+    process and bumps a version number stored in the database. The other processes compare it to the version of their
+    copy once per request, or on every access outside of a request (see scope()).
+    """
+    VERSION_SEQUENCE = 'mappings'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # (version, {mapping class: (targets by key, keys by target pk)})
+        self._cache = None
+
+    def get(self, mapping: type[Mapping], key: str) -> models.Model | None:
+        """
+        :raise KeyError: if there is no mapping for the given key
+        :return: a new instance of the element associated with the given key
+        """
+        target = self._get_entries(mapping)[0][key]
+        if target is None:
+            return None
+        model, using, field_names, values = target
+        return model.from_db(using, field_names, values)
+
+    def has(self, mapping: type[Mapping], key: str) -> bool:
+        return key in self._get_entries(mapping)[0]
+
+    def get_key(self, mapping: type[Mapping], pk: int) -> str:
+        """
+        :raise KeyError: if the element with the given primary key is not mapped
+        """
+        return self._get_entries(mapping)[1][pk]
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._cache = None
+
+    @contextmanager
+    def scope(self):
+        """
+        Within the block, the version of the mappings is checked against the database at most once.
+        Every request runs in such a scope.
+        """
+        previous = getattr(self._local, 'scoped', False), getattr(self._local, 'checked', False)
+        self._local.scoped, self._local.checked = True, False
+        try:
+            yield
+        finally:
+            self._local.scoped, self._local.checked = previous
+
+    def start_scope(self) -> None:
+        self._local.scoped, self._local.checked = True, False
+
+    def end_scope(self) -> None:
+        self._local.scoped, self._local.checked = False, False
+
+    def _get_entries(self, mapping: type[Mapping]) -> tuple[dict, dict]:
+        cache = self._cache
+        version = None
+        if not (getattr(self._local, 'scoped', False) and getattr(self._local, 'checked', False)):
+            version = Sequence.current(self.VERSION_SEQUENCE)
+            self._local.checked = True
+            if cache is not None and cache[0] != version:
+                cache = None
+        if cache is None:
+            with self._lock:
+                if version is None:
+                    version = Sequence.current(self.VERSION_SEQUENCE)
+                cache = self._cache = (version, self._load())
+        return cache[1][mapping]
+
+    @staticmethod
+    def _load() -> dict[type[Mapping], tuple[dict, dict]]:
+        entries = {}
+        for mapping in Mapping.__subclasses__():
+            targets, keys = {}, {}
+            for row in mapping.objects.select_related(mapping.target_field):
+                target = getattr(row, mapping.target_field)
+                if target is None:
+                    targets[row.key] = None
+                    continue
+                fields = target._meta.concrete_fields
+                targets[row.key] = (target.__class__, target._state.db,
+                                    [f.attname for f in fields], [getattr(target, f.attname) for f in fields])
+                keys[target.pk] = row.key
+            entries[mapping] = (targets, keys)
+        return entries
+
+
+mapping_registry = MappingRegistry()
+
+
 class Mapping(models.Model):
     class Meta:
         abstract = True
 
     key = models.CharField(max_length=255, unique=True)
+    # Name of the field holding the mapped element.
+    target_field = None
 
     @classmethod
     def get(cls, key: str):
@@ -23,7 +122,10 @@ class Mapping(models.Model):
         :raise UnknownMappingException: if the mapping does not exist
         :return: the element associated with the given key
         """
-        raise NotImplementedError("Mapping.get not implemented")
+        try:
+            return mapping_registry.get(cls, key)
+        except KeyError:
+            raise UnknownMappingException(f"{cls._meta.verbose_name.capitalize()} '{key}' does not exist.")
 
     @classmethod
     def has(cls, key: str) -> bool:
@@ -32,7 +134,20 @@ class Mapping(models.Model):
         :param key: the key to check
         :return: True if there is a mapping, False otherwise
         """
-        return cls.objects.filter(key=key).exists()
+        return mapping_registry.has(cls, key)
+
+    @classmethod
+    def get_key(cls, element: models.Model) -> str:
+        """
+        Returns the key associated with the given element.
+        :param element: the mapped element
+        :raise UnknownMappingException: if the element is not mapped
+        :return: the key associated with the given element
+        """
+        try:
+            return mapping_registry.get_key(cls, element.pk)
+        except KeyError:
+            raise UnknownMappingException(f"{cls._meta.verbose_name.capitalize()} for '{element}' does not exist.")
 
 
 class ItemMapping(Mapping):
@@ -40,21 +155,7 @@ class ItemMapping(Mapping):
     Maps symbolic keys to be used in code to the corresponding item.
     """
     item = models.OneToOneField(Item, on_delete=models.PROTECT, blank=True, null=True)
-
-    @classmethod
-    def get(cls, key: str):
-        try:
-            return cls.objects.get(key=key).item
-        except cls.DoesNotExist:
-            raise UnknownMappingException(f"Item mapping '{key}' does not exist.")
-
-    @classmethod
-    def get_key(cls, item: Item) -> str:
-        try:
-            return cls.objects.get(item=item).key
-        except cls.DoesNotExist:
-            raise UnknownMappingException(f"Item mapping for '{item}' does not exist.")
-
+    target_field = 'item'
 
 
 class PropertyMapping(Mapping):
@@ -62,10 +163,4 @@ class PropertyMapping(Mapping):
     Maps symbolic keys to be used in code to the corresponding property.
     """
     property = models.OneToOneField(Property, on_delete=models.PROTECT, blank=True, null=True)
-
-    @classmethod
-    def get(cls, key: str):
-        try:
-            return cls.objects.get(key=key).property
-        except cls.DoesNotExist:
-            raise UnknownMappingException(f"Property mapping '{key}' does not exist.")
+    target_field = 'property'
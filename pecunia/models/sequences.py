@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+from typing import Callable
+
+from django.conf import settings
+from django.db import models, router, transaction, IntegrityError
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+SEQUENCE_DB_ALIAS = 'sequences'
+
+
+class Sequence(models.Model):
+    """
+    Named counter handing out increasing integers.
+    It replaces MAX() lookups for the allocation of identifiers: values are reserved with a single UPDATE, which
+    locks the row until the end of the current transaction, so concurrent allocations can never collide.
+    Sequences which are reserved from long transactions, such as the display ids, can be handled through a second
+    connection to the database (see get_sequence_database), so that their values are committed at once.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    value = models.BigIntegerField(default=0)
+
+    @classmethod
+    def reserve(cls, name: str, count: int = 1, initial: Callable[[], int] | None = None,
+                using: str | None = None) -> range:
+        """
+        Atomically reserves a block of consecutive values of a sequence.
+        :param name: the name of the sequence
+        :param count: the number of values to reserve
+        :param initial: returns the last value already in use if the sequence does not exist yet
+        :param using: the database of the sequence
+        :return: the reserved values
+        """
+        if count < 0:
+            raise ValueError(f"Cannot reserve {count} values of sequence '{name}'.")
+        if count == 0:
+            return range(0)
+
+        using = using or router.db_for_write(cls)
+        sequences = cls.objects.using(using)
+        with transaction.atomic(using=using):
+            if not sequences.filter(name=name).update(value=F('value') + count):
+                try:
+                    with transaction.atomic(using=using):
+                        sequences.create(name=name, value=(initial() if initial else 0) + count)
+                except IntegrityError:
+                    # The sequence has been created by a concurrent transaction in the meantime.
+                    sequences.filter(name=name).update(value=F('value') + count)
+            last = sequences.filter(name=name).values_list('value', flat=True).get()
+        return range(last - count + 1, last + 1)
+
+    @classmethod
+    def advance(cls, name: str, value: int, using: str | None = None) -> None:
+        """
+        Makes sure that a value, taken without being reserved, is never handed out by the sequence.
+        A sequence which does not exist yet is left alone, since it starts after the values already in use.
+        """
+        (cls.objects.using(using or router.db_for_write(cls)).filter(name=name, value__lt=value)
+         .update(value=Greatest(F('value'), value)))
+
+    @classmethod
+    def current(cls, name: str) -> int:
+        """
+        Returns the last value reserved in a sequence, 0 if the sequence does not exist.
+        """
+        return cls.objects.filter(name=name).values_list('value', flat=True).first() or 0
+
+    def __str__(self):
+        return f"{self.name} ({self.value})"
+
+
+def get_sequence_database() -> str:
+    """
+    :return: the 'sequences' database if it is configured, the database of the sequences otherwise
+    """
+    return SEQUENCE_DB_ALIAS if SEQUENCE_DB_ALIAS in settings.DATABASES else router.db_for_write(Sequence)
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import json
+from typing import Callable, Iterator
+
+from django.db.models import QuerySet
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.urls import replace_query_param
+
+STREAM_CHUNK_SIZE = 500
+
+
+def parse_positive_int(value: str | None, default: int | None = None, maximum: int | None = None) -> int | None:
+    """
+    :return: the given query parameter as a positive integer, capped by maximum; default if it is not one
+    """
+    if not value or not value.isdigit() or int(value) == 0:
+        return default
+    return min(int(value), maximum) if maximum else int(value)
+
+
+class DisplayIdCursorPagination(BasePagination):
+    """
+    Keyset pagination on display_id: a page is the entities whose display_id follows the cursor, so reading a page
+    costs the same whatever its position, and entities created meanwhile do not shift the pages.
+    The body is left untouched; the link to the next page is given in the Link header.
+    """
+    page_size = 100
+    max_page_size = 1000
+    cursor_query_param = 'after'
+    page_size_query_param = 'limit'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        limit = parse_positive_int(request.query_params.get(self.page_size_query_param), self.page_size,
+                                   self.max_page_size)
+        after = parse_positive_int(request.query_params.get(self.cursor_query_param))
+        if after is not None:
+            queryset = queryset.filter(display_id__gt=after)
+        page = list(queryset.order_by('display_id')[:limit + 1])
+        self.next_cursor = page[limit - 1].display_id if len(page) > limit else None
+        return page[:limit]
+
+    def get_next_link(self) -> str | None:
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        next_link = self.get_next_link()
+        return Response(data, headers={'Link': f'<{next_link}>; rel="next"'} if next_link else None)
+
+
+def iter_keyed_json(queryset: QuerySet, serialize: Callable[[list], list[dict]], key: str = 'id',
+                    chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Renders the entities of a queryset as a JSON object keyed by the given field of their representation, chunk by
+    chunk. The entities are read by display_id ranges, so that memory use does not depend on their number and the
+    first bytes are sent before the whole queryset is read.
+    :param serialize: returns the representations of a list of entities
+    """
+    encoder = JSONEncoder(ensure_ascii=False)
+    after = None
+    separator = '{'
+    while True:
+        chunk = queryset.filter(display_id__gt=after) if after is not None else queryset
+        chunk = list(chunk.order_by('display_id')[:chunk_size])
+        if not chunk:
+            break
+        after = chunk[-1].display_id
+        parts = []
+        for data in serialize(chunk):
+            parts.append(f'{separator}{json.dumps(str(data[key]))}:{encoder.encode(data)}')
+            separator = ','
+        yield ''.join(parts).encode()
+    yield b'{}' if separator == '{' else b'}'
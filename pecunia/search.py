@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+from typing import Iterable
+
+from django.db.models import Case, When, Value, Min, F, QuerySet, IntegerField
+from django.db.models.functions import Length
+
+from pecunia.models import DescribedEntity, TermIndex, TermToken, normalize_term, term_tokens
+
+DEFAULT_LIMIT = 25
+
+
+class TermSearch:
+    """
+    Finds described entities by their terms, using the term index (see TermIndex): a term matches a query if each
+    word of the query is the prefix of one of its words, accents, diacritics and case aside.
+    Results are ranked by how well their best term matches: the whole term, then a prefix of it, then some of its
+    words; labels before aliases before descriptions; shorter terms first.
+    """
+
+    def __init__(self, types: Iterable[int] = (TermIndex.Type.LABEL, TermIndex.Type.ALIAS),
+                 languages: Iterable[str] | None = None):
+        """
+        :param types: the types of terms to search
+        :param languages: the languages of the terms to search, all of them if None
+        """
+        self.types = list(types)
+        self.languages = list(languages) if languages is not None else None
+
+    def entries(self, query: str) -> QuerySet[TermIndex]:
+        """
+        :return: the index entries of the terms matching the query
+        """
+        entries = TermIndex.objects.filter(type__in=self.types)
+        if self.languages is not None:
+            entries = entries.filter(language__in=self.languages)
+        for token in term_tokens(normalize_term(query)):
+            entries = entries.filter(pk__in=TermToken.objects.filter(token__startswith=token[:64]).values('entry_id'))
+        return entries
+
+    def filter(self, queryset: QuerySet, query: str) -> QuerySet:
+        """
+        :return: the entities of the queryset having a term matching the query, each once
+        """
+        return queryset.filter(pk__in=self.entries(query).values('entity_id'))
+
+    def ranked_ids(self, query: str, limit: int = DEFAULT_LIMIT, queryset: QuerySet | None = None) -> list[int]:
+        """
+        :param queryset: the entities to search, all of them if None
+        :return: the primary keys of the best matching entities, best first
+        """
+        text = normalize_term(query)[:255]
+        entries = self.entries(query)
+        if queryset is not None:
+            entries = entries.filter(entity__in=queryset.values('pk'))
+        match = Case(When(text=text, then=Value(0)), When(text__startswith=text, then=Value(1)), default=Value(2),
+                     output_field=IntegerField())
+        rows = (entries.order_by().values('entity_id')
+                .annotate(rank=Min(match * len(TermIndex.Type) + F('type')), length=Min(Length('text')))
+                .order_by('rank', 'length', 'entity_id').values_list('entity_id', flat=True)[:limit])
+        return list(rows)
+
+    def search(self, queryset: QuerySet, query: str, limit: int = DEFAULT_LIMIT) -> list[DescribedEntity]:
+        """
+        :return: the best matching entities of the queryset, best first
+        """
+        ids = self.ranked_ids(query, limit, queryset)
+        entities = {entity.pk: entity for entity in queryset.filter(pk__in=ids)}
+        return [entities[pk] for pk in ids if pk in entities]
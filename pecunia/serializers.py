@@ -1,5 +1,6 @@
 from collections import defaultdict
 
+from django.db.models import Prefetch
 from rest_framework import serializers
 from rest_framework.relations import HyperlinkedIdentityField
 
@@ -7,6 +8,32 @@ from .models import Item, Property, Label, Description, Alias, Statement, Proper
     ReferenceSnak
 
 
+# Loads the statements of entities with their snaks, in a constant number of queries.
+CLAIM_PREFETCHES = (
+    Prefetch('statements', queryset=Statement.objects.select_related('mainsnak__property').order_by('pk')),
+    Prefetch('statements__qualifiers', queryset=Qualifier.objects.select_related('snak__property').order_by('pk')),
+    Prefetch('statements__reference_records', queryset=ReferenceRecord.objects.order_by('pk')),
+    Prefetch('statements__reference_records__snaks',
+             queryset=ReferenceSnak.objects.select_related('snak__property').order_by('pk')),
+)
+CLAIM_SNAKS = ('statements__mainsnak', 'statements__qualifiers__snak', 'statements__reference_records__snaks__snak')
+
+
+class PrefetchPlanMixin:
+    """
+    Serializer telling which related objects its fields read, so that they can be loaded along with the instances.
+    prefetch_plan maps a field to a function adding the needed select_related/prefetch_related to a queryset; only
+    the fields kept for the current request are planned.
+    """
+    prefetch_plan = {}
+
+    def plan_queryset(self, queryset):
+        for name in self.fields:
+            if name in self.prefetch_plan:
+                queryset = self.prefetch_plan[name](queryset)
+        return queryset
+
+
 class SingleValuePrefixedByLanguageField(serializers.ListSerializer):
     def to_representation(self, data):
         grouped = defaultdict(list)
@@ -129,7 +156,7 @@ class StatementSerializer(serializers.ModelSerializer):
         list_serializer_class = build_list_serializer(lambda item: item['mainsnak']['property'])
 
 
-class ItemSerializer(serializers.HyperlinkedModelSerializer):
+class ItemSerializer(PrefetchPlanMixin, serializers.HyperlinkedModelSerializer):
     labels = LabelSerializer(many=True, required=False, default=list(), read_only=True)
     descriptions = DescriptionSerializer(many=True, required=False, default=list(), read_only=True)
     aliases = AliasSerializer(many=True, required=False, default=list(), read_only=True)
@@ -137,6 +164,13 @@ class ItemSerializer(serializers.HyperlinkedModelSerializer):
     display_id = serializers.CharField(source='pretty_display_id')
     id = serializers.CharField(source='display_id')
 
+    prefetch_plan = {
+        'labels': lambda queryset: queryset.prefetch_related('labels'),
+        'descriptions': lambda queryset: queryset.prefetch_related('descriptions'),
+        'aliases': lambda queryset: queryset.prefetch_related('aliases'),
+        'claims': lambda queryset: queryset.prefetch_related(*CLAIM_PREFETCHES).prefetch_values(*CLAIM_SNAKS),
+    }
+
     class Meta:
         model = Item
         fields = ['id', 'display_id', 'labels', 'descriptions', 'aliases', 'claims']
@@ -161,7 +195,7 @@ class ItemSerializer(serializers.HyperlinkedModelSerializer):
             self.fields.pop('aliases', None)
 
 
-class PropertySerializer(serializers.HyperlinkedModelSerializer):
+class PropertySerializer(PrefetchPlanMixin, serializers.HyperlinkedModelSerializer):
     type = serializers.SlugRelatedField(read_only=True, slug_field='class_name', source='data_type')
     labels = LabelSerializer(many=True, required=False, default=list(), read_only=True)
     descriptions = DescriptionSerializer(many=True, required=False, default=list(), read_only=True)
@@ -169,6 +203,13 @@ class PropertySerializer(serializers.HyperlinkedModelSerializer):
     display_id = serializers.CharField(source='pretty_display_id')
     id = serializers.CharField(source='display_id')
 
+    prefetch_plan = {
+        'type': lambda queryset: queryset.select_related('data_type'),
+        'labels': lambda queryset: queryset.prefetch_related('labels'),
+        'descriptions': lambda queryset: queryset.prefetch_related('descriptions'),
+        'aliases': lambda queryset: queryset.prefetch_related('aliases'),
+    }
+
     class Meta:
         model = Property
         fields = ['id', 'display_id', 'type', 'labels', 'descriptions', 'aliases']
@@ -0,0 +1,155 @@
+from django.core.signals import request_started, request_finished
+from django.db.models.signals import post_save, pre_delete, post_delete
+from django.db.models import Q
+from django.db import transaction
+from django.dispatch import receiver
+
+from pecunia.autocomplete import autocomplete_index
+from pecunia.labels import label_resolver
+from pecunia.models import ItemMapping, PropertyMapping, Sequence, MappingRegistry, mapping_registry, Statement, \
+    PropertySnak, InstanceOf, SubclassOf, Backlink, Qualifier, ReferenceSnak, PropertyUsage, PropertyValueUsage, \
+    Entity, Label, Description, Alias, ReferenceRecord, TermIndex, TermChange
+
+
+@receiver(request_started)
+def start_mapping_scope(**_ignored):
+    mapping_registry.start_scope()
+
+
+@receiver(request_finished)
+def end_mapping_scope(**_ignored):
+    mapping_registry.end_scope()
+
+
+@receiver(request_started)
+def start_label_scope(**_ignored):
+    label_resolver.start_scope()
+
+
+@receiver(request_finished)
+def end_label_scope(**_ignored):
+    label_resolver.end_scope()
+
+
+@receiver(post_save, sender=ItemMapping)
+@receiver(post_save, sender=PropertyMapping)
+@receiver(post_delete, sender=ItemMapping)
+@receiver(post_delete, sender=PropertyMapping)
+def invalidate_mappings(**_ignored):
+    Sequence.reserve(MappingRegistry.VERSION_SEQUENCE)
+    mapping_registry.invalidate()
+
+
+@receiver(post_save, sender=Statement)
+def index_statement(instance, created, raw=False, **_ignored):
+    if not raw:
+        if created:
+            PropertyUsage.add([instance])
+        InstanceOf.sync(instance)
+        SubclassOf.refresh(SubclassOf.edge_subjects([instance]))
+        Backlink.link(instance.mainsnak, instance, Backlink.Role.MAINSNAK)
+
+
+@receiver(pre_delete, sender=Statement)
+def uncount_statement(instance, using, **_ignored):
+    # Read from the database before the statement and its backlinks go, since the instance may be stale.
+    PropertyUsage.remove([instance.pk], using)
+
+
+@receiver(post_delete, sender=Statement)
+def unindex_statement(instance, **_ignored):
+    SubclassOf.refresh(SubclassOf.edge_subjects([instance]))
+
+
+@receiver(post_save, sender=PropertySnak)
+def index_snak(instance, created, raw=False, **_ignored):
+    # A new snak is not used by any statement yet.
+    if not created and not raw:
+        InstanceOf.sync_snak(instance)
+        SubclassOf.sync_snak(instance)
+        # The previous value is read from the backlink, which must not be updated yet.
+        PropertyValueUsage.sync_snak(instance)
+        Backlink.sync_snak(instance)
+
+
+@receiver(post_save, sender=Qualifier)
+def index_qualifier(instance, raw=False, **_ignored):
+    if not raw:
+        Backlink.link(instance.snak, instance.statement, Backlink.Role.QUALIFIER)
+
+
+@receiver(post_save, sender=ReferenceSnak)
+def index_reference(instance, raw=False, **_ignored):
+    if not raw:
+        Backlink.link(instance.snak, instance.reference.statement, Backlink.Role.REFERENCE)
+
+
+@receiver(post_delete, sender=Qualifier)
+@receiver(post_delete, sender=ReferenceSnak)
+def unindex_snak_usage(instance, **_ignored):
+    Backlink.unlink(instance.snak_id)
+
+
+@receiver(post_save, sender=Label)
+@receiver(post_save, sender=Description)
+@receiver(post_save, sender=Alias)
+def index_term(instance, created, raw=False, **_ignored):
+    # Entries are deleted along with their term.
+    if not raw:
+        if created:
+            TermIndex.add([instance])
+        else:
+            TermIndex.replace([instance])
+        transaction.on_commit(autocomplete_index.expire)
+
+
+@receiver(post_delete, sender=Label)
+@receiver(post_delete, sender=Description)
+@receiver(post_delete, sender=Alias)
+def unindex_term(instance, **_ignored):
+    TermChange.log([instance.described_entity_id])
+    transaction.on_commit(autocomplete_index.expire)
+
+
+@receiver(post_save, sender=Label)
+@receiver(post_save, sender=Description)
+@receiver(post_save, sender=Alias)
+@receiver(post_delete, sender=Label)
+@receiver(post_delete, sender=Description)
+@receiver(post_delete, sender=Alias)
+def revise_term_entity(instance, raw=False, **_ignored):
+    if not raw:
+        Entity.bump_revision(pk=instance.described_entity_id)
+        label_resolver.forget(instance.described_entity_id)
+
+
+@receiver(post_save, sender=Statement)
+@receiver(post_delete, sender=Statement)
+def revise_statement_subject(instance, raw=False, **_ignored):
+    if not raw:
+        Entity.bump_revision(pk=instance.subject_id)
+
+
+@receiver(post_save, sender=Qualifier)
+@receiver(post_delete, sender=Qualifier)
+@receiver(post_save, sender=ReferenceRecord)
+@receiver(post_delete, sender=ReferenceRecord)
+def revise_statement_part_subject(instance, raw=False, **_ignored):
+    if not raw:
+        Entity.bump_revision(statements=instance.statement_id)
+
+
+@receiver(post_save, sender=ReferenceSnak)
+@receiver(post_delete, sender=ReferenceSnak)
+def revise_reference_subject(instance, raw=False, **_ignored):
+    if not raw:
+        Entity.bump_revision(statements__reference_records=instance.reference_id)
+
+
+@receiver(post_save, sender=PropertySnak)
+def revise_snak_subject(instance, created, raw=False, **_ignored):
+    # A new snak is not used by any statement yet.
+    if not created and not raw:
+        Entity.bump_revision(pk__in=Statement.objects.filter(
+            Q(mainsnak=instance) | Q(qualifiers__snak=instance) | Q(reference_records__snaks__snak=instance)
+        ).values('subject_id'))
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+from django.db.models import Prefetch, prefetch_related_objects
+
+from pecunia.models import Entity, DescribedEntity, Property, PropertySnak, Statement, Qualifier, ReferenceRecord, \
+    ReferenceSnak, prefetch_values
+
+
+class EntitySnapshot:
+    """
+    An entity with all its statements, loaded in a fixed number of queries whatever their number:
+    statements with their main snaks, qualifiers, reference records, reference snaks, the concrete values of all
+    snaks (one query per value type), then the labels of every property and described entity they use.
+    The loaded objects are regular model instances whose related managers are prefetched, so that templates and
+    serializers can use them as usual without further queries.
+    """
+
+    def __init__(self, entity: Entity, statements: list[Statement]):
+        self.entity = entity
+        self.statements = statements
+        self.properties: dict[int, Property] = {}
+        self.claims: dict[int, list[Statement]] = {}
+        for statement in statements:
+            self.properties.setdefault(statement.mainsnak.property_id, statement.mainsnak.property)
+            self.claims.setdefault(statement.mainsnak.property_id, []).append(statement)
+
+    @classmethod
+    def load(cls, entity: Entity) -> EntitySnapshot:
+        """
+        Loads the statements of the given entity and attaches them to it.
+        :param entity: the entity, whose get_claims(), statements.all() and terms then use the loaded objects
+        :return: the snapshot of the entity
+        """
+        statements = list(entity.statements.select_related('mainsnak__property').order_by('pk').prefetch_related(
+            Prefetch('qualifiers', queryset=Qualifier.objects.select_related('snak__property').order_by('pk')),
+            Prefetch('reference_records', queryset=ReferenceRecord.objects.order_by('pk')),
+            Prefetch('reference_records__snaks',
+                     queryset=ReferenceSnak.objects.select_related('snak__property').order_by('pk')),
+        ))
+
+        snaks = []
+        used_in_statement = PropertySnak.used_in_statement.related
+        for statement in statements:
+            Statement.subject.field.set_cached_value(statement, entity)
+            snaks.append(statement.mainsnak)
+            for qualifier in statement.qualifiers.all():
+                used_in_statement.set_cached_value(qualifier.snak, None)
+                snaks.append(qualifier.snak)
+            for record in statement.reference_records.all():
+                for reference in record.snaks.all():
+                    used_in_statement.set_cached_value(reference.snak, None)
+                    snaks.append(reference.snak)
+        prefetch_values(snaks)
+
+        described = [entity] if isinstance(entity, DescribedEntity) else []
+        for snak in snaks:
+            described.append(snak.property)
+            if snak.type == PropertySnak.Type.VALUE and isinstance(snak.value, DescribedEntity):
+                described.append(snak.value)
+        prefetch_related_objects(described, 'labels')
+        if isinstance(entity, DescribedEntity):
+            prefetch_related_objects([entity], 'descriptions', 'aliases')
+
+        entity._prefetched_objects_cache['statements'] = cls._as_queryset(entity.statements, statements)
+        snapshot = cls(entity, statements)
+        entity._claim_index = snapshot.claims
+        return snapshot
+
+    def get_statement_groups(self, ordering: dict[int, int] | None = None) -> list[tuple[Property, list[Statement]]]:
+        """
+        Groups the statements by property.
+        :param ordering: the position of some properties, by primary key; the other ones come last
+        :return: the (property, statements) pairs, sorted by position then in order of first use
+        """
+        ordering = ordering or {}
+        last = max(ordering.values(), default=0) + 1
+        return sorted(((self.properties[prop_id], statements) for prop_id, statements in self.claims.items()),
+                      key=lambda group: ordering.get(group[0].pk, last))
+
+    @staticmethod
+    def _as_queryset(manager, objs: list):
+        queryset = manager.all()
+        queryset._result_cache = objs
+        queryset._prefetch_done = True
+        return queryset
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from typing import Iterable
+
+from django.db.models import Prefetch
+
+from pecunia.models import Entity, Statement, Qualifier, get_property_id
+from pecunia.snapshot import EntitySnapshot
+
+
+class StatementMap:
+    """
+    Facade of an entity for templates, giving its statements by mapping key (see PropertyMapping), so that the prop
+    filters are answered from memory.
+    The statements and their values are loaded once, when the facade is built; mapping keys are resolved by the
+    mapping registry, which is in memory too. Any other attribute is read from the entity.
+    """
+
+    def __init__(self, entity: Entity, claims: dict[int, list[Statement]]):
+        """
+        :param claims: the statements of the entity, by property id
+        """
+        self.entity = entity
+        self.claims = claims
+
+    @classmethod
+    def of(cls, entity: Entity | StatementMap) -> StatementMap:
+        """
+        :return: the given facade, or a facade of the given entity over its claims (see Entity.get_claims())
+        """
+        return entity if isinstance(entity, StatementMap) else cls(entity, entity.get_claims())
+
+    @classmethod
+    def load(cls, entity: Entity) -> StatementMap:
+        """
+        Loads all the statements of an entity with their qualifiers, references and values (see EntitySnapshot).
+        """
+        return cls(entity, EntitySnapshot.load(entity).claims)
+
+    @classmethod
+    def load_many(cls, entities: Iterable[Entity]) -> list[StatementMap]:
+        """
+        Loads the statements of several entities with their main snaks and qualifiers and their values, in a constant
+        number of queries.
+        """
+        entities = list(entities)
+        by_subject = defaultdict(lambda: defaultdict(list))
+        # The qualifiers give the labels of URLs (see the html filter).
+        statements = (Statement.objects.filter(subject__in=entities).select_related('mainsnak__property')
+                      .order_by('pk')
+                      .prefetch_related(Prefetch('qualifiers', queryset=Qualifier.objects
+                                                 .select_related('snak__property').order_by('pk')))
+                      .prefetch_values('mainsnak', 'qualifiers__snak'))
+        for statement in statements:
+            by_subject[statement.subject_id][statement.mainsnak.property_id].append(statement)
+        facades = []
+        for entity in entities:
+            claims = dict(by_subject[entity.pk])
+            for property_statements in claims.values():
+                for statement in property_statements:
+                    Statement.subject.field.set_cached_value(statement, entity)
+            entity._claim_index = claims
+            facades.append(cls(entity, claims))
+        return facades
+
+    def get_statements(self, key: str) -> list[Statement] | None:
+        """
+        :return: the statements whose main snak uses the property mapped to the key, None if there is no such mapping
+        """
+        prop_id = get_property_id(key)
+        if prop_id is None:
+            return None
+        return self.claims.get(prop_id, [])
+
+    def __getattr__(self, name):
+        return getattr(self.entity, name)
+
+    def __str__(self):
+        return str(self.entity)
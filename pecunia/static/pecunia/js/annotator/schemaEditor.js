@@ -119,7 +119,7 @@ class ItemSnak extends Snak {
         bubbles: true,
         detail: {
           id: this.selector.elementId,
-          label: this.selector.state.items[this.selector.elementId]['labels']['en'], // FIXME not clean
+          label: this.selector.selectedLabel,
           dropzone: this.dropZone
         }
       }));
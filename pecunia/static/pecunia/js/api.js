@@ -66,6 +66,21 @@ export async function fetchPropertyDataType(propertyId) {
   return data.type;
 }
 
+/**
+ * Fetches several items and properties in a single request.
+ * @param {string[]} ids The prefixed ids of the entities, e.g. Q12 or P3 (at most 50).
+ * @param {string[]} [props] The parts of the entities to return, among labels, descriptions, aliases, claims and datatype.
+ * @param {string[]} [languages] The languages of the returned labels, descriptions and aliases.
+ * @returns {Promise<Object<string, Object>>} The entities keyed by id; missing ones only have `id` and `missing`.
+ */
+export async function getEntities(ids, props = [], languages = []) {
+  const params = new URLSearchParams({ids: ids.join('|')});
+  if (props.length) params.set('props', props.join('|'));
+  if (languages.length) params.set('languages', languages.join('|'));
+  const data = await getAsJson(`/api/entities?${params}`, 'Impossible de charger les entités.');
+  return data.entities;
+}
+
 /**
  *
  * @param {int} snakType
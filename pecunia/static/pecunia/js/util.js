@@ -47,7 +47,7 @@ export function updateDivWithNewStatement(updatedHtml, snakDiv) {
  * @returns {Promise<HTMLElement>}
  */
 export async function createPropertySelector(langCode) {
-  const data = await getAsJson('/api/properties/?fields=labels', 'Erreur de chargement des propriétés');
+  const data = await getAsJson('/api/properties/?fields=labels&stream=1', 'Erreur de chargement des propriétés');
 
   const propertySelector = generateElement('<select><option value="" disabled selected>-- Select a property --</option></select>');
   console.log(data)
@@ -70,7 +70,7 @@ const datatypeHandlers = {
      * @returns {Promise<HTMLElement>}
      */
     createInput: async (langCode, defaultValue) => {
-      const data = await getAsJson('/api/items/?fields=labels', 'Erreur de chargement des éléments.');
+      const data = await getAsJson('/api/items/?fields=labels&stream=1', 'Erreur de chargement des éléments.');
 
       let valueInput = generateElement('<select class="value-selector">');
       if (!defaultValue) {
@@ -3,10 +3,17 @@ import {getAsJson} from '../api.js';
 import {Component, createDiv} from "../nodeUtil.js";
 
 export class Selector extends Component {
-  constructor(type) {
+  /**
+   * @param {string} type 'items' or 'properties'.
+   * @param {string} langCode The language of the terms to search and of the labels to show, the one of the page by
+   * default. When nothing matches in this language, the terms of all languages are searched.
+   */
+  constructor(type, langCode = document.documentElement.lang || 'en') {
     super(createDiv({class: 'search-wrapper'}));
     this.type = type;
-    this.state = {items: [], highlighted: -1};
+    this.langCode = langCode;
+    // The results in the order of the search, best first.
+    this.state = {items: [], highlighted: -1, selected: null};
 
     this.suggestionList = document.createElement('ul');
     this.suggestionList.className = 'search-suggestions';
@@ -36,6 +43,19 @@ export class Selector extends Component {
     return this.inputField.getAttribute('data-item-id');
   }
 
+  get selectedLabel() {
+    return this.state.selected ? this.labelOf(this.state.selected) : null;
+  }
+
+  // The term in the language of the selector, else the one in the language which matched the search.
+  labelOf(item) {
+    return item['labels'][this.langCode] ?? Object.values(item['labels'])[0] ?? null;
+  }
+
+  descriptionOf(item) {
+    return item['descriptions'][this.langCode] ?? Object.values(item['descriptions'])[0] ?? null;
+  }
+
   enable() {
     this.inputField.disabled = false;
   }
@@ -61,7 +81,7 @@ export class Selector extends Component {
     this.state.items = items || [];
     this.state.highlighted = -1;
 
-    if (!items || Object.keys(items).length === 0) {
+    if (!items || items.length === 0) {
       const li = document.createElement('li');
       li.className = 'empty';
       li.textContent = 'Aucun résultat';
@@ -71,7 +91,7 @@ export class Selector extends Component {
       return;
     }
 
-    for (const [idx, item] of Object.entries(items)) {
+    for (const [idx, item] of items.entries()) {
       const li = document.createElement('li');
       li.id = `${this.suggestionList.id}-opt-${idx}`;
       li.setAttribute('role', 'option');
@@ -82,11 +102,11 @@ export class Selector extends Component {
       const labelSpan = document.createElement('span');
       const qidSpan = document.createElement('span');
       labelDiv.append(labelSpan, qidSpan);
-      labelSpan.textContent = item['labels']['en'] ?? "-";
-      qidSpan.textContent = `(Q${idx})`;
+      labelSpan.textContent = this.labelOf(item) ?? "-";
+      qidSpan.textContent = `(${item.ref})`;
 
       const descDiv = document.createElement('div');
-      descDiv.textContent = item['descriptions']['en'] ?? "-";
+      descDiv.textContent = this.descriptionOf(item) ?? "-";
       liContent.append(labelDiv, descDiv);
       li.append(liContent);
       li.dataset.index = idx;
@@ -129,11 +149,12 @@ export class Selector extends Component {
   select(idx) {
     const item = this.state.items[idx];
     if (!item) return;
-    this.showValue(item['labels']['en'], idx);
+    this.state.selected = item;
+    this.showValue(this.labelOf(item), item.id);
     this.hideList();
     this.node.dispatchEvent(new CustomEvent('selectionchanged-' + this.type, {
       bubbles: true,
-      detail: {id: idx, label: (item['labels']['en'] ?? "-") + ` (${idx})`}
+      detail: {id: item.id, label: (this.labelOf(item) ?? "-") + ` (${item.id})`}
     }));
   };
 
@@ -145,13 +166,13 @@ export class Selector extends Component {
     switch (e.key) {
       case 'ArrowDown':
         e.preventDefault();
-        if (!Object.keys(this.state.items).length) return;
-        this.highlight((this.state.highlighted + 1) % Object.keys(this.state.items).length);
+        if (!this.state.items.length) return;
+        this.highlight((this.state.highlighted + 1) % this.state.items.length);
         break;
       case 'ArrowUp':
         e.preventDefault();
-        if (!Object.keys(this.state.items).length) return;
-        this.highlight((this.state.highlighted - 1 + Object.keys(this.state.items).length) % Object.keys(this.state.items).length);
+        if (!this.state.items.length) return;
+        this.highlight((this.state.highlighted - 1 + this.state.items.length) % this.state.items.length);
         break;
       case 'Enter':
         if (this.suggestionList.style.display === "block" && this.state.highlighted >= 0) {
@@ -172,15 +193,17 @@ export class Selector extends Component {
       return;
     }
     try {
-      const items = await getAsJson(
-        `/api/${this.type}/?fields=labels,descriptions&label_like=` + encodeURIComponent(q),
-        `Unable to search items for ${q}.`
-      );
-
-      const result = {};
-      for (const [id, item] of Object.entries(items)) {
-        result[id] = item;
-      }
+      let entities = await this.search(q, this.langCode);
+      // Entities without terms in the language of the selector are still found, with the terms which matched.
+      if (!entities.length) entities = await this.search(q, null);
+
+      // An array, since objects would enumerate the integer display ids in ascending order rather than by rank.
+      const result = entities.map(entity => ({
+        id: entity.display_id,
+        ref: entity.id,
+        labels: {[entity.match.language]: entity.label},
+        descriptions: {[entity.match.language]: entity.description}
+      }));
 
       this.render(result);
     } catch (err) {
@@ -189,4 +212,16 @@ export class Selector extends Component {
       console.error(err);
     }
   };
+
+  /**
+   * @param {string} q The text to search.
+   * @param {?string} language The language of the terms to search, all of them if null.
+   * @returns {Promise<Object[]>} The matching entities, best first.
+   */
+  async search(q, language) {
+    const params = new URLSearchParams({search: q, type: this.type === 'properties' ? 'property' : 'item'});
+    if (language) params.set('language', language);
+    const data = await getAsJson(`/api/search?${params}`, `Unable to search items for ${q}.`);
+    return data.search;
+  }
 }
@@ -1,31 +1,27 @@
 import re
 
 from django import template
-from django.core.exceptions import ObjectDoesNotExist
 from django.utils.safestring import mark_safe
 
 import pecunia.models as m
-from pecunia.models import PropertyMapping
+from pecunia.statement_map import StatementMap
 
 register = template.Library()
 
 
 @register.filter
-def line_numbers(document: m.Item) -> str:
-    try:
-        prop = PropertyMapping.get('text')
-        if not prop:
-            return f"Missing property mapping for key: {'text'}"
-        statements = document.statements.filter(mainsnak__property=prop)
-
-        l = list(map(int, re.findall('<lb n="(\d+)', statements[0].mainsnak.value.value)))
-        max_n = 1
-        if l:
-            max_n = max(l)
-        output = ""
-        for i in range(1, max_n + 1):
-            output += f"<div>{i}</div>"
-
-        return mark_safe(output)
-    except ObjectDoesNotExist:
+def line_numbers(document: m.Item | StatementMap) -> str:
+    statements = StatementMap.of(document).get_statements('text')
+    if statements is None:
+        return f"Missing property mapping for key: {'text'}"
+    if not statements or statements[0].mainsnak.value is None:
         return "-"
+    l = list(map(int, re.findall('<lb n="(\d+)', statements[0].mainsnak.value.value)))
+    max_n = 1
+    if l:
+        max_n = max(l)
+    output = ""
+    for i in range(1, max_n + 1):
+        output += f"<div>{i}</div>"
+
+    return mark_safe(output)
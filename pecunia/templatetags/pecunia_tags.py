@@ -1,15 +1,16 @@
 import re
 
 from django import template
-from django.core.exceptions import ObjectDoesNotExist
 from django.urls import reverse
 from django.utils import translation
 from django.utils.safestring import mark_safe
 from django.utils.translation import gettext_lazy, get_language
-from lxml import etree
 
 import pecunia.models as m
-from pecunia.models import PropertyMapping, PropertySnak
+from pecunia.leiden import render_leiden
+from pecunia.labels import label_resolver
+from pecunia.models import PropertyMapping, PropertySnak, get_property_id
+from pecunia.statement_map import StatementMap
 
 register = template.Library()
 
@@ -21,44 +22,27 @@ def label(described_entity: m.DescribedEntity, lang_code: str) -> str:
     """
     Returns the label in the given of the given described_entity.
     If the label does not exist, returns the pretty display_id.
+    Labels are fetched in bulk for the current request (see LabelResolver).
     :param described_entity: the DescribedEntity instance from which the label is obtained
     :param lang_code: the language code of the label
     :return: the label in the given language code
     """
-    try:
-        return described_entity.labels.get(language=lang_code).text
-    except ObjectDoesNotExist:
-        return described_entity.pretty_display_id
+    return label_resolver.label(described_entity, [lang_code]) or described_entity.pretty_display_id
 
 
 @register.filter
 def label_or_default(described_entity: m.DescribedEntity, lang_code: str) -> str:
-    try:
-        return described_entity.labels.get(language=lang_code).text
-    except ObjectDoesNotExist:
-        try:
-            return described_entity.labels.get(language=DEFAULT_LANGUAGE)
-        except ObjectDoesNotExist:
-            return described_entity.pretty_display_id
+    return label_resolver.label(described_entity, [lang_code, DEFAULT_LANGUAGE]) or described_entity.pretty_display_id
 
 
 @register.filter
 def description(value: m.DescribedEntity, lang_code: str) -> str:
-    try:
-        return value.descriptions.get(language=lang_code).text or "-"
-    except ObjectDoesNotExist:
-        return gettext_lazy('-')
+    return label_resolver.description(value, [lang_code]) or gettext_lazy('-')
 
 
 @register.filter
 def description_or_default(value: m.DescribedEntity, lang_code: str) -> str:
-    try:
-        return value.descriptions.get(language=lang_code).text or "-"
-    except ObjectDoesNotExist:
-        try:
-            return value.descriptions.get(language='en') or "-"
-        except ObjectDoesNotExist:
-            return "-"
+    return label_resolver.description(value, [lang_code, DEFAULT_LANGUAGE]) or "-"
 
 
 @register.filter
@@ -76,168 +60,63 @@ def capitalize(s: str) -> str:
     return s.capitalize()
 
 
+def missing_mapping(prop_key_mapping: str) -> str:
+    return f"Missing property mapping for key: {prop_key_mapping}"
+
+
 @register.filter
-def prop(item: object, prop_key_mapping: str) -> PropertySnak | str:
-    prop = PropertyMapping.get(prop_key_mapping)
-    if not prop:
-        return f"Missing property mapping for key: {prop_key_mapping}"
-    statements = item.statements.filter(mainsnak__property=prop)
+def prop(item: m.Entity | StatementMap, prop_key_mapping: str) -> PropertySnak | str:
+    statements = StatementMap.of(item).get_statements(prop_key_mapping)
+    if statements is None:
+        return missing_mapping(prop_key_mapping)
     if statements:
         return statements[0].mainsnak
     return "-"
 
 
 @register.filter
-def prop_list(item: object, prop_key_mapping: str) -> str:
-    prop = PropertyMapping.get(prop_key_mapping)
-    if not prop:
-        return f"Missing property mapping for key: {prop_key_mapping}"
-    statements = item.statements.filter(mainsnak__property=prop)
+def prop_list(item: m.Entity | StatementMap, prop_key_mapping: str) -> str:
+    statements = StatementMap.of(item).get_statements(prop_key_mapping)
+    if statements is None:
+        return missing_mapping(prop_key_mapping)
     if statements:
         return ", ".join(html(statement.mainsnak) for statement in statements)
     return "-"
 
 
 @register.filter
-def prop_mtv_value(item: m.Entity, prop_key_mapping: str) -> str:
-    try:
-        prop = PropertyMapping.get(prop_key_mapping)
-        if not prop:
-            return f"Missing property mapping for key: {prop_key_mapping}"
-        statements = item.statements.filter(mainsnak__property=prop)
-        if statements:
-            return statements[0].mainsnak.value.text
-        else:
-            return "-"
-    except ObjectDoesNotExist:
-        return "-"
+def prop_mtv_value(item: m.Entity | StatementMap, prop_key_mapping: str) -> str:
+    statements = StatementMap.of(item).get_statements(prop_key_mapping)
+    if statements is None:
+        return missing_mapping(prop_key_mapping)
+    if statements and isinstance(statements[0].mainsnak.value, m.MonolingualTextValue):
+        return statements[0].mainsnak.value.text
+    return "-"
 
 
 @register.filter
-def prop_mtv_langage(item: m.Entity, prop_key_mapping: str) -> str:
-    try:
-        prop = PropertyMapping.get(prop_key_mapping)
-        if not prop:
-            return f"Missing property mapping for key: {prop_key_mapping}"
-        statements = item.statements.filter(mainsnak__property=prop)
+def prop_mtv_langage(item: m.Entity | StatementMap, prop_key_mapping: str) -> str:
+    statements = StatementMap.of(item).get_statements(prop_key_mapping)
+    if statements is None:
+        return missing_mapping(prop_key_mapping)
+    if statements and isinstance(statements[0].mainsnak.value, m.MonolingualTextValue):
         return statements[0].mainsnak.value.language
-    except ObjectDoesNotExist:
-        return "-"
+    return "-"
 
 
 @register.filter
 def prop_label(item: object, prop_key_mapping: str) -> str:
-    try:
-        prop = PropertyMapping.get(prop_key_mapping)
-        if not prop:
-            return f"Missing property mapping for key: {prop_key_mapping}"
-        return prop.labels.get(language=translation.get_language()).text
-    except ObjectDoesNotExist:
-        try:
-            return prop.labels.get(language="en").text
-        except ObjectDoesNotExist:
-            return "-"
-
-
-def handle_tag(el: etree._Element) -> str:
-    output = ""
-    inner = ""
-    for child in el.getchildren():
-        inner += handle_tag(child)
-    text = (el.text or '') + inner
-    if el.tag == 'w' and not el.get("part", None):
-        w_text = text
-        w_type = el.get("type", "")
-        w_id = el.get("qid", "")
-        if w_id:
-            output += f'<a class="tagged-element {"typed type-" + w_type if w_type else ""}" href="/item/{w_id}">{w_text}</a>'
-        else:
-            output += f'<span class="tagged-element {"typed type-" + w_type if w_type else ""}">{w_text}</span>'
-    elif el.tag == 'lb' and int(el.attrib['n']) != 0:
-        if 'break' in el.attrib and el.attrib['break'] == "no" or 'type' in el.attrib and el.attrib[
-            'type'] == "worddiv":
-            output += '-'
-        output += '<br>'
-    elif el.tag == 'orig':
-        w_text = text
-        output += w_text.upper()
-    elif el.tag == 'unclear':
-        w_text = text
-        w_text = ''.join(c + ("\u0323" if not c.isspace() else "") for c in w_text)
-        output += w_text
-    elif el.tag == 'gap':
-        # if 'extent' in el.attrib and el.attrib['extent'] == 'unknown' and el.attrib['reason'] == 'lost':
-        #     output += ""
-        # else:
-        res = ''
-        if 'quantity' in el.attrib:
-            character_number = int(el.attrib['quantity'])
-            res = "." * character_number
-        elif 'extent' in el.attrib:
-            res = "----"
-        if el.attrib['reason'] == 'lost':
-            res = f"[{res}]"
-        output += res
-    elif el.tag == 'del':
-        res = text
-        if res[0] == '[' and res[-1] == ']':
-            res = res[1:-1]
-        output += f"〚{res}〛"
-    elif el.tag == 'supplied':
-        reason = el.attrib['reason']
-        if reason == 'lost':
-            output += f"[{text}]"
-        elif reason == 'omitted':
-            output += f"&#60;{text}&#62;"
-    elif el.tag == 'surplus':
-        output += f"{{{text}}}"
-    elif el.tag == 'choice':
-        output += f"&#60;{text}&#62;"
-    elif el.tag == 'sic':
-        return ""
-    elif el.tag == 'expan':
-        output += f"{text}"
-    elif el.tag == 'ex':
-        final = ")"
-        if 'cert' in el.attrib and el.attrib['cert'] == 'low':
-            final = "?)"
-        output += f"({text}{final}"
-    elif el.tag == 'space':
-        output += 'v.'
-    elif el.tag == 'g':
-        output += f"(({el.attrib['type']}))"
-    elif el.text:
-        output += str(text)
-
-    if inner:
-        output += str(inner)
-
-    # Ajouter le texte qui suit la balise <w>
-    if el.tail:
-        output += el.tail
-    return output
+    if get_property_id(prop_key_mapping) is None:
+        return missing_mapping(prop_key_mapping)
+    prop = PropertyMapping.get(prop_key_mapping)
+    return label_resolver.label(prop, [translation.get_language(), DEFAULT_LANGUAGE]) or "-"
 
 
 @register.filter
 def highlight_words(value):
     if not value:
         return ''
-    print(value)
-    root = etree.fromstring(f"<xml>{value}</xml>")
-
-    # Conteneur HTML
-    output = ""
-    if root.text:
-        output += root.text
-
-    for el in root:
-        output += handle_tag(el)
-    # Remove first <br>
-    if output.startswith('<br>'):
-        output = output[4:]
-    output = output.replace('\n', '')
-    output = re.sub(r'](\s*)\[', r'\1', output)
-    return mark_safe(output)
+    return mark_safe(render_leiden(value))
 
 
 @register.filter
@@ -251,14 +130,27 @@ def generate_div_for_lb(value):
 
 
 @register.filter
-def has_prop(value: m.Entity, prop_key: str) -> bool:
-    return value.statements.filter(mainsnak__property=PropertyMapping.get(prop_key)).count() != 0
+def has_prop(value: m.Entity | StatementMap, prop_key: str) -> bool:
+    return bool(StatementMap.of(value).get_statements(prop_key))
 
 @register.filter
 def as_link(link, label):
     return mark_safe(f"<a href='{link.value.value}'>{label}</a>")
 
 
+def prefetched_qualifiers(snak: m.PropertySnak) -> list[m.Qualifier] | None:
+    """
+    :return: the qualifiers of the statement of the given main snak if they have been prefetched, as by
+    EntitySnapshot, None otherwise, so that rendering a snak never queries them one statement at a time
+    """
+    if not m.PropertySnak.used_in_statement.is_cached(snak):
+        return None
+    statement = snak.used_in_statement
+    if 'qualifiers' not in getattr(statement, '_prefetched_objects_cache', {}):
+        return None
+    return statement.qualifiers.all()
+
+
 @register.filter
 def html(snak: m.PropertySnak | str) -> str:
     if isinstance(snak, str):
@@ -272,10 +164,13 @@ def html(snak: m.PropertySnak | str) -> str:
             f"<a href='{reverse('item_display', args=[snak.value.display_id])}'>{label_or_default(snak.value, get_language())}</a>")
     elif isinstance(snak.value, m.UrlValue):
         label = snak.value.value
-        if hasattr(snak, 'used_in_statement') and snak.used_in_statement.qualifiers.filter(
-                snak__property=PropertyMapping.get('url_label')).count() > 0:
-            qualifier = snak.used_in_statement.qualifiers.filter(snak__property=PropertyMapping.get('url_label'))[0]
-            label = qualifier.snak.value.value
+        url_label_id = get_property_id('url_label')
+        qualifiers = prefetched_qualifiers(snak)
+        if url_label_id is not None and qualifiers is not None:
+            qualifier = next((qualifier for qualifier in qualifiers if qualifier.snak.property_id == url_label_id),
+                             None)
+            if qualifier is not None:
+                label = qualifier.snak.value.value
         return mark_safe(f"<a href='{snak.value.value}'>{label}</a>")
     elif isinstance(snak.value, m.GlobeCoordinatesValue):
         return mark_safe(
@@ -1,10 +1,17 @@
 import json
+from unittest import mock
 
 from django.contrib.auth.models import User
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from rest_framework.test import APIClient
 
 import pecunia.models as m
+from pecunia.bulk import EntityBulkWriter, EntitySpec, StatementSpec, SnakSpec
+from pecunia.autocomplete import autocomplete_index
+from pecunia.entity_cache import get_entity_cache
+from pecunia.views.rest import ItemViewSet
 
 
 class CreateEntityTestCase(TestCase):
@@ -56,3 +63,274 @@ class ApiTestCase(TestCase):
         print(response.status_code, response.content.decode())
         print(m.Item.objects.all())
         self.fail("eiei")
+
+
+class ListApiTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=User.objects.create_superuser('testuser'))
+        self.items = [m.Item.objects.create() for _ in range(5)]
+        self.items[0].set_label('en', 'first')
+
+    def test_pages(self):
+        response = self.client.get("/api/items/", {'limit': 2, 'fields': 'labels'})
+        self.assertEqual([str(item.display_id) for item in self.items[:2]], list(response.json()))
+        self.assertEqual({'en': 'first'}, response.json()[str(self.items[0].display_id)]['labels'])
+
+        ids = list(response.json())
+        while 'Link' in response:
+            next_url = response['Link'].split(';')[0].strip('<>')
+            response = self.client.get(next_url)
+            ids += list(response.json())
+        self.assertEqual([str(item.display_id) for item in self.items], ids)
+
+    def test_deletion_does_not_shift_pages(self):
+        response = self.client.get("/api/items/", {'limit': 2})
+        self.items[1].delete()
+        response = self.client.get(response['Link'].split(';')[0].strip('<>'))
+        self.assertEqual([str(item.display_id) for item in self.items[2:4]], list(response.json()))
+
+    def test_stream(self):
+        with mock.patch.object(ItemViewSet, 'stream_chunk_size', 2):
+            response = self.client.get("/api/items/", {'stream': 1, 'fields': 'labels'})
+            self.assertTrue(response.streaming)
+            data = json.loads(b''.join(response.streaming_content))
+        self.assertEqual([str(item.display_id) for item in self.items], list(data))
+        self.assertEqual({'en': 'first'}, data[str(self.items[0].display_id)]['labels'])
+
+    def test_stream_empty(self):
+        response = self.client.get("/api/properties/", {'stream': 1})
+        self.assertEqual({}, json.loads(b''.join(response.streaming_content)))
+
+    def test_label_like(self):
+        self.items[1].set_label('fr', 'Monnaie romaine')
+        self.items[2].set_label('fr', 'Monnaie')
+        self.items[3].aliases.create(language='fr', text='pièce de monnaie')
+        self.items[4].set_label('fr', 'Trésor')
+        m.Property.objects.create(data_type=m.Datatype.objects.get(class_name='Item')).set_label('fr', 'monnaie')
+        response = self.client.get("/api/items/", {'label_like': 'MONNAIE', 'fields': 'labels'})
+        self.assertEqual([str(self.items[i].display_id) for i in (2, 1, 3)], list(response.json()))
+        self.assertEqual(1, len(self.client.get("/api/items/", {'label_like': 'monnaie', 'limit': 1}).json()))
+        response = self.client.get("/api/items/", {'label_like': 'tres', 'stream': 1})
+        self.assertEqual([str(self.items[4].display_id)], list(json.loads(b''.join(response.streaming_content))))
+
+
+class PrefetchPlanTestCase(TestCase):
+    def setUp(self):
+        get_entity_cache().clear()
+        self.client = APIClient()
+        self.client.force_authenticate(user=User.objects.create_superuser('testuser'))
+        self.item_prop = m.Property.objects.create(data_type=m.Datatype.objects.get(class_name='Item'))
+        self.string_prop = m.Property.objects.create(data_type=m.Datatype.objects.get(class_name='StringValue'))
+        self.target = m.Item.objects.create()
+
+    def create_items(self, n):
+        for i in range(n):
+            EntityBulkWriter().write([EntitySpec(labels={'en': f'item {i}'}, descriptions={'en': 'description'},
+                                                 aliases={'en': ['alias']}, statements=[
+                StatementSpec(SnakSpec(self.item_prop, self.target),
+                              qualifiers=[SnakSpec(self.string_prop, m.StringValue(value=str(i)))],
+                              references=[[SnakSpec(self.string_prop, m.StringValue(value='source'))]]),
+                StatementSpec(SnakSpec(self.string_prop, m.StringValue(value='name'))),
+            ])])
+
+    def count_queries(self, url, params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(200, response.status_code)
+        return len(queries)
+
+    def test_item_list(self):
+        params = {'fields': 'labels,descriptions,aliases'}
+        self.create_items(2)
+        count = self.count_queries('/api/items/', params)
+        self.create_items(10)
+        self.assertEqual(count, self.count_queries('/api/items/', params))
+
+        response = self.client.get('/api/items/', params)
+        item = response.json()[str(self.target.display_id + 1)]
+        self.assertEqual({'en': 'item 0'}, item['labels'])
+        self.assertEqual(f'Q{self.target.display_id}',
+                         item['claims'][f'P{self.item_prop.display_id}'][0]['mainsnak']['datavalue']['value']['id'])
+
+    def test_item_retrieve(self):
+        self.create_items(1)
+        item = m.Item.objects.order_by('display_id').last()
+        url = f'/api/items/{item.display_id}/'
+        count = self.count_queries(url, {'fields': 'labels,descriptions,claims'})
+        EntityBulkWriter().write([EntitySpec(item, statements=[
+            StatementSpec(SnakSpec(self.item_prop, self.target),
+                          qualifiers=[SnakSpec(self.string_prop, m.StringValue(value=str(i)))])
+            for i in range(5)
+        ])])
+        self.assertEqual(count, self.count_queries(url, {'fields': 'labels,descriptions,claims'}))
+
+    def test_property_list_and_retrieve(self):
+        params = {'fields': 'labels,descriptions,aliases'}
+        self.item_prop.set_label('en', 'prop')
+        count = self.count_queries('/api/properties/', params)
+        retrieve_count = self.count_queries(f'/api/properties/{self.item_prop.display_id}/', {})
+        for i in range(5):
+            prop = m.Property.objects.create(data_type=m.Datatype.objects.get(class_name='Item'))
+            prop.set_label('en', f'prop {i}')
+            prop.set_description('en', 'description')
+        self.assertEqual(count, self.count_queries('/api/properties/', params))
+        self.assertEqual(retrieve_count, self.count_queries(f'/api/properties/{prop.display_id}/', {}))
+
+
+class EntityCacheTestCase(TestCase):
+    def setUp(self):
+        get_entity_cache().clear()
+        self.client = APIClient()
+        self.client.force_authenticate(user=User.objects.create_superuser('testuser'))
+        self.prop = m.Property.objects.create(data_type=m.Datatype.objects.get(class_name='Item'))
+        self.item, self.target = m.Item.objects.create(), m.Item.objects.create()
+        self.url = f'/api/items/{self.item.display_id}/'
+
+    def retrieve(self):
+        response = self.client.get(self.url)
+        self.assertEqual(200, response.status_code)
+        return response.json()
+
+    def assertChanges(self, write):
+        before = self.retrieve()
+        write()
+        self.assertNotEqual(before, self.retrieve())
+
+    def test_unchanged_entity_is_cached(self):
+        self.item.set_label('en', 'item')
+        self.retrieve()
+        with self.assertNumQueries(1):
+            self.assertEqual({'en': 'item'}, self.retrieve()['labels'])
+
+    def test_writes_invalidate(self):
+        self.assertChanges(lambda: self.item.set_label('en', 'item'))
+        self.assertChanges(lambda: self.item.set_description('en', 'description'))
+        self.assertChanges(lambda: m.Alias.objects.create(described_entity=self.item, language='en', text='alias'))
+        statement = self.item.add_value(self.prop, self.target)
+        self.assertChanges(lambda: self.item.set_value(self.prop, m.Item.objects.create()))
+        self.assertChanges(lambda: statement.qualifiers.create(snak=m.PropertySnak.objects.create(
+            property=self.prop, type=m.PropertySnak.Type.NO_VALUE)))
+        record = m.ReferenceRecord.objects.create(statement=statement)
+        self.assertChanges(lambda: m.ReferenceSnak.objects.create(reference=record, snak=m.PropertySnak.objects.create(
+            property=self.prop, type=m.PropertySnak.Type.SOME_VALUE)))
+        self.assertChanges(record.delete)
+        self.assertChanges(statement.delete)
+        self.assertChanges(lambda: EntityBulkWriter().write([EntitySpec(self.item, labels={'fr': 'élément'})]))
+
+    def test_other_entities_are_not_invalidated(self):
+        revision = m.Item.objects.get(pk=self.item.pk).revision
+        self.target.set_label('en', 'target')
+        self.target.add_value(self.prop, self.item)
+        self.assertEqual(revision, m.Item.objects.get(pk=self.item.pk).revision)
+
+    def test_stale_instance_does_not_roll_back_revision(self):
+        stale = m.Item.objects.get(pk=self.item.pk)
+        self.item.add_value(self.prop, self.target)
+        revision = m.Item.objects.get(pk=self.item.pk).revision
+        stale.save()
+        self.assertEqual(revision, m.Item.objects.get(pk=self.item.pk).revision)
+
+    def test_invalid_id(self):
+        for display_id in ('abc', '99999'):
+            self.assertEqual(404, self.client.get(f'/api/items/{display_id}/').status_code)
+
+    def test_conditional_get(self):
+        response = self.client.get(self.url)
+        etag = response['ETag']
+        self.assertEqual('private, no-cache', response['Cache-Control'])
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(304, response.status_code)
+        self.assertEqual(etag, response['ETag'])
+
+        self.item.set_label('en', 'item')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(200, response.status_code)
+        self.assertNotEqual(etag, response['ETag'])
+        self.assertEqual(304, self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code)
+
+    def test_property_cache_control(self):
+        response = self.client.get(f'/api/properties/{self.prop.display_id}/')
+        self.assertEqual('private, max-age=60', response['Cache-Control'])
+        self.assertIn('ETag', response)
+
+
+class EntitiesApiTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=User.objects.create_superuser('testuser'))
+        self.prop = m.Property.objects.create(data_type=m.Datatype.objects.get(class_name='Item'))
+        self.prop.set_label('en', 'prop')
+        self.string_prop = m.Property.objects.create(data_type=m.Datatype.objects.get(class_name='StringValue'))
+        self.target = m.Item.objects.create()
+
+    def create_items(self, n):
+        return EntityBulkWriter().write([EntitySpec(labels={'en': f'item {i}', 'fr': f'élément {i}'}, statements=[
+            StatementSpec(SnakSpec(self.prop, self.target),
+                          qualifiers=[SnakSpec(self.string_prop, m.StringValue(value=str(i)))]),
+        ]) for i in range(n)])
+
+    def get(self, entities, **params):
+        ids = '|'.join(e if isinstance(e, str) else e.pretty_display_id for e in entities)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/entities', {'ids': ids, **params})
+        return response, len(queries)
+
+    def test_entities(self):
+        items = self.create_items(2)
+        response, _ = self.get([items[1], self.prop, 'Q999'], languages='en')
+        self.assertEqual(200, response.status_code)
+        entities = response.json()['entities']
+        self.assertEqual([items[1].pretty_display_id, self.prop.pretty_display_id, 'Q999'], list(entities))
+        self.assertEqual({'en': 'item 1'}, entities[items[1].pretty_display_id]['labels'])
+        self.assertEqual(1, len(entities[items[1].pretty_display_id]['claims'][self.prop.pretty_display_id]))
+        self.assertEqual('Item', entities[self.prop.pretty_display_id]['type'])
+        self.assertEqual({'id': 'Q999', 'missing': ''}, entities['Q999'])
+
+    def test_props(self):
+        item, = self.create_items(1)
+        response, _ = self.get([item, self.prop], props='labels|datatype')
+        entities = response.json()['entities']
+        self.assertEqual({'id', 'display_id', 'labels'}, set(entities[item.pretty_display_id]))
+        self.assertEqual({'id', 'display_id', 'labels', 'type'}, set(entities[self.prop.pretty_display_id]))
+
+    def test_query_count_does_not_depend_on_size(self):
+        _, query_count = self.get([*self.create_items(2), self.prop])
+        self.assertEqual(query_count, self.get([*self.create_items(20), self.prop, self.string_prop])[1])
+
+    def test_invalid_requests(self):
+        self.assertEqual(400, self.get([])[0].status_code)
+        self.assertEqual(400, self.get(['X1'])[0].status_code)
+        self.assertEqual(400, self.get([self.prop], props='sitelinks')[0].status_code)
+        self.assertEqual(400, self.get([f'Q{i}' for i in range(1, 52)])[0].status_code)
+
+
+class SearchApiTestCase(TestCase):
+    def setUp(self):
+        autocomplete_index.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(user=User.objects.create_superuser('testuser'))
+        self.item = m.Item.objects.create()
+        self.item.set_label('fr', 'Denier tournois')
+        self.item.set_description('fr', 'monnaie')
+        self.prop = m.Property.objects.create(data_type=m.Datatype.objects.get(class_name='Item'))
+        self.prop.set_label('fr', 'dénomination')
+
+    def test_search(self):
+        response = self.client.get('/api/search', {'search': 'den'})
+        self.assertEqual({'searchinfo': {'search': 'den'}, 'search': [{
+            'id': self.item.pretty_display_id,
+            'display_id': self.item.display_id,
+            'label': 'Denier tournois',
+            'description': 'monnaie',
+            'match': {'type': 'label', 'language': 'fr', 'text': 'Denier tournois'},
+        }]}, response.json())
+        response = self.client.get('/api/search', {'search': 'DÉNOM', 'type': 'property', 'language': 'fr'})
+        self.assertEqual([self.prop.pretty_display_id], [entity['id'] for entity in response.json()['search']])
+        response = self.client.get('/api/search', {'search': 'den', 'language': 'en'})
+        self.assertEqual([], response.json()['search'])
+
+    def test_invalid_requests(self):
+        self.assertEqual(400, self.client.get('/api/search').status_code)
+        self.assertEqual(400, self.client.get('/api/search', {'search': 'den', 'type': 'lexeme'}).status_code)
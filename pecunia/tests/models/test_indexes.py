@@ -0,0 +1,394 @@
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from pecunia.bulk import EntityBulkWriter, EntitySpec, StatementSpec, SnakSpec
+from pecunia.models import Item, Property, PropertyMapping, ItemMapping, Datatype, Document, InstanceOf, \
+    SubclassOf, Backlink, StringValue, Qualifier, PropertySnak, ReferenceRecord, ReferenceSnak, PropertyUsage, \
+    PropertyValueUsage, TermIndex, TermToken, TermChange, Sequence, Statement, MonolingualTextValue, normalize_term
+from pecunia.forms import get_instances_of
+from pecunia.search import TermSearch
+from pecunia.usage import PropertyUsageBrowser
+
+
+class InstanceOfTestCase(TestCase):
+    def setUp(self):
+        self.is_a = Property.objects.create(data_type=Datatype.objects.get(class_name='Item'))
+        PropertyMapping.objects.create(key='is_a', property=self.is_a)
+        self.document_type = Item.objects.create()
+        ItemMapping.objects.create(key='document', item=self.document_type)
+        self.person_type = Item.objects.create()
+        ItemMapping.objects.create(key='person', item=self.person_type)
+
+    def test_statement_is_indexed(self):
+        item = Item.objects.create()
+        statement = item.add_value(self.is_a, self.document_type)
+        entry = InstanceOf.objects.get(statement=statement)
+        self.assertEqual(item.pk, entry.entity_id)
+        self.assertEqual(self.document_type.pk, entry.item_class_id)
+        self.assertEqual([item], list(get_instances_of(self.document_type)))
+
+    def test_other_properties_are_ignored(self):
+        other = Property.objects.create(data_type=Datatype.objects.get(class_name='Item'))
+        Item.objects.create().add_value(other, self.document_type)
+        self.assertFalse(InstanceOf.objects.exists())
+
+    def test_value_change_is_indexed(self):
+        item = Item.objects.create()
+        item.add_value(self.is_a, self.document_type)
+        item.set_value(self.is_a, self.person_type)
+        self.assertEqual([self.person_type.pk], list(InstanceOf.objects.values_list('item_class_id', flat=True)))
+        self.assertFalse(get_instances_of(self.document_type).exists())
+
+    def test_statement_deletion(self):
+        statement = Item.objects.create().add_value(self.is_a, self.document_type)
+        statement.delete()
+        self.assertFalse(InstanceOf.objects.exists())
+
+    def test_document_manager(self):
+        document = Document.objects.create()
+        Item.objects.create().add_value(self.is_a, self.person_type)
+        self.assertEqual([document.pk], [d.pk for d in Document.objects.all()])
+        self.assertEqual(document.pk, Document.get_by_id(document.display_id).pk)
+
+    def test_document_title(self):
+        title = Property.objects.create(data_type=Datatype.objects.get(class_name='MonolingualTextValue'))
+        PropertyMapping.objects.create(key='title', property=title)
+        document = Document.objects.create()
+        with self.assertRaises(Statement.DoesNotExist):
+            document.get_title()
+        document.set_title(MonolingualTextValue.objects.create(language='la', text='Res gestae'))
+        self.assertEqual('Res gestae', document.get_title().text)
+
+    def test_bulk_writer(self):
+        entities = EntityBulkWriter().write([
+            EntitySpec(statements=[StatementSpec(SnakSpec(self.is_a, self.person_type))]),
+            EntitySpec(),
+        ])
+        self.assertEqual([entities[0]], list(get_instances_of(self.person_type)))
+
+    def test_rebuild(self):
+        item = Item.objects.create()
+        statement = item.add_value(self.is_a, self.document_type)
+        InstanceOf.objects.all().delete()
+        out = StringIO()
+        call_command('rebuild_index', 'instance_of', stdout=out)
+        self.assertIn('instance_of: 1 entries', out.getvalue())
+        self.assertEqual(item.pk, InstanceOf.objects.get(statement=statement).entity_id)
+
+    def test_dashboard(self):
+        def get_page():
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse('person_list'), {'limit': 2})
+            return response.context['page_obj'], len(queries)
+
+        for _ in range(3):
+            Item.objects.create().add_value(self.is_a, self.person_type)
+        Item.objects.create().add_value(self.is_a, self.document_type)
+        page, query_count = get_page()
+        self.assertEqual(3, page.paginator.count)
+        self.assertEqual(2, len(page.object_list))
+
+        # The number of queries only depends on the page size.
+        for _ in range(5):
+            Item.objects.create().add_value(self.is_a, self.person_type)
+        page, more_query_count = get_page()
+        self.assertEqual(8, page.paginator.count)
+        self.assertEqual(query_count, more_query_count)
+
+        for limit in ('abc', '0', '100000'):
+            response = self.client.get(reverse('person_list'), {'limit': limit})
+            self.assertEqual(8, len(response.context['page_obj'].object_list))
+        response = self.client.get(reverse('item_list'), {'limit': '0'})
+        self.assertEqual(200, response.status_code)
+
+
+class SubclassOfTestCase(TestCase):
+    def setUp(self):
+        self.is_a = Property.objects.create(data_type=Datatype.objects.get(class_name='Item'))
+        PropertyMapping.objects.create(key='is_a', property=self.is_a)
+        self.subclass_of = Property.objects.create(data_type=Datatype.objects.get(class_name='Item'))
+        PropertyMapping.objects.create(key='subclass_of', property=self.subclass_of)
+        self.document, self.inscription, self.epitaph = (Item.objects.create() for _ in range(3))
+        self.inscription.add_value(self.subclass_of, self.document)
+        self.epitaph.add_value(self.subclass_of, self.inscription)
+
+    def closure(self):
+        return set(SubclassOf.objects.values_list('ancestor_id', 'descendant_id', 'depth'))
+
+    def test_closure(self):
+        self.assertEqual({(self.document.pk, self.inscription.pk, 1), (self.inscription.pk, self.epitaph.pk, 1),
+                          (self.document.pk, self.epitaph.pk, 2)}, self.closure())
+
+    def test_instances_of_subclasses(self):
+        epitaph = Item.objects.create()
+        epitaph.add_value(self.is_a, self.epitaph)
+        document = Item.objects.create()
+        document.add_value(self.is_a, self.document)
+        self.assertEqual({epitaph, document}, set(get_instances_of(self.document)))
+        self.assertEqual([epitaph], list(get_instances_of(self.inscription)))
+
+    def test_shortest_path(self):
+        self.epitaph.add_value(self.subclass_of, self.document)
+        self.assertIn((self.document.pk, self.epitaph.pk, 1), self.closure())
+
+    def test_edge_removal(self):
+        self.inscription.get_claims()[self.subclass_of.pk][0].delete()
+        self.assertEqual({(self.inscription.pk, self.epitaph.pk, 1)}, self.closure())
+
+    def test_edge_change(self):
+        other = Item.objects.create()
+        self.inscription.set_value(self.subclass_of, other)
+        self.assertEqual({(other.pk, self.inscription.pk, 1), (self.inscription.pk, self.epitaph.pk, 1),
+                          (other.pk, self.epitaph.pk, 2)}, self.closure())
+
+    def test_cycle(self):
+        self.document.add_value(self.subclass_of, self.epitaph)
+        SubclassOf.rebuild()
+        closure = self.closure()
+        self.assertEqual(6, len(closure))
+        self.assertIn((self.epitaph.pk, self.document.pk, 1), closure)
+        self.assertFalse([(ancestor, descendant) for ancestor, descendant, _ in closure if ancestor == descendant])
+
+    def test_rebuild(self):
+        expected = self.closure()
+        SubclassOf.objects.all().delete()
+        self.assertEqual(3, SubclassOf.rebuild())
+        self.assertEqual(expected, self.closure())
+
+
+class BacklinkTestCase(TestCase):
+    def setUp(self):
+        self.prop = Property.objects.create(data_type=Datatype.objects.get(class_name='Item'))
+        self.string_prop = Property.objects.create(data_type=Datatype.objects.get(class_name='StringValue'))
+        self.target = Item.objects.create()
+        self.source = Item.objects.create()
+
+    def links(self):
+        return set(Backlink.objects.values_list('source_id', 'target_id', 'role'))
+
+    def test_mainsnak_qualifier_reference(self):
+        statement = self.source.add_value(self.prop, self.target)
+        other = Item.objects.create()
+        qualified = other.add_value(self.string_prop, StringValue.objects.create(value='x'))
+        Qualifier.objects.create(statement=qualified, snak=PropertySnak.objects.create(
+            property=self.prop, type=PropertySnak.Type.VALUE, value=self.target))
+        record = ReferenceRecord.objects.create(statement=statement)
+        ReferenceSnak.objects.create(reference=record, snak=PropertySnak.objects.create(
+            property=self.prop, type=PropertySnak.Type.VALUE, value=other))
+        self.assertEqual({(self.source.pk, self.target.pk, Backlink.Role.MAINSNAK),
+                          (other.pk, self.target.pk, Backlink.Role.QUALIFIER),
+                          (self.source.pk, other.pk, Backlink.Role.REFERENCE)}, self.links())
+
+        expected = self.links()
+        self.assertEqual(3, Backlink.rebuild())
+        self.assertEqual(expected, self.links())
+
+        record.delete()
+        qualified.qualifiers.get().delete()
+        self.assertEqual({(self.source.pk, self.target.pk, Backlink.Role.MAINSNAK)}, self.links())
+        statement.delete()
+        self.assertFalse(self.links())
+
+    def test_value_change(self):
+        self.source.add_value(self.prop, self.target)
+        other = Item.objects.create()
+        self.source.set_value(self.prop, other)
+        self.assertEqual({(self.source.pk, other.pk, Backlink.Role.MAINSNAK)}, self.links())
+
+    def test_bulk_writer(self):
+        entity = EntityBulkWriter().write([EntitySpec(statements=[
+            StatementSpec(SnakSpec(self.prop, self.target), qualifiers=[SnakSpec(self.prop, self.source)],
+                          references=[[SnakSpec(self.string_prop, StringValue(value='x'))]])
+        ])])[0]
+        self.assertEqual({(entity.pk, self.target.pk, Backlink.Role.MAINSNAK),
+                          (entity.pk, self.source.pk, Backlink.Role.QUALIFIER)}, self.links())
+
+    def test_linked_items(self):
+        PropertyMapping.objects.create(key='is_a', property=self.prop)
+        for _ in range(3):
+            Item.objects.create().add_value(self.prop, self.target)
+        response = self.client.get(reverse('item_display', args=[self.target.display_id]),
+                                   {'linked_limit': 2, 'linked_page': 2})
+        self.assertEqual(3, response.context['linked_items'].paginator.count)
+        self.assertEqual(1, len(response.context['linked_items']))
+        for limit in ('abc', '0'):
+            response = self.client.get(reverse('item_display', args=[self.target.display_id]), {'linked_limit': limit})
+            self.assertEqual(3, len(response.context['linked_items']))
+
+    def test_api(self):
+        client = APIClient()
+        client.force_authenticate(user=User.objects.create_superuser('testuser'))
+        self.source.add_value(self.prop, self.target)
+        self.prop.add_value(self.prop, self.target)
+        response = client.get(f'/api/items/{self.target.display_id}/backlinks/', {'limit': 1, 'page': 2})
+        self.assertEqual(200, response.status_code)
+        self.assertEqual({'count': 2, 'page': 2, 'num_pages': 2, 'results': [
+            {'source': f'Q{self.source.display_id}', 'property': f'P{self.prop.display_id}', 'role': 'mainsnak'}
+        ]}, response.json())
+        for limit in ('abc', '0', '100000'):
+            response = client.get(f'/api/items/{self.target.display_id}/backlinks/', {'limit': limit})
+            self.assertEqual((200, 2), (response.status_code, len(response.json()['results'])))
+
+
+class PropertyUsageTestCase(TestCase):
+    def setUp(self):
+        self.prop = Property.objects.create(data_type=Datatype.objects.get(class_name='Item'))
+        self.string_prop = Property.objects.create(data_type=Datatype.objects.get(class_name='StringValue'))
+        self.person, self.place = Item.objects.create(), Item.objects.create()
+
+    def distribution(self):
+        return set(PropertyValueUsage.objects.values_list('property_id', 'value_id', 'count'))
+
+    def test_counts(self):
+        statements = [Item.objects.create().add_value(self.prop, self.person) for _ in range(2)]
+        Item.objects.create().add_value(self.prop, self.place)
+        Item.objects.create().add_value(self.string_prop, StringValue.objects.create(value='x'))
+        self.assertEqual(3, PropertyUsage.get_count(self.prop))
+        self.assertEqual(1, PropertyUsage.get_count(self.string_prop))
+        self.assertEqual({(self.prop.pk, self.person.pk, 2), (self.prop.pk, self.place.pk, 1)}, self.distribution())
+
+        for statement in statements:
+            statement.delete()
+        self.assertEqual(1, PropertyUsage.get_count(self.prop))
+        self.assertEqual({(self.prop.pk, self.place.pk, 1)}, self.distribution())
+
+        expected = set(PropertyUsage.objects.values_list('property_id', 'count')), self.distribution()
+        PropertyUsage.objects.all().delete()
+        PropertyValueUsage.objects.all().delete()
+        self.assertEqual(2, PropertyUsage.rebuild())
+        self.assertEqual(expected, (set(PropertyUsage.objects.values_list('property_id', 'count')),
+                                    self.distribution()))
+
+    def test_value_change(self):
+        item = Item.objects.create()
+        item.add_value(self.prop, self.person)
+        item.set_value(self.prop, self.place)
+        self.assertEqual(1, PropertyUsage.get_count(self.prop))
+        self.assertEqual({(self.prop.pk, self.place.pk, 1)}, self.distribution())
+
+    def test_delete_stale_statement(self):
+        statement = Item.objects.create().add_value(self.prop, self.person)
+        stale = Statement.objects.select_related('mainsnak').get(pk=statement.pk)
+        snak = PropertySnak.objects.get(pk=statement.mainsnak_id)
+        snak.value = self.place
+        snak.save()
+        self.assertEqual(self.person.pk, stale.mainsnak.value_id)
+        stale.delete()
+        self.assertEqual(0, PropertyUsage.get_count(self.prop))
+        self.assertEqual(set(), self.distribution())
+
+    def test_bulk_writer(self):
+        EntityBulkWriter().write([EntitySpec(statements=[StatementSpec(SnakSpec(self.prop, self.person))])
+                                  for _ in range(3)])
+        self.assertEqual(3, PropertyUsage.get_count(self.prop))
+        self.assertEqual({(self.prop.pk, self.person.pk, 3)}, self.distribution())
+
+    def test_property_display(self):
+        subjects = [Item.objects.create() for _ in range(3)]
+        for subject in subjects:
+            subject.add_value(self.prop, self.person)
+        subjects[0].add_value(self.prop, self.place)
+        url = reverse('property_display', args=[self.prop.display_id])
+
+        usage = self.client.get(url, {'limit': 2}).context['usage']
+        self.assertEqual(4, usage.count)
+        self.assertEqual([f'Q{s.display_id}' for s in subjects[:2]], [str(s) for _, s in usage.subjects])
+        self.assertEqual([(f'Q{self.person.display_id}', 3), (f'Q{self.place.display_id}', 1)],
+                         [(str(value), count) for value, count in usage.top_values])
+
+        usage = self.client.get(url, {'limit': 2, 'after': usage.next_cursor}).context['usage']
+        self.assertEqual([f'Q{subjects[2].display_id}', f'Q{subjects[0].display_id}'],
+                         [str(s) for _, s in usage.subjects])
+        self.assertIsNone(usage.next_cursor)
+
+    def test_api(self):
+        client = APIClient()
+        client.force_authenticate(user=User.objects.create_superuser('testuser'))
+        statement = self.place.add_value(self.prop, self.person)
+        response = client.get(f'/api/properties/{self.prop.display_id}/usage/')
+        self.assertEqual(200, response.status_code)
+        self.assertEqual({'count': 1, 'next': None,
+                          'results': [{'statement': statement.pk, 'subject': f'Q{self.place.display_id}'}],
+                          'top_values': [{'value': f'Q{self.person.display_id}', 'count': 1}]}, response.json())
+
+    def test_limit(self):
+        client = APIClient()
+        client.force_authenticate(user=User.objects.create_superuser('testuser'))
+        self.place.add_value(self.prop, self.person)
+        for limit in ('0', '-1', '100000'):
+            response = client.get(f'/api/properties/{self.prop.display_id}/usage/', {'limit': limit})
+            self.assertEqual(1, len(response.json()['results']))
+        response = self.client.get(reverse('property_display', args=[self.prop.display_id]), {'limit': '0'})
+        self.assertEqual(1, len(response.context['usage'].subjects))
+        with self.assertRaises(ValueError):
+            PropertyUsageBrowser(self.prop).get_page(limit=0)
+
+
+class TermIndexTestCase(TestCase):
+    def test_normalize_term(self):
+        self.assertEqual('eglise saint-etienne', normalize_term('  Église   Saint-Étienne '))
+        self.assertEqual('ευαγγελοσ', normalize_term('Εὐάγγελος'))
+        self.assertEqual(normalize_term('ὁδός'), normalize_term('ΟΔΟΣ'))
+
+    def test_changes_are_logged_on_commit(self):
+        item = Item.objects.create()
+        version = Sequence.current(TermChange.VERSION_SEQUENCE)
+        with self.captureOnCommitCallbacks() as callbacks:
+            item.set_label('fr', 'Temple')
+            item.set_description('fr', 'un temple')
+            self.assertEqual(version, Sequence.current(TermChange.VERSION_SEQUENCE))
+        for callback in callbacks:
+            callback()
+        self.assertEqual(version + 2, Sequence.current(TermChange.VERSION_SEQUENCE))
+        self.assertEqual({(version + 1, item.pk), (version + 2, item.pk)},
+                         set(TermChange.objects.values_list('version', 'entity_id')))
+
+    def test_terms_are_indexed(self):
+        item = Item.objects.create()
+        item.set_label('fr', 'Église Saint-Étienne')
+        item.set_description('fr', 'une église')
+        alias = item.aliases.create(language='fr', text='Cathédrale')
+        entry = TermIndex.objects.get(term=item.get_label('fr'))
+        self.assertEqual((item.pk, 'fr', TermIndex.Type.LABEL, 'eglise saint-etienne'),
+                         (entry.entity_id, entry.language, entry.type, entry.text))
+        self.assertEqual({'eglise', 'saint', 'etienne'}, set(entry.tokens.values_list('token', flat=True)))
+
+        item.set_label('fr', 'Temple')
+        self.assertEqual(['temple'], list(TermToken.objects.filter(entry__type=TermIndex.Type.LABEL)
+                                          .values_list('token', flat=True)))
+        alias.delete()
+        self.assertEqual({TermIndex.Type.LABEL, TermIndex.Type.DESCRIPTION},
+                         set(TermIndex.objects.values_list('type', flat=True)))
+        self.assertFalse(TermToken.objects.filter(token='cathedrale').exists())
+
+    def test_bulk_write_and_rebuild(self):
+        item, = EntityBulkWriter().write([EntitySpec(labels={'en': 'Gold coin'}, aliases={'en': ['Aureus']})])
+        EntityBulkWriter().write([EntitySpec(entity=item, labels={'en': 'Silver coin'})])
+        self.assertEqual({'silver coin', 'aureus'}, set(TermIndex.objects.values_list('text', flat=True)))
+        TermIndex.objects.all().delete()
+        self.assertEqual(2, TermIndex.rebuild())
+        self.assertEqual({'silver', 'coin', 'aureus'}, set(TermToken.objects.values_list('token', flat=True)))
+
+    def test_search(self):
+        items = EntityBulkWriter().write([
+            EntitySpec(labels={'en': 'Roman coin hoard'}),
+            EntitySpec(labels={'en': 'Coin'}),
+            EntitySpec(labels={'en': 'Coinage'}, aliases={'fr': ['Monnayage']}),
+            EntitySpec(labels={'en': 'Hoard'}, aliases={'en': ['coin deposit']}),
+            EntitySpec(labels={'en': 'Bridge'}, descriptions={'en': 'a coin was found below'}),
+        ])
+        search = TermSearch()
+        self.assertEqual([items[1].pk, items[2].pk, items[3].pk, items[0].pk], search.ranked_ids('coin'))
+        # All the words must match the same term.
+        self.assertEqual([items[0].pk], search.ranked_ids('HOARD co'))
+        self.assertEqual([items[2].pk], search.ranked_ids('monnay'))
+        self.assertEqual([], TermSearch(languages=['en']).ranked_ids('monnay'))
+        self.assertEqual([items[4]], TermSearch(types=[TermIndex.Type.DESCRIPTION]).search(Item.objects.all(), 'fou'))
+        self.assertEqual(4, search.filter(Item.objects.all(), 'coin').count())
@@ -1,7 +1,8 @@
 from django.db.utils import IntegrityError
 from django.test import TestCase
 
-from pecunia.models import Property, Datatype, UnknownMappingException, PropertyMapping, ItemMapping, Item
+from pecunia.models import Property, Datatype, UnknownMappingException, PropertyMapping, ItemMapping, Item, \
+    Sequence, MappingRegistry, mapping_registry
 
 
 class PropertyMappingTestCase(TestCase):
@@ -54,3 +55,44 @@ class ItemMappingTestCase(TestCase):
         ItemMapping.objects.create(key='test1', item=item)
         with self.assertRaises(IntegrityError):
             ItemMapping.objects.create(key='test2', item=item)
+
+
+class MappingRegistryTestCase(TestCase):
+    def setUp(self):
+        self.item = Item.objects.create()
+        ItemMapping.objects.create(key='test', item=self.item)
+
+    def test_get_key(self):
+        self.assertEqual('test', ItemMapping.get_key(self.item))
+        with self.assertRaises(UnknownMappingException):
+            ItemMapping.get_key(Item.objects.create())
+
+    def test_instances_are_not_shared(self):
+        first = ItemMapping.get('test')
+        first.display_id = -1
+        self.assertEqual(self.item.display_id, ItemMapping.get('test').display_id)
+
+    def test_served_from_memory_within_scope(self):
+        ItemMapping.get('test')
+        with mapping_registry.scope():
+            with self.assertNumQueries(1):
+                ItemMapping.get('test')
+                self.assertTrue(ItemMapping.has('test'))
+                self.assertFalse(PropertyMapping.has('test'))
+
+    def test_invalidated_on_write(self):
+        self.assertFalse(ItemMapping.has('other'))
+        other = Item.objects.create()
+        ItemMapping.objects.create(key='other', item=other)
+        self.assertEqual(other, ItemMapping.get('other'))
+        ItemMapping.objects.filter(key='other').get().delete()
+        self.assertFalse(ItemMapping.has('other'))
+
+    def test_reloaded_when_version_changes(self):
+        ItemMapping.get('test')
+        # Writes made by another process only bump the version.
+        ItemMapping.objects.filter(key='test').update(key='renamed')
+        self.assertTrue(ItemMapping.has('test'))
+        Sequence.reserve(MappingRegistry.VERSION_SEQUENCE)
+        self.assertFalse(ItemMapping.has('test'))
+        self.assertEqual(self.item, ItemMapping.get('renamed'))
@@ -1,6 +1,7 @@
 from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import connection
 from django.test import TestCase
-from parameterized import parameterized
+from django.test.utils import CaptureQueriesContext
 
 import pecunia.models as m
 from pecunia.models import PropertySnak
@@ -135,25 +136,19 @@ class PropertySnakTestCase(TestCase):
         self.assertEqual(p, sn.property)
         self.assertEqual(PropertySnak.Type.SOME_VALUE, sn.type)
 
-    @parameterized.expand([
-        m.PropertySnak.Type.SOME_VALUE,
-        m.PropertySnak.Type.NO_VALUE
-    ])
-    def test_create_with_value_when_type_is_wrong(self, snak_type: PropertySnak.Type):
+    def test_create_with_value_when_type_is_wrong(self):
         p = m.Property.objects.create(data_type=m.Datatype.objects.get(class_name='Item'))
         i = m.Item.objects.create()
-        with self.assertRaises(FieldDoesNotExist):
-            m.PropertySnak.objects.create(property=p, type=snak_type, value=i)
-
-    @parameterized.expand([
-        m.PropertySnak.Type.SOME_VALUE,
-        m.PropertySnak.Type.NO_VALUE
-    ])
-    def test_get_value_when_type_is_wrong(self, snak_type: PropertySnak.Type):
+        for snak_type in (m.PropertySnak.Type.SOME_VALUE, m.PropertySnak.Type.NO_VALUE):
+            with self.subTest(snak_type=snak_type), self.assertRaises(FieldDoesNotExist):
+                m.PropertySnak.objects.create(property=p, type=snak_type, value=i)
+
+    def test_get_value_when_type_is_wrong(self):
         p = m.Property.objects.create(data_type=m.Datatype.objects.get(class_name='Item'))
-        sn = m.PropertySnak.objects.create(property=p, type=snak_type)
-        with self.assertRaises(FieldDoesNotExist):
-            _ = sn.value
+        for snak_type in (m.PropertySnak.Type.SOME_VALUE, m.PropertySnak.Type.NO_VALUE):
+            sn = m.PropertySnak.objects.create(property=p, type=snak_type)
+            with self.subTest(snak_type=snak_type), self.assertRaises(FieldDoesNotExist):
+                _ = sn.value
 
     def test_delete(self):
         self.assertEqual(m.QuantityValue.objects.count(), 0)
@@ -210,3 +205,177 @@ class StatementTestCase(TestCase):
         self.assertEqual(m.Item.objects.count(), 1)
         self.assertEqual(m.Statement.objects.count(), 0)
         self.assertEqual(PropertySnak.objects.count(), 0)
+
+
+class ClaimIndexTestCase(TestCase):
+    def setUp(self):
+        self.item = m.Item.objects.create()
+        self.target = m.Item.objects.create()
+        self.item_prop = m.Property.objects.create(data_type=m.Datatype.objects.get(class_name='Item'))
+        self.string_prop = m.Property.objects.create(data_type=m.Datatype.objects.get(class_name='StringValue'))
+        self.item.add_value(self.item_prop, self.target)
+        self.item.add_value(self.string_prop, m.StringValue.objects.create(value='text'))
+
+    def test_index_is_built_in_constant_queries(self):
+        item = m.Item.objects.get(pk=self.item.pk)
+        # statements, value types, then items and strings
+        with self.assertNumQueries(4):
+            claims = item.get_claims()
+        self.assertEqual({self.item_prop.pk, self.string_prop.pk}, set(claims))
+        with self.assertNumQueries(0):
+            self.assertEqual(self.target, item.get_value(self.item_prop))
+            self.assertEqual('text', item.get_value(self.string_prop).value)
+            self.assertIsInstance(item.get_value(self.item_prop), m.Item)
+
+    def test_get_value_of_unused_property(self):
+        prop = m.Property.objects.create(data_type=m.Datatype.objects.get(class_name='Item'))
+        item = m.Item.objects.get(pk=self.item.pk)
+        item.get_claims()
+        with self.assertNumQueries(0):
+            self.assertIsNone(item.get_value(prop))
+
+    def test_add_value_updates_index(self):
+        item = m.Item.objects.get(pk=self.item.pk)
+        item.get_claims()
+        other = m.Item.objects.create()
+        item.add_value(self.item_prop, other)
+        with self.assertNumQueries(0):
+            self.assertEqual(2, len(item.get_claims()[self.item_prop.pk]))
+        self.assertEqual(2, item.statements.filter(mainsnak__property=self.item_prop).count())
+
+    def test_add_or_set_value(self):
+        item = m.Item.objects.get(pk=self.item.pk)
+        other = m.Item.objects.create()
+        item.add_or_set_value(self.item_prop, other)
+        self.assertEqual(other, item.get_value(self.item_prop))
+        self.assertEqual(1, item.statements.filter(mainsnak__property=self.item_prop).count())
+        self.assertEqual(other, m.Item.objects.get(pk=self.item.pk).get_value(self.item_prop))
+
+    def test_refresh_from_db_drops_index(self):
+        item = m.Item.objects.get(pk=self.item.pk)
+        item.get_claims()
+        self.item.add_value(self.item_prop, m.Item.objects.create())
+        item.refresh_from_db()
+        self.assertEqual(2, len(item.get_claims()[self.item_prop.pk]))
+
+
+class DisplayIdSequenceTestCase(TestCase):
+    def test_reserve_block(self):
+        m.Item.objects.create()
+        display_ids = m.Item.reserve_display_ids(3)
+        self.assertEqual(range(2, 5), display_ids)
+        for display_id in display_ids:
+            m.Item.objects.create(display_id=display_id)
+        self.assertEqual(5, m.Item.objects.create().display_id)
+
+    def test_explicit_display_id_advances_sequence(self):
+        m.Item.objects.create()
+        m.Item.objects.create(display_id=2)
+        m.Item.objects.create(display_id=10)
+        self.assertEqual(11, m.Item.objects.create().display_id)
+        m.Item.objects.create(display_id=5)
+        self.assertEqual(12, m.Item.objects.create().display_id)
+
+    def test_assigned_display_ids_do_not_advance_sequence(self):
+        items = [m.Item(), m.Item()]
+        m.Item.assign_display_ids(items)
+        self.assertEqual([1, 2], [item.display_id for item in items])
+        with CaptureQueriesContext(connection) as queries:
+            for item in items:
+                item.save()
+        self.assertFalse([query for query in queries if 'pecunia_sequence' in query['sql']])
+        self.assertEqual(3, m.Item.objects.create().display_id)
+
+    def test_reserve_nothing(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(0, len(m.Item.reserve_display_ids(0)))
+
+    def test_display_ids_are_not_reused(self):
+        m.Item.objects.create()
+        m.Item.objects.create().delete()
+        self.assertEqual(3, m.Item.objects.create().display_id)
+
+    def test_sequence_created_from_existing_display_ids(self):
+        m.Property.objects.create(data_type=m.Datatype.objects.get(class_name='Item'), display_id=41)
+        m.Sequence.objects.filter(name='property').delete()
+        self.assertEqual(range(42, 44), m.Property.reserve_display_ids(2))
+
+    def test_proxy_uses_concrete_sequence(self):
+        m.Item.objects.create()
+        self.assertEqual(range(2, 3), m.Document.reserve_display_ids(1))
+
+
+class PrefetchValuesTestCase(TestCase):
+    def setUp(self):
+        self.subject = m.Item.objects.create()
+        self.item_prop = m.Property.objects.create(data_type=m.Datatype.objects.get(class_name='Item'))
+        self.string_prop = m.Property.objects.create(data_type=m.Datatype.objects.get(class_name='StringValue'))
+        for i in range(5):
+            statement = self.subject.add_value(self.item_prop, m.Item.objects.create())
+            snak = m.PropertySnak.objects.create(property=self.string_prop, type=0,
+                                                 value=m.StringValue.objects.create(value=f'q{i}'))
+            statement.qualifiers.create(snak=snak)
+        self.subject.add_value(self.string_prop, m.StringValue.objects.create(value='text'))
+        m.PropertySnak.objects.create(property=self.item_prop, type=m.PropertySnak.Type.NO_VALUE)
+
+    def test_prefetch_snak_values(self):
+        # snaks, value types, then items and strings
+        with self.assertNumQueries(4):
+            snaks = list(m.PropertySnak.objects.prefetch_values())
+            values = [snak.value for snak in snaks if snak.type == m.PropertySnak.Type.VALUE]
+        self.assertEqual(11, len(values))
+        self.assertEqual(5, sum(isinstance(value, m.Item) for value in values))
+        self.assertEqual(6, sum(isinstance(value, m.StringValue) for value in values))
+
+    def test_prefetch_through_lookups(self):
+        # statements, snaks, qualifiers, qualifier snaks, value types, then items and strings
+        with self.assertNumQueries(7):
+            statements = list(m.Statement.objects.prefetch_values('mainsnak', 'qualifiers__snak'))
+            qualifier_values = [q.snak.value.value for s in statements for q in s.qualifiers.all()]
+            main_values = [s.mainsnak.value for s in statements]
+        self.assertEqual({f'q{i}' for i in range(5)}, set(qualifier_values))
+        self.assertEqual(5, sum(isinstance(value, m.Item) for value in main_values))
+
+    def test_prefetch_values_function(self):
+        snaks = list(m.PropertySnak.objects.filter(type=m.PropertySnak.Type.VALUE))
+        with self.assertNumQueries(3):
+            m.prefetch_values(snaks)
+        with self.assertNumQueries(0):
+            self.assertEqual(11, len([snak.value for snak in snaks]))
+
+    def test_resolve_concrete_entity(self):
+        entity = m.DescribedEntity.objects.create()
+        self.assertIs(m.DescribedEntity, type(m.resolve_values([entity.pk])[entity.pk]))
+
+
+class ConcreteTypeTestCase(TestCase):
+    def test_concrete_type_is_set_on_save(self):
+        self.assertEqual('item', m.Item.objects.create().concrete_type)
+        self.assertEqual('stringvalue', m.StringValue.objects.create(value='a').concrete_type)
+        self.assertEqual('item', m.Document.get_concrete_type())
+        de = m.DescribedEntity.objects.create()
+        de.set_label('en', 'label')
+        self.assertEqual('label', m.Value.objects.get(pk=de.labels.get().pk).concrete_type)
+
+    def test_value_descriptor_does_not_join_subclass_tables(self):
+        p = m.Property.objects.create(data_type=m.Datatype.objects.get(class_name='StringValue'))
+        v = m.StringValue.objects.create(value='a')
+        snak = m.PropertySnak.objects.create(property=p, type=0, value=v)
+        snak = m.PropertySnak.objects.get(pk=snak.pk)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(v, snak.value)
+        self.assertIsInstance(snak.value, m.StringValue)
+        self.assertEqual(2, len(queries))
+        self.assertFalse(any('LEFT OUTER JOIN' in query['sql'] for query in queries))
+
+    def test_leaf_descriptor_is_a_single_query(self):
+        p = m.Property.objects.create(data_type=m.Datatype.objects.get(class_name='Item'))
+        snak = m.PropertySnak.objects.create(property=p, type=m.PropertySnak.Type.SOME_VALUE)
+        snak = m.PropertySnak.objects.get(pk=snak.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(p, snak.property)
+
+    def test_untyped_values_are_still_resolved(self):
+        item = m.Item.objects.create()
+        m.Value.objects.filter(pk=item.pk).update(concrete_type='')
+        self.assertIsInstance(m.resolve_values([item.pk])[item.pk], m.Item)
@@ -0,0 +1,93 @@
+import json
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+import pecunia.models as m
+
+
+def snak(value_type, value=None, snak_type='value'):
+    return {'snakType': snak_type, 'type': value_type, 'value': value}
+
+
+def item_snak(token):
+    return snak('Item', {'item': {'tokenId': token}})
+
+
+class AnnotatorApiTestCase(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('testuser'))
+        datatypes = {d.class_name: d for d in m.Datatype.objects.all()}
+        self.owner = m.Property.objects.create(data_type=datatypes['Item'])
+        self.note = m.Property.objects.create(data_type=datatypes['StringValue'])
+        m.ItemMapping.objects.create(key='document', item=m.Item.objects.create())
+        m.PropertyMapping.objects.create(key='is_a', property=m.Property.objects.create(data_type=datatypes['Item']))
+        self.document = m.Document.objects.create()
+        self.place = m.Item.objects.create()
+
+    def payload(self, new_tokens, schemas, linked=()):
+        return {
+            'document': self.document.display_id,
+            'entities': {'taggedEntities': {}, 'untaggedEntities': {}},
+            'reconciliations': {
+                'newItems': [{'tokenId': token} for token in new_tokens],
+                'linkedItems': [{'token': {'tokenId': token}, 'qid': qid} for token, qid in linked],
+            },
+            'schemas': schemas,
+        }
+
+    def person(self, token, name, owned):
+        return {
+            'token': {'tokenId': token},
+            'terms': [{'type': 'label', 'langCode': 'en', 'value': name},
+                      {'type': 'alias', 'langCode': 'en', 'value': name.upper()}],
+            'statements': [{'property': self.owner.display_id, 'statements': [{
+                'mainSnak': item_snak(owned),
+                'qualifiers': [{'property': self.note.display_id, 'snak': snak('StringValue', {'value': 'lease'})}],
+                'referenceRecords': [[{'property': self.note.display_id, 'snak': snak('StringValue', None,
+                                                                                       'somevalue')}]],
+            }]}],
+        }
+
+    def post(self, payload):
+        return self.client.post('/api/annotator', json.dumps(payload), content_type='application/json')
+
+    def test_post(self):
+        response = self.post(self.payload(['t1', 't2'], [self.person('t1', 'Aurelius', 't3'),
+                                                         self.person('t2', 'Isidoros', 't1')],
+                                          linked=[('t3', self.place.display_id)]))
+        self.assertEqual(200, response.status_code)
+        data = response.json()
+        self.assertEqual(['parse', 'resolve', 'build', 'write'], list(data['timings']))
+        aurelius = m.Item.objects.get(display_id=data['newItems']['t1'])
+        isidoros = m.Item.objects.get(display_id=data['newItems']['t2'])
+        self.assertEqual('Aurelius', aurelius.get_label('en').text)
+        self.assertEqual(['AURELIUS'], [alias.text for alias in aurelius.aliases.all()])
+        statement = aurelius.statements.get()
+        self.assertEqual(self.place, statement.mainsnak.value)
+        self.assertEqual('lease', statement.qualifiers.get().snak.value.value)
+        self.assertEqual(m.PropertySnak.Type.SOME_VALUE, statement.reference_records.get().snaks.get().snak.type)
+        self.assertEqual(aurelius, isidoros.statements.get().mainsnak.value)
+        self.assertFalse(self.place.statements.exists())
+
+    def test_query_count_does_not_depend_on_size(self):
+        with CaptureQueriesContext(connection) as small:
+            self.post(self.payload(['t1'], [self.person('t1', 'Aurelius', 't1')]))
+        tokens = [f't{i}' for i in range(20)]
+        with CaptureQueriesContext(connection) as large:
+            response = self.post(self.payload(tokens, [self.person(token, token, tokens[0]) for token in tokens]))
+        self.assertEqual(20, len(response.json()['newItems']))
+        self.assertEqual(len(small), len(large))
+
+    def test_invalid_payload_writes_nothing(self):
+        items = m.Item.objects.count()
+        response = self.post(self.payload(['t1'], [self.person('t1', 'Aurelius', 't9')]))
+        self.assertEqual(400, response.status_code)
+        self.assertEqual(["tokens neither created nor linked: t9"], response.json()['errors'])
+        response = self.post(self.payload(['t1'], [self.person('t1', 'Aurelius', 't1')], linked=[('t2', 999)]))
+        self.assertEqual(["unknown item Q999"], response.json()['errors'])
+        response = self.post({'document': self.document.display_id})
+        self.assertEqual(400, response.status_code)
+        self.assertEqual(items, m.Item.objects.count())
@@ -0,0 +1,75 @@
+from django.test import TestCase
+
+import pecunia.models as m
+from pecunia.autocomplete import AutocompleteIndex
+from pecunia.bulk import EntityBulkWriter, EntitySpec
+
+
+class AutocompleteIndexTestCase(TestCase):
+    def setUp(self):
+        self.index = AutocompleteIndex(refresh_interval=0)
+        self.items = EntityBulkWriter().write([
+            EntitySpec(labels={'en': 'Roman coin hoard'}, descriptions={'en': 'a hoard'}),
+            EntitySpec(labels={'en': 'Coin', 'fr': 'Pièce'}, descriptions={'en': 'a piece of money'}),
+            EntitySpec(labels={'en': 'Coinage'}),
+            EntitySpec(labels={'en': 'Hoard'}, aliases={'en': ['coin deposit']}),
+            EntitySpec(entity=m.Property(data_type=m.Datatype.objects.get(class_name='Item')),
+                       labels={'en': 'coined by'}),
+        ])
+
+    def search(self, *args, **kwargs):
+        return [str(match.ref) for match in self.index.search(*args, **kwargs)]
+
+    def test_search(self):
+        items = [item.pretty_display_id for item in self.items]
+        self.assertEqual([items[1], items[2], items[3], items[0]], self.search('coin'))
+        self.assertEqual([items[1], items[2]], self.search('COIN', limit=2))
+        self.assertEqual([self.items[4].pretty_display_id], self.search('coin', 'property'))
+        self.assertEqual([items[3], items[0]], self.search('hoard'))
+        self.assertEqual([], self.search('  '))
+
+    def test_match(self):
+        match, = self.index.search('piece', language='fr')
+        self.assertEqual((self.items[1].pretty_display_id, 'Pièce', None, 'label', 'fr', 'Pièce'),
+                         (str(match.ref), match.label, match.description, match.match_type, match.match_language,
+                          match.match_text))
+        match, = self.index.search('deposit')
+        self.assertEqual(('Hoard', 'alias', 'coin deposit'), (match.label, match.match_type, match.match_text))
+        match, = self.index.search('piece')
+        self.assertEqual(('Pièce', 'label'), (match.label, match.match_type))
+
+    def test_no_queries_once_loaded(self):
+        self.index.refresh_interval = 60
+        self.index.search('coin')
+        with self.assertNumQueries(0):
+            self.assertEqual(4, len(self.index.search('co')))
+
+    def test_changes_are_applied(self):
+        self.index.search('coin')
+        # The changes are logged once committed.
+        with self.captureOnCommitCallbacks(execute=True):
+            self.items[2].set_label('en', 'Minting')
+            self.items[0].aliases.create(language='en', text='Treasure')
+            self.items[3].delete()
+            item = m.Item.objects.create()
+            item.set_label('en', 'Coin die')
+        with self.assertNumQueries(3):
+            self.assertEqual([self.items[1].pretty_display_id, item.pretty_display_id, self.items[0].pretty_display_id],
+                             self.search('coin'))
+        self.assertEqual([self.items[2].pretty_display_id], self.search('mint'))
+        self.assertEqual([self.items[0].pretty_display_id], self.search('treas'))
+
+    def test_reload_after_rebuild(self):
+        self.index.search('coin')
+        m.TermIndex.rebuild()
+        self.assertEqual(4, len(self.search('coin')))
+
+    def test_reload_after_pruning(self):
+        self.index.search('coin')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.items[2].set_label('en', 'Minting')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.items[1].set_label('en', 'Mint')
+        self.assertEqual(1, m.TermChange.prune(m.Sequence.current(m.TermChange.VERSION_SEQUENCE) - 1))
+        self.assertEqual({self.items[1].pk}, set(m.TermChange.objects.values_list('entity_id', flat=True)))
+        self.assertEqual([self.items[1].pretty_display_id, self.items[2].pretty_display_id], self.search('mint'))
@@ -0,0 +1,99 @@
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+import pecunia.models as m
+from pecunia.bulk import EntityBulkWriter, EntitySpec, StatementSpec, SnakSpec, bulk_create_values
+
+
+class BulkCreateValuesTestCase(TestCase):
+    def test_insert_mixed_subclasses(self):
+        values = [m.StringValue(value='a'), m.Item(display_id=7), m.StringValue(value='b'),
+                  m.MonolingualTextValue(language='en', text='c')]
+        with self.assertNumQueries(10):
+            bulk_create_values(values)
+        self.assertTrue(all(value.pk for value in values))
+        self.assertEqual({'a', 'b'}, set(m.StringValue.objects.values_list('value', flat=True)))
+        self.assertEqual(7, m.Item.objects.get(pk=values[1].pk).display_id)
+        self.assertIsInstance(m.Value.objects.get_subclass(pk=values[3].pk), m.MonolingualTextValue)
+
+
+class EntityBulkWriterTestCase(TestCase):
+    def setUp(self):
+        self.item_prop = m.Property.objects.create(data_type=m.Datatype.objects.get(class_name='Item'))
+        self.string_prop = m.Property.objects.create(data_type=m.Datatype.objects.get(class_name='StringValue'))
+        self.target = m.Item.objects.create()
+
+    def test_write_new_entities(self):
+        first = EntitySpec(labels={'en': 'first'}, descriptions={'en': 'the first one'},
+                           aliases={'en': ['1st', 'one']})
+        second = EntitySpec(labels={'fr': 'second'}, statements=[
+            StatementSpec(SnakSpec(self.item_prop, first),
+                          qualifiers=[SnakSpec(self.string_prop, m.StringValue(value='qualifier'))],
+                          references=[[SnakSpec(self.item_prop, self.target),
+                                       SnakSpec(self.string_prop, type=m.PropertySnak.Type.SOME_VALUE)]]),
+            StatementSpec(SnakSpec(self.string_prop, m.StringValue(value='text')), rank=m.Statement.Rank.PREFERRED),
+        ])
+        first_item, second_item = EntityBulkWriter().write([first, second])
+
+        self.assertEqual([2, 3], [first_item.display_id, second_item.display_id])
+        self.assertEqual(4, m.Item.objects.create().display_id)
+        self.assertEqual('first', first_item.get_label('en').text)
+        self.assertEqual('the first one', first_item.descriptions.get(language='en').text)
+        self.assertEqual({'1st', 'one'}, set(first_item.aliases.values_list('text', flat=True)))
+        self.assertEqual('second', second_item.get_label('fr').text)
+
+        item = m.Item.objects.get(pk=second_item.pk)
+        self.assertEqual(first_item, item.get_value(self.item_prop))
+        self.assertEqual('text', item.get_value(self.string_prop).value)
+        statement = item.statements.get(mainsnak__property=self.item_prop)
+        self.assertEqual('qualifier', statement.qualifiers.get().snak.value.value)
+        snaks = [ref.snak for ref in statement.reference_records.get().snaks.order_by('pk')]
+        self.assertEqual(self.target, snaks[0].value)
+        self.assertEqual(m.PropertySnak.Type.SOME_VALUE, snaks[1].type)
+        self.assertEqual(m.Statement.Rank.PREFERRED, item.statements.get(mainsnak__property=self.string_prop).rank)
+
+    def test_query_count_does_not_depend_on_size(self):
+        def specs(n):
+            return [EntitySpec(labels={'en': f'item {i}'}, statements=[
+                StatementSpec(SnakSpec(self.item_prop, self.target),
+                              qualifiers=[SnakSpec(self.string_prop, m.StringValue(value=str(i)))])
+            ]) for i in range(n)]
+
+        writer = EntityBulkWriter()
+        with CaptureQueriesContext(connection) as small:
+            writer.write(specs(2))
+        with self.assertNumQueries(len(small)):
+            writer.write(specs(50))
+        self.assertEqual(52, self.target.using_as_value_snaks.count())
+
+    def test_update_existing_entity(self):
+        self.target.set_label('en', 'old')
+        EntityBulkWriter().write([EntitySpec(self.target, labels={'en': 'new', 'fr': 'nouveau'}, statements=[
+            StatementSpec(SnakSpec(self.string_prop, m.StringValue(value='text')))
+        ])])
+        self.assertEqual({'en': 'new', 'fr': 'nouveau'}, dict(self.target.labels.values_list('language', 'text')))
+        self.assertEqual('text', self.target.get_value(self.string_prop).value)
+
+    def test_create_property(self):
+        prop, = EntityBulkWriter().write([EntitySpec(m.Property(data_type=m.Datatype.objects.get(class_name='Item')),
+                                                     labels={'en': 'prop'})])
+        self.assertEqual(3, prop.display_id)
+        self.assertEqual('prop', m.Property.objects.get(display_id=3).get_label('en').text)
+
+    def test_validation_is_done_before_writing(self):
+        specs = [
+            EntitySpec(labels={'en': 'valid'}),
+            EntitySpec(statements=[
+                StatementSpec(SnakSpec(self.item_prop, m.StringValue(value='wrong type'))),
+                StatementSpec(SnakSpec(self.item_prop, None)),
+                StatementSpec(SnakSpec(self.item_prop, self.target), rank=2),
+                StatementSpec(SnakSpec(self.item_prop, self.target, type=m.PropertySnak.Type.NO_VALUE)),
+            ]),
+        ]
+        with self.assertRaises(ValidationError) as cm:
+            EntityBulkWriter().write(specs)
+        self.assertEqual({'1.statements.0.mainsnak', '1.statements.1.mainsnak', '1.statements.2',
+                          '1.statements.3.mainsnak'}, set(cm.exception.message_dict))
+        self.assertEqual(1, m.Item.objects.count())
@@ -0,0 +1,23 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+import pecunia.models as m
+
+
+class PopulateDomainTestCase(TestCase):
+    def test_populate(self):
+        out = StringIO()
+        call_command('populate_domain', stdout=out)
+        self.assertEqual(f"{m.Property.objects.count()} properties, {m.Item.objects.count()} items\n", out.getvalue())
+
+        document = m.ItemMapping.get('document')
+        self.assertEqual('document', document.get_label('en').text)
+        self.assertEqual('subclass of', m.PropertyMapping.get('subclass_of').get_label('en').text)
+        self.assertTrue(m.Statement.objects.filter(subject=document, mainsnak__property=m.PropertyMapping.get('is_a'))
+                        .exists())
+
+        with self.assertRaisesMessage(CommandError, "already holds a domain"):
+            call_command('populate_domain', stdout=StringIO())
@@ -0,0 +1,148 @@
+import bz2
+import gzip
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+import pecunia.models as m
+from pecunia.dump import DumpImporter
+
+ENTITY = 'http://www.wikidata.org/entity/'
+
+
+def snak(prop, datatype, value=None, value_type=None, snaktype='value'):
+    result = {'snaktype': snaktype, 'property': prop, 'datatype': datatype}
+    if snaktype == 'value':
+        result['datavalue'] = {'value': value, 'type': value_type}
+    return result
+
+
+def item_value(qid):
+    return {'entity-type': 'item', 'numeric-id': int(qid[1:]), 'id': qid}
+
+
+def statement(mainsnak, qualifiers=(), references=(), rank='normal'):
+    result = {'mainsnak': mainsnak, 'type': 'statement', 'rank': rank}
+    if qualifiers:
+        result['qualifiers'] = {}
+        for qualifier in qualifiers:
+            result['qualifiers'].setdefault(qualifier['property'], []).append(qualifier)
+    if references:
+        result['references'] = [{'snaks': {s['property']: [s] for s in reference}} for reference in references]
+    return result
+
+
+def entity(eid, label=None, claims=(), **extra):
+    record = {'id': eid, 'type': 'item' if eid[0] == 'Q' else 'property', **extra}
+    if label:
+        record['labels'] = {language: {'language': language, 'value': label} for language in ('en', 'zh-hans')}
+    record['claims'] = {}
+    for claim in claims:
+        record['claims'].setdefault(claim['mainsnak']['property'], []).append(claim)
+    return record
+
+
+RECORDS = [
+    entity('Q1', 'Alexandria', [
+        statement(snak('P31', 'wikibase-item', item_value('Q2'), 'wikibase-entityid'),
+                  qualifiers=[snak('P580', 'time', {'time': '-0331-00-00T00:00:00Z', 'timezone': 0, 'before': 0,
+                                                    'after': 0, 'precision': 9,
+                                                    'calendarmodel': ENTITY + 'Q1985786'}, 'time')],
+                  references=[[snak('P854', 'url', 'https://example.org', 'string')]], rank='preferred'),
+        statement(snak('P625', 'globe-coordinate', {'latitude': 31.198055555556, 'longitude': 29.919166666667,
+                                                    'precision': 0.00027777777777778, 'globe': ENTITY + 'Q2'},
+                       'globecoordinate')),
+        statement(snak('P1082', 'quantity', {'amount': '+5200000', 'unit': '1'}, 'quantity')),
+        statement(snak('P1448', 'monolingualtext', {'text': 'Alexandreia', 'language': 'grc'}, 'monolingualtext')),
+        statement(snak('P1448', 'monolingualtext', {'text': 'Alexandria', 'language': 'de-ch'}, 'monolingualtext')),
+        statement(snak('P31', 'wikibase-item', snaktype='somevalue')),
+    ], aliases={'en': [{'language': 'en', 'value': 'Iskandariya'}]}),
+    entity('P31', 'instance of', datatype='wikibase-item'),
+    entity('Q2', 'city', [statement(snak('P31', 'wikibase-item', item_value('Q3'), 'wikibase-entityid'))]),
+    entity('L1', 'lexeme'),
+]
+
+
+class DumpImporterTestCase(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write_dump(self, records, name='dump.json', opener=open):
+        path = os.path.join(self.directory.name, name)
+        with opener(path, 'wt', encoding='utf-8') as f:
+            f.write('[\n' + ',\n'.join(json.dumps(record) for record in records) + '\n]\n')
+        return path
+
+    def imported(self, external_id, source='dump.json'):
+        return m.ImportedEntity.objects.get(dump__source=source, external_id=external_id)
+
+    def test_import(self):
+        out = StringIO()
+        call_command('import_dump', self.write_dump(RECORDS, 'dump.json.gz', gzip.open), '--source', 'dump.json',
+                     '--batch-size', '2', stdout=out)
+        self.assertEqual("3 entities, 6 statements, 1 skipped records, 1 skipped snaks, 3 skipped terms\n",
+                         out.getvalue())
+
+        alexandria = m.Item.objects.get(pk=self.imported('Q1').entity_id)
+        city = m.Item.objects.get(pk=self.imported('Q2').entity_id)
+        instance_of = m.Property.objects.get(pk=self.imported('P31').entity_id)
+        self.assertEqual('Alexandria', alexandria.get_label('en').text)
+        self.assertEqual(['Iskandariya'], [alias.text for alias in alexandria.aliases.all()])
+        self.assertEqual('instance of', instance_of.get_label('en').text)
+        self.assertEqual('Item', instance_of.data_type.class_name)
+        self.assertEqual([city], [s.mainsnak.value for s in alexandria.statements.filter(mainsnak__property=instance_of,
+                                                                                         mainsnak__type=0)])
+        preferred = alexandria.statements.get(rank=m.Statement.Rank.PREFERRED)
+        self.assertEqual('-0331-00-00T00:00:00Z', preferred.qualifiers.get().snak.value.time)
+        self.assertEqual('https://example.org', preferred.reference_records.get().snaks.get().snak.value.value)
+        coordinates = m.GlobeCoordinatesValue.objects.get()
+        self.assertEqual((31.198055556, city), (float(coordinates.latitude), coordinates.globe))
+        self.assertEqual(5200000, m.QuantityValue.objects.get().number)
+        self.assertEqual(['grc'], [v.language for v in m.MonolingualTextValue.objects.filter(text='Alexandreia')])
+
+        # Referenced but absent from the dump: created empty.
+        self.assertFalse(self.imported('Q3').imported)
+        self.assertFalse(self.imported('P580').imported)
+        self.assertTrue(self.imported('Q2').imported)
+
+    def test_resume(self):
+        path = self.write_dump(RECORDS, 'dump.json.bz2', bz2.open)
+        importer = DumpImporter('dump', batch_size=2)
+        with bz2.open(path, 'rt') as f:
+            lines = f.readlines()
+        importer.run(lines[:3])
+        self.assertEqual(3, m.DumpImport.objects.get(source='dump').position)
+        self.assertFalse(self.imported('Q2', 'dump').imported)
+
+        out = StringIO()
+        call_command('import_dump', path, '--source', 'dump', stdout=out)
+        self.assertTrue(out.getvalue().startswith("Resuming after line 3\n1 entities, 1 statements"))
+        self.assertTrue(self.imported('Q2', 'dump').imported)
+        self.assertEqual(1, m.Label.objects.filter(text='city').count())
+
+        # Restarting skips the records already imported.
+        out = StringIO()
+        call_command('import_dump', path, '--source', 'dump', '--restart', stdout=out)
+        self.assertTrue(out.getvalue().startswith("0 entities, 0 statements, 4 skipped records"))
+        self.assertEqual(1, m.Label.objects.filter(text='Alexandria').count())
+
+    def test_query_count_does_not_depend_on_batch_size(self):
+        records = [entity(f'Q{i}', f'item {i}', [
+            statement(snak('P31', 'wikibase-item', item_value(f'Q{i + 1}'), 'wikibase-entityid'))
+        ]) for i in range(1, 41)]
+        DumpImporter('warm-up').run([json.dumps(entity('Q1', 'item'))])
+        with CaptureQueriesContext(connection) as small:
+            DumpImporter('small', batch_size=10).run(json.dumps(record) for record in records[:10])
+        with CaptureQueriesContext(connection) as large:
+            DumpImporter('large', batch_size=40).run(json.dumps(record) for record in records)
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(40, m.ImportedEntity.objects.filter(dump__source='large', imported=True).count())
@@ -0,0 +1,187 @@
+import csv
+import gzip
+import json
+import os
+import pickle
+import tempfile
+from concurrent.futures import Executor, Future
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+import pecunia.models as m
+from pecunia.bulk import EntityBulkWriter, EntitySpec, StatementSpec, SnakSpec
+from pecunia.dump import DumpImporter
+from pecunia.export import DumpExporter
+
+
+class InlineExecutor(Executor):
+    """
+    Runs the tasks in the current thread, which sees the data of the test transaction.
+    """
+
+    def __init__(self, max_workers=None, initializer=None):
+        if initializer:
+            initializer()
+
+    def submit(self, fn, /, *args, **kwargs):
+        future = Future()
+        future.set_result(fn(*args, **kwargs))
+        return future
+
+
+class DumpExporterTestCase(TestCase):
+    def setUp(self):
+        datatypes = {d.class_name: d for d in m.Datatype.objects.all()}
+        self.is_a = m.Property.objects.create(data_type=datatypes['Item'])
+        m.PropertyMapping.objects.create(key='is_a', property=self.is_a)
+        self.name = m.Property.objects.create(data_type=datatypes['MonolingualTextValue'])
+        self.website = m.Property.objects.create(data_type=datatypes['UrlValue'])
+        self.city, self.coin = EntityBulkWriter().write([EntitySpec(labels={'en': 'city'}), EntitySpec()])
+        self.alexandria, self.stater = EntityBulkWriter().write([
+            EntitySpec(labels={'en': 'Alexandria', 'fr': 'Alexandrie'}, descriptions={'en': 'city "in" Egypt'},
+                       aliases={'en': ['Iskandariya']}, statements=[
+                    StatementSpec(SnakSpec(self.is_a, self.city), qualifiers=[
+                        SnakSpec(self.name, m.MonolingualTextValue(language='grc', text='Alexandreia'))
+                    ], references=[[SnakSpec(self.website, m.UrlValue(value='https://example.org/a b'))]]),
+                    StatementSpec(SnakSpec(self.name, m.MonolingualTextValue(language='en', text='Alexandria')),
+                                  rank=m.Statement.Rank.PREFERRED),
+                    StatementSpec(SnakSpec(self.name, m.MonolingualTextValue(language='la', text='Alexandrea'))),
+                    StatementSpec(SnakSpec(self.website, type=m.PropertySnak.Type.NO_VALUE)),
+                ]),
+            EntitySpec(labels={'en': 'stater'}, statements=[StatementSpec(SnakSpec(self.is_a, self.coin))]),
+        ])
+
+    def export(self, format_name='json', **kwargs):
+        out = StringIO()
+        DumpExporter(base_uri='https://example.org/', **kwargs).export(out, format_name)
+        return out.getvalue()
+
+    def test_json(self):
+        records = {record['id']: record for record in map(json.loads, self.export().splitlines())}
+        self.assertEqual(7, len(records))
+        self.assertEqual('wikibase-item', records[self.is_a.pretty_display_id]['datatype'])
+        record = records[self.alexandria.pretty_display_id]
+        self.assertEqual({'language': 'fr', 'value': 'Alexandrie'}, record['labels']['fr'])
+        self.assertEqual([{'language': 'en', 'value': 'Iskandariya'}], record['aliases']['en'])
+        statement, = record['claims'][self.is_a.pretty_display_id]
+        self.assertEqual({'snaktype': 'value', 'property': self.is_a.pretty_display_id, 'datatype': 'wikibase-item',
+                          'datavalue': {'value': {'entity-type': 'item', 'numeric-id': self.city.display_id,
+                                                  'id': self.city.pretty_display_id}, 'type': 'wikibase-entityid'}},
+                         statement['mainsnak'])
+        qualifier, = statement['qualifiers'][self.name.pretty_display_id]
+        self.assertEqual({'text': 'Alexandreia', 'language': 'grc'}, qualifier['datavalue']['value'])
+        self.assertEqual('https://example.org/a b',
+                         statement['references'][0]['snaks'][self.website.pretty_display_id][0]['datavalue']['value'])
+        self.assertEqual(['preferred', 'normal'], [s['rank'] for s in record['claims'][self.name.pretty_display_id]])
+        self.assertNotIn('datavalue', record['claims'][self.website.pretty_display_id][0]['mainsnak'])
+
+    def test_round_trip(self):
+        stats = DumpImporter('export').run(self.export().splitlines())
+        self.assertEqual((7, 5), (stats['entities'], stats['statements']))
+        alexandria = m.Item.objects.get(
+            pk=m.ImportedEntity.objects.get(external_id=self.alexandria.pretty_display_id).entity_id)
+        self.assertEqual('Alexandrie', alexandria.get_label('fr').text)
+        statement = alexandria.statements.get(rank=m.Statement.Rank.NORMAL, mainsnak__type=0,
+                                              qualifiers__isnull=False)
+        self.assertEqual('Alexandreia', statement.qualifiers.get().snak.value.text)
+        self.assertEqual('https://example.org/a b', statement.reference_records.get().snaks.get().snak.value.value)
+        self.assertEqual(4, alexandria.statements.count())
+
+    def test_ntriples(self):
+        lines = self.export('nt').splitlines()
+        alexandria = f'<https://example.org/entity/{self.alexandria.pretty_display_id}>'
+        self.assertIn(f'{alexandria} <http://www.w3.org/2000/01/rdf-schema#label> "Alexandrie"@fr .', lines)
+        self.assertIn(f'{alexandria} <http://schema.org/description> "city \\"in\\" Egypt"@en .', lines)
+        self.assertIn(f'{alexandria} <https://example.org/prop/direct/{self.is_a.pretty_display_id}> '
+                      f'<https://example.org/entity/{self.city.pretty_display_id}> .', lines)
+        # Only the best-ranked statements are exported.
+        names = [line for line in lines if line.startswith(f'{alexandria} <https://example.org/prop/direct/'
+                                                           f'{self.name.pretty_display_id}>')]
+        self.assertEqual([f'{alexandria} <https://example.org/prop/direct/{self.name.pretty_display_id}> '
+                          f'"Alexandria"@en .'], names)
+
+    def test_csv(self):
+        rows = list(csv.DictReader(StringIO(self.export('csv', models=(m.Item,), item_class=self.city))))
+        self.assertEqual({self.alexandria.pretty_display_id}, {row['id'] for row in rows})
+        self.assertIn({'id': self.alexandria.pretty_display_id, 'field': 'claim',
+                       'property': self.name.pretty_display_id, 'rank': 'normal', 'snaktype': 'value',
+                       'datatype': 'monolingualtext', 'language': 'la', 'value': 'Alexandrea'}, rows)
+        self.assertEqual('novalue', rows[-1]['snaktype'])
+
+    def test_filters(self):
+        # Entities are created at revision 1, including those written in bulk.
+        self.assertEqual(7, len(self.export(min_revision=1).splitlines()))
+        self.assertEqual(0, len(self.export(min_revision=2).splitlines()))
+        self.stater.set_label('fr', 'statère')
+        self.assertEqual([self.stater.pretty_display_id],
+                         [json.loads(line)['id'] for line in self.export(min_revision=2).splitlines()])
+
+    def test_modified_since_includes_new_entities(self):
+        since = timezone.now()
+        created, = EntityBulkWriter().write([EntitySpec(labels={'en': 'drachma'})])
+        self.assertEqual([created.pretty_display_id],
+                         [json.loads(line)['id'] for line in self.export(modified_since=since).splitlines()])
+
+    def test_query_count_does_not_depend_on_size(self):
+        with CaptureQueriesContext(connection) as small:
+            self.export()
+        EntityBulkWriter().write([EntitySpec(labels={'en': f'item {i}'}, statements=[
+            StatementSpec(SnakSpec(self.is_a, self.city)),
+            StatementSpec(SnakSpec(self.name, m.MonolingualTextValue(language='en', text=f'item {i}'))),
+        ]) for i in range(30)])
+        with CaptureQueriesContext(connection) as large:
+            self.assertEqual(37, len(self.export().splitlines()))
+        self.assertEqual(len(small), len(large))
+
+    def test_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'dump.nt.gz')
+            out = StringIO()
+            call_command('export_dump', path, '--format', 'nt', '--entities', 'items', '--class',
+                         self.coin.pretty_display_id, stdout=out)
+            self.assertEqual("1 entities exported\n", out.getvalue())
+            with gzip.open(path, 'rt') as f:
+                self.assertIn('"stater"@en', f.read())
+
+    def test_shards(self):
+        exporter = DumpExporter(chunk_size=2)
+        shards = exporter.shards(3)
+        self.assertEqual([m.Property, m.Item], list(dict.fromkeys(shard.model for shard in shards)))
+        for model in (m.Property, m.Item):
+            ranges = [(shard.start, shard.stop) for shard in shards if shard.model is model]
+            ids = list(model.objects.order_by('display_id').values_list('display_id', flat=True))
+            self.assertEqual((ids[0], ids[-1] + 1), (ranges[0][0], ranges[-1][1]))
+            self.assertTrue(all(previous[1] == following[0] for previous, following in zip(ranges, ranges[1:])))
+        self.assertEqual(pickle.loads(pickle.dumps(exporter)).datatypes, exporter.datatypes)
+
+    def test_parallel(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for format_name in ('json', 'csv'):
+                path = os.path.join(directory, f'dump.{format_name}.gz')
+                exporter = DumpExporter(base_uri='https://example.org/', chunk_size=2)
+                self.assertEqual(7, exporter.export_parallel(path, format_name, workers=2,
+                                                             executor_class=InlineExecutor))
+                with gzip.open(path, 'rt', newline='') as f:
+                    self.assertEqual(self.export(format_name), f.read())
+            self.assertEqual(['dump.csv.gz', 'dump.json.gz'], sorted(os.listdir(directory)))
+
+    def test_parts(self):
+        with tempfile.TemporaryDirectory() as directory:
+            exporter = DumpExporter(base_uri='https://example.org/', models=(m.Item,))
+            exporter.export_parallel(os.path.join(directory, 'dump.csv'), 'csv', workers=2, parts=True,
+                                     executor_class=InlineExecutor)
+            with open(os.path.join(directory, 'dump.manifest.json')) as f:
+                manifest = json.load(f)
+            self.assertEqual(('csv', 4), (manifest['format'], manifest['entities']))
+            self.assertEqual(4, sum(part['entities'] for part in manifest['parts']))
+            rows = []
+            for part in manifest['parts']:
+                self.assertEqual('item', part['type'])
+                with open(os.path.join(directory, part['path']), newline='') as f:
+                    rows += csv.DictReader(f)
+            self.assertEqual(list(csv.DictReader(StringIO(self.export('csv', models=(m.Item,))))), rows)
@@ -0,0 +1,77 @@
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import prefetch_related_objects
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+import pecunia.models as m
+from pecunia.bulk import EntityBulkWriter, EntitySpec
+from pecunia.labels import label_resolver
+from pecunia.templatetags.pecunia_tags import label, label_or_default, description, description_or_default
+
+
+class LabelResolverTestCase(TestCase):
+    def setUp(self):
+        self.items = EntityBulkWriter().write([
+            EntitySpec(labels={'en': 'coin', 'fr': 'pièce'}, descriptions={'fr': 'monnaie métallique'}),
+            EntitySpec(labels={'en': 'hoard'}, descriptions={'en': 'a group of coins'}),
+            EntitySpec(),
+        ])
+
+    def test_filters(self):
+        coin, hoard, blank = self.items
+        with label_resolver.scope():
+            self.assertEqual('pièce', label(coin, 'fr'))
+            self.assertEqual(hoard.pretty_display_id, label(hoard, 'fr'))
+            self.assertEqual('hoard', label_or_default(hoard, 'fr'))
+            self.assertEqual(blank.pretty_display_id, label_or_default(blank, 'fr'))
+            self.assertEqual('monnaie métallique', description(coin, 'fr'))
+            self.assertEqual('-', description(hoard, 'fr'))
+            self.assertEqual('a group of coins', description_or_default(hoard, 'fr'))
+            self.assertEqual('-', description_or_default(blank, 'fr'))
+        self.assertEqual('coin', label_or_default(coin, 'de'))
+
+    def test_registered_entities_are_loaded_in_one_query(self):
+        with label_resolver.scope():
+            label_resolver.register(self.items)
+            with self.assertNumQueries(1):
+                for item in self.items:
+                    label_or_default(item, 'fr')
+                    description_or_default(item, 'fr')
+            # English labels were loaded as a fallback.
+            with self.assertNumQueries(0):
+                self.assertEqual('coin', label(self.items[0], 'en'))
+            with self.assertNumQueries(1):
+                self.assertEqual('monnaie métallique', description(self.items[0], 'fr'))
+                self.assertEqual(self.items[1].pretty_display_id, label(self.items[1], 'de'))
+
+    def test_misses_are_loaded_with_the_registered_entities(self):
+        other = m.Item.objects.create()
+        other.set_label('en', 'die')
+        with label_resolver.scope():
+            self.assertEqual('coin', label(self.items[0], 'en'))
+            label_resolver.register([self.items[1], other.pk])
+            with self.assertNumQueries(1):
+                self.assertEqual('die', label(other, 'en'))
+                self.assertEqual('hoard', label(self.items[1], 'en'))
+
+    def test_changes_are_seen(self):
+        with label_resolver.scope():
+            self.assertEqual('coin', label(self.items[0], 'en'))
+            self.items[0].set_label('en', 'stater')
+            self.assertEqual('stater', label(self.items[0], 'en'))
+
+    def test_prefetched_labels_are_used(self):
+        prefetch_related_objects(self.items, 'labels')
+        with label_resolver.scope(), self.assertNumQueries(0):
+            self.assertEqual('pièce', label(self.items[0], 'fr'))
+
+    def test_dashboard(self):
+        self.client.force_login(User.objects.create_superuser('testuser'))
+        with CaptureQueriesContext(connection) as small:
+            self.client.get('/item/')
+        EntityBulkWriter().write([EntitySpec(labels={'en': f'item {i}'}) for i in range(20)])
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get('/item/')
+        self.assertContains(response, 'item 19')
+        self.assertEqual(len(small), len(large))
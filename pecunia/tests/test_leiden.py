@@ -1,5 +1,9 @@
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
 
+from pecunia.management.commands.benchmark_leiden import synthetic_inscription
 from pecunia.templatetags.pecunia_tags import highlight_words
 
 
@@ -95,3 +99,25 @@ class LeidenDisplayTestCase(TestCase):
 δῆμος
 </supplied>""")
         self.assertEqual('[ἡ βουλὴ καὶ ὁ δῆμος]', output)
+
+    def test_nested_tags(self):
+        output = highlight_words('<supplied reason="lost"><unclear>α</unclear>β<ex>γ</ex></supplied>')
+        self.assertEqual('[α̣β(γ)]', output)
+        output = highlight_words('<orig>α<w qid="Q1">β</w><lb n="2"/>γ</orig>')
+        self.assertEqual('Α<a class="tagged-element " href="/item/Q1">Β</a><br>Γ', output)
+        output = highlight_words('<del rend="erasure"><supplied reason="lost">α</supplied> <gap reason="lost" '
+                                 'quantity="2" unit="character"/></del>')
+        self.assertEqual('〚α ..〛', output)
+
+    def test_deep_nesting(self):
+        output = highlight_words(synthetic_inscription(20, 250))
+        self.assertEqual(20, output.count('<br>'))
+        self.assertEqual(20, output.count('href="/item/Q'))
+        self.assertEqual(highlight_words(synthetic_inscription(20, 0)).count('δ(ῆμος?)'), output.count('δ(ῆμος?)'))
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command('benchmark_leiden', '--lines', '10', '--steps', '2', '--depth', '10', '--repeat', '1', stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(2, len(lines))
+        self.assertTrue(lines[1].startswith('20 lines'))
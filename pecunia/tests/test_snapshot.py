@@ -0,0 +1,101 @@
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+import pecunia.models as m
+from pecunia.bulk import EntityBulkWriter, EntitySpec, StatementSpec, SnakSpec
+from pecunia.entity_cache import get_entity_cache
+from pecunia.snapshot import EntitySnapshot
+from pecunia.templatetags.pecunia_tags import html
+
+
+class EntitySnapshotTestCase(TestCase):
+    def setUp(self):
+        get_entity_cache().clear()
+        self.is_a = m.Property.objects.create(data_type=m.Datatype.objects.get(class_name='Item'))
+        self.is_a.set_label('en', 'is a')
+        m.PropertyMapping.objects.create(key='is_a', property=self.is_a)
+        self.string_prop = m.Property.objects.create(data_type=m.Datatype.objects.get(class_name='StringValue'))
+        self.string_prop.set_label('en', 'name')
+        self.person = m.Item.objects.create()
+        self.person.set_label('en', 'person')
+
+    def create_item(self, n, reference_type=m.PropertySnak.Type.NO_VALUE):
+        statements = [StatementSpec(SnakSpec(self.is_a, self.person))]
+        reference_value = self.person if reference_type == m.PropertySnak.Type.VALUE else None
+        for i in range(n):
+            target = EntitySpec(labels={'en': f'target {i}'})
+            statements += [
+                StatementSpec(SnakSpec(self.string_prop, m.StringValue(value=f'name {i}')),
+                              qualifiers=[SnakSpec(self.is_a, target)],
+                              references=[[SnakSpec(self.string_prop, m.StringValue(value=f'source {i}')),
+                                           SnakSpec(self.is_a, reference_value, reference_type)]]),
+            ]
+            statements.append(StatementSpec(SnakSpec(self.is_a, target)))
+        targets = [s.qualifiers[0].value for s in statements[1::2]]
+        return EntityBulkWriter().write([EntitySpec(labels={'en': 'item'}, statements=statements), *targets])[0]
+
+    def test_load(self):
+        item = m.Item.objects.get(pk=self.create_item(2).pk)
+        snapshot = EntitySnapshot.load(item)
+        with self.assertNumQueries(0):
+            self.assertEqual(5, len(snapshot.statements))
+            self.assertEqual('name 0', item.get_value(self.string_prop).value)
+            self.assertEqual('item', item.get_label('en').text)
+            groups = snapshot.get_statement_groups({self.string_prop.pk: 1})
+            self.assertEqual([self.string_prop, self.is_a], [prop for prop, _ in groups])
+            self.assertEqual('is a', groups[1][0].get_label('en').text)
+            self.assertEqual('person', groups[1][1][0].mainsnak.value.get_label('en').text)
+            statement = groups[0][1][1]
+            self.assertEqual('target 1', statement.qualifiers.all()[0].snak.value.get_label('en').text)
+            references = [ref.snak for ref in statement.reference_records.all()[0].snaks.all()]
+            self.assertEqual('source 1', references[0].value.value)
+            self.assertEqual(m.PropertySnak.Type.NO_VALUE, references[1].type)
+
+    def test_url_label(self):
+        website = m.Property.objects.create(data_type=m.Datatype.objects.get(class_name='UrlValue'))
+        url_label = m.Property.objects.create(data_type=m.Datatype.objects.get(class_name='StringValue'))
+        m.PropertyMapping.objects.create(key='url_label', property=url_label)
+        item, = EntityBulkWriter().write([EntitySpec(statements=[
+            StatementSpec(SnakSpec(website, m.UrlValue(value='https://example.org')),
+                          qualifiers=[SnakSpec(url_label, m.StringValue(value='Example'))])
+        ])])
+        statement, = EntitySnapshot.load(m.Item.objects.get(pk=item.pk)).statements
+        with m.mapping_registry.scope():
+            m.get_property_id('url_label')
+            with self.assertNumQueries(0):
+                self.assertEqual("<a href='https://example.org'>Example</a>", html(statement.mainsnak))
+
+            # The qualifiers are not queried for a snak rendered on its own.
+            snak = m.PropertySnak.objects.get(pk=statement.mainsnak_id)
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual("<a href='https://example.org'>https://example.org</a>", html(snak))
+            self.assertFalse([query for query in queries if 'qualifier' in query['sql']])
+
+    def test_item_display_query_count_does_not_depend_on_size(self):
+        def display(item):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse('item_display', args=[item.display_id]))
+            self.assertEqual(200, response.status_code)
+            return len(queries)
+
+        self.assertEqual(display(self.create_item(1, m.PropertySnak.Type.VALUE)),
+                         display(self.create_item(6, m.PropertySnak.Type.VALUE)))
+
+    def test_api_retrieve_query_count_does_not_depend_on_size(self):
+        client = APIClient()
+        client.force_authenticate(user=User.objects.create_superuser('testuser'))
+
+        def retrieve(item):
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(f'/api/items/{item.display_id}/')
+            self.assertEqual(200, response.status_code)
+            return response.json(), len(queries)
+
+        data, query_count = retrieve(self.create_item(1))
+        self.assertEqual({'en': 'item'}, data['labels'])
+        self.assertEqual(2, len(data['claims'][f'P{self.is_a.display_id}']))
+        self.assertEqual(query_count, retrieve(self.create_item(6))[1])
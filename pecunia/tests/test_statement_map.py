@@ -0,0 +1,85 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+import pecunia.models as m
+from pecunia.models.mappings import mapping_registry
+from pecunia.bulk import EntityBulkWriter, EntitySpec, StatementSpec, SnakSpec
+from pecunia.statement_map import StatementMap
+from pecunia.templatetags.pecunia_tags import prop, prop_list, prop_mtv_value, prop_mtv_langage, has_prop, html
+
+
+class StatementMapTestCase(TestCase):
+    def setUp(self):
+        datatypes = {d.class_name: d for d in m.Datatype.objects.all()}
+        self.author = m.Property.objects.create(data_type=datatypes['Item'])
+        m.PropertyMapping.objects.create(key='author', property=self.author)
+        self.translation = m.Property.objects.create(data_type=datatypes['MonolingualTextValue'])
+        m.PropertyMapping.objects.create(key='translation', property=self.translation)
+        m.PropertyMapping.objects.create(key='commentary',
+                                         property=m.Property.objects.create(data_type=datatypes['StringValue']))
+        self.authors = [m.Item.objects.create() for _ in range(2)]
+        self.authors[0].set_label('en', 'Cicero')
+        self.items = EntityBulkWriter().write([
+            EntitySpec(statements=[
+                StatementSpec(SnakSpec(self.author, self.authors[0])),
+                StatementSpec(SnakSpec(self.author, self.authors[1])),
+                StatementSpec(SnakSpec(self.translation, m.MonolingualTextValue(language='fr', text='Lettres'))),
+            ]),
+            EntitySpec(statements=[StatementSpec(SnakSpec(self.author, type=m.PropertySnak.Type.SOME_VALUE))]),
+        ])
+
+    def test_filters_do_not_query(self):
+        document = StatementMap.load(self.items[0])
+        with mapping_registry.scope(), self.assertNumQueries(1):
+            # Only the version of the mappings is checked.
+            self.assertEqual(self.authors[0], prop(document, 'author').value)
+            self.assertEqual(2, prop_list(document, 'author').count('<a href'))
+            self.assertEqual('Lettres', prop_mtv_value(document, 'translation'))
+            self.assertEqual('fr', prop_mtv_langage(document, 'translation'))
+            self.assertTrue(has_prop(document, 'author'))
+            self.assertFalse(has_prop(document, 'commentary'))
+            self.assertEqual('-', prop(document, 'commentary'))
+            self.assertEqual('-', prop_mtv_value(document, 'commentary'))
+
+    def test_missing_mappings(self):
+        document = StatementMap.load(self.items[0])
+        with mapping_registry.scope(), self.assertNumQueries(1):
+            # Only the version of the mappings is checked.
+            self.assertEqual("Missing property mapping for key: nope", prop(document, 'nope'))
+            self.assertEqual("Missing property mapping for key: nope", prop_list(document, 'nope'))
+            self.assertEqual("Missing property mapping for key: nope", prop_mtv_langage(document, 'nope'))
+            self.assertFalse(has_prop(document, 'nope'))
+
+    def test_load_many(self):
+        with CaptureQueriesContext(connection) as few:
+            StatementMap.load_many(m.Item.objects.filter(pk__in=[item.pk for item in self.items]))
+        more = self.items + EntityBulkWriter().write([
+            EntitySpec(statements=[StatementSpec(SnakSpec(self.author, self.authors[i % 2]))]) for i in range(10)
+        ])
+        with CaptureQueriesContext(connection) as many:
+            documents = StatementMap.load_many(m.Item.objects.filter(pk__in=[item.pk for item in more]).order_by('pk'))
+        self.assertEqual(len(few), len(many))
+        with mapping_registry.scope(), self.assertNumQueries(1):
+            self.assertEqual([2, 1] + [1] * 10, [len(document.get_statements('author')) for document in documents])
+            self.assertEqual('Unknown', html(prop(documents[1], 'author')))
+            self.assertEqual(self.items[0].display_id, documents[0].display_id)
+
+    def test_url_label(self):
+        website = m.Property.objects.create(data_type=m.Datatype.objects.get(class_name='UrlValue'))
+        m.PropertyMapping.objects.create(key='website', property=website)
+        url_label = m.Property.objects.create(data_type=m.Datatype.objects.get(class_name='StringValue'))
+        m.PropertyMapping.objects.create(key='url_label', property=url_label)
+        item, = EntityBulkWriter().write([EntitySpec(statements=[
+            StatementSpec(SnakSpec(website, m.UrlValue(value='https://example.org')),
+                          qualifiers=[SnakSpec(url_label, m.StringValue(value='Example'))])
+        ])])
+        document, = StatementMap.load_many([item])
+        with mapping_registry.scope(), self.assertNumQueries(1):
+            self.assertEqual("<a href='https://example.org'>Example</a>", html(prop(document, 'website')))
+
+    def test_raw_entities(self):
+        item = m.Item.objects.get(pk=self.items[0].pk)
+        self.assertEqual('Lettres', prop_mtv_value(item, 'translation'))
+        with mapping_registry.scope(), self.assertNumQueries(1):
+            self.assertTrue(has_prop(item, 'author'))
@@ -17,6 +17,7 @@ Including another URLconf
 from django.urls import path, include
 
 import pecunia.views as views
+from pecunia.views.rest import EntitiesApiView, SearchApiView
 from .rest import router
 
 urlpatterns = [
@@ -28,6 +29,8 @@ urlpatterns = [
     path("api/annotator", views.AnnotatorApiView.as_view(), name="api_annotator"),
 
     path('api/', include(router.urls)),
+    path("api/entities", EntitiesApiView.as_view(), name="api_entities"),
+    path("api/search", SearchApiView.as_view(), name="api_search"),
     path("api/statements/", views.StatementApiView.as_view(), name="api_statement"),
     path("api/statements/<int:statement_id>", views.StatementApiView.as_view(), name="api_statements"),
     path("api/qualifiers/", views.QualifierApiView.as_view(), name="api_qualifier"),
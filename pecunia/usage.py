@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from django.urls import reverse
+
+from pecunia.models import Entity, Property, Statement, PropertyUsage, PropertyValueUsage
+
+DEFAULT_PAGE_SIZE = 25
+MAX_PAGE_SIZE = 500
+DEFAULT_TOP_VALUES = 10
+
+
+@dataclass(frozen=True)
+class EntityRef:
+    """
+    The display id of an item or a property, enough to show or link an entity without loading it.
+    """
+    prefix: str
+    display_id: int
+
+    @classmethod
+    def from_ids(cls, item_id: int | None, property_id: int | None) -> EntityRef:
+        return cls('Q', item_id) if item_id is not None else cls('P', property_id)
+
+    @property
+    def url(self) -> str:
+        return reverse('item_display' if self.prefix == 'Q' else 'property_display', args=[self.display_id])
+
+    def __str__(self):
+        return f"{self.prefix}{self.display_id}"
+
+
+@dataclass
+class PropertyUsagePage:
+    """
+    A page of the statements using a property, with the total number of such statements and its most used values.
+    """
+    count: int
+    subjects: list[tuple[int, EntityRef]]
+    next_cursor: int | None
+    top_values: list[tuple[EntityRef, int]]
+
+
+class PropertyUsageBrowser:
+    """
+    Lists the subjects of the statements using a property as main snak property.
+    Pages are delimited by statement primary key (keyset pagination), so that reading any page costs the same whatever
+    its position. Totals and value distributions are read from the PropertyUsage and PropertyValueUsage counters.
+    """
+
+    def __init__(self, prop: Property):
+        self.prop = prop
+
+    def get_page(self, after: int | None = None, limit: int = DEFAULT_PAGE_SIZE,
+                 top: int = DEFAULT_TOP_VALUES) -> PropertyUsagePage:
+        """
+        :param after: the cursor of the page, i.e. the primary key of the last statement of the previous page
+        :param limit: the maximum number of statements of the page, at least 1
+        :param top: the number of most used values to return
+        :return: the statements following the cursor, in primary key order, as (statement id, subject) pairs
+        """
+        if limit < 1:
+            raise ValueError(f"The page size must be positive, got {limit}")
+        statements = Statement.objects.filter(mainsnak__property=self.prop).order_by('pk')
+        if after is not None:
+            statements = statements.filter(pk__gt=after)
+        rows = list(statements.values_list('pk', 'subject__describedentity__item__display_id',
+                                           'subject__describedentity__property__display_id')[:limit + 1])
+        subjects = [(pk, EntityRef.from_ids(item_id, property_id)) for pk, item_id, property_id in rows[:limit]]
+        return PropertyUsagePage(
+            count=PropertyUsage.get_count(self.prop),
+            subjects=subjects,
+            next_cursor=subjects[-1][0] if len(rows) > limit else None,
+            top_values=self.get_top_values(top),
+        )
+
+    def get_top_values(self, limit: int = DEFAULT_TOP_VALUES) -> list[tuple[EntityRef, int]]:
+        """
+        :return: the most used entity values of the property with their number of statements, most used first
+        """
+        counts = PropertyValueUsage.top(self.prop, limit)
+        refs = {pk: EntityRef.from_ids(item_id, property_id) for pk, item_id, property_id in
+                Entity.objects.filter(pk__in=[value_id for value_id, _ in counts])
+                .values_list('pk', 'describedentity__item__display_id', 'describedentity__property__display_id')}
+        return [(refs[value_id], count) for value_id, count in counts if value_id in refs]
@@ -7,6 +7,7 @@ from django.template.loader import render_to_string
 from django.views.generic import View
 
 import pecunia.models as m
+from pecunia.annotator import json_to_value
 from pecunia.models import ItemMapping, PropertySnak
 
 
@@ -197,27 +198,7 @@ class StatementApiView(LoginRequiredMixin, View):
 def json_to_python(type_name, value):
     if type_name == 'Item':
         return m.Item.objects.get(display_id=value['item'])
-
-    if type_name == 'MonolingualTextValue':
-        value = m.MonolingualTextValue(language=value['language'], text=value['value'])
-    elif type_name == 'StringValue':
-        value = m.StringValue(value=value['value'])
-    elif type_name == 'UrlValue':
-        value = m.UrlValue(value=value['value'])
-    elif type_name == 'QuantityValue':
-        value = m.QuantityValue(number=value['number'])
-    elif type_name == 'TimeValue':
-        value = m.TimeValue(time=value['time'],
-                            timezone=0,
-                            precision=value['precision'],
-                            after=0,
-                            before=0,
-                            calendar_model=m.ItemMapping.get('person'))
-    elif type_name == 'GlobeCoordinatesValue':
-        value = m.GlobeCoordinatesValue(latitude=value['latitude'],
-                                        longitude=value['longitude'],
-                                        precision='0.0000001',
-                                        globe=ItemMapping.get('earth'))
+    value = json_to_value(type_name, value)
     value.save()
     return value
 
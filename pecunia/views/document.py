@@ -1,7 +1,5 @@
-import json
-
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.core.exceptions import ObjectDoesNotExist
+from django.core.exceptions import ObjectDoesNotExist, ValidationError
 from django.db import transaction
 from django.http import Http404, JsonResponse
 from django.shortcuts import redirect
@@ -10,15 +8,17 @@ from django.views import View
 from django.views.generic import TemplateView, FormView
 
 import pecunia.models as m
+from pecunia.annotator import AnnotationIngestion
 from pecunia.forms import DocumentMetadataForm, DocumentTextForm
 from pecunia.models import Document, PropertyMapping, ItemMapping
-from .api import json_to_python
+from pecunia.statement_map import StatementMap
 from .wikibase import InstanceDashboardView
 
 
 class DocumentDashboard(InstanceDashboardView):
     template_name = 'pecunia/document_list.html'
     item_mapping_key = 'document'
+    load_statements = True
 
 
 class DocumentDisplay(TemplateView):
@@ -33,7 +33,7 @@ class DocumentDisplay(TemplateView):
 
         processes = []
 
-        context['document'] = doc
+        context['document'] = StatementMap.load(doc)
         context['processes'] = processes
         return context
 
@@ -108,107 +108,9 @@ class DocumentDelete(LoginRequiredMixin, TemplateView):
 
 class AnnotatorApiView(LoginRequiredMixin, View):
     def post(self, request, *args, **kwargs):
-        with transaction.atomic():
-            data = json.loads(request.body.decode('utf-8'))
-            print(data)
-            document = Document.get_by_id(data['document'])
-            print(document)
-
-            entities = data['entities']
-
-            tokens = {}
-            for token in entities['taggedEntities'].values():
-                tokens[token['tokenId']] = token
-            for token in entities['untaggedEntities'].values():
-                tokens[token['tokenId']] = token
-
-            reconciliations = data['reconciliations']
-            items = {}
-            new_items = {}
-            for new_item in reconciliations['newItems']:
-                items[new_item['tokenId']] = m.Item.objects.create()
-                new_items[new_item['tokenId']] = items[new_item['tokenId']].display_id
-
-            for linked_items in reconciliations['linkedItems']:
-                items[linked_items['token']['tokenId']] = m.Item.objects.get(display_id=linked_items['qid'])
-
-            schemata = data['schemas']
-            for schema in schemata:
-                token = schema['token']
-                item = items[token['tokenId']]
-
-                for term in schema['terms']:
-                    if term['type'] == 'label':
-                        item.set_label(term['langCode'], term['value'])
-                    if term['type'] == 'description':
-                        item.set_description(term['langCode'], term['value'])
-                    if term['type'] == 'alias':
-                        pass  # TODO Implement
-
-                for json_statement in schema['statements']:
-                    prop = m.Property.objects.get(display_id=json_statement['property'])
-
-                    for snak in json_statement['statements']:
-                        print(f"snak {snak}")
-                        json_snaktype = snak['mainSnak']['type']
-
-                        mainsnak = m.PropertySnak(property=prop)
-                        if snak['mainSnak']['snakType'] == 'somevalue':
-                            mainsnak.type = m.PropertySnak.Type.SOME_VALUE
-                        elif snak['mainSnak']['snakType'] == 'novalue':
-                            mainsnak.type = m.PropertySnak.Type.NO_VALUE
-                        else:
-                            mainsnak.type = m.PropertySnak.Type.VALUE
-                            if json_snaktype == 'Item':
-                                mainsnak.value = items[snak['mainSnak']['value']['item']['tokenId']]
-                            else:
-                                mainsnak.value = json_to_python(json_snaktype, snak['mainSnak']['value'])
-                            print(json_snaktype, snak['mainSnak']['value'], mainsnak.value)
-                        mainsnak.save()
-                        statement = m.Statement(subject=item, mainsnak=mainsnak, rank=0)
-                        statement.save()
-
-                        for json_qualifier in snak['qualifiers']:
-                            qual_prop = m.Property.objects.get(display_id=json_qualifier['property'])
-                            json_qsnak = json_qualifier['snak']
-                            json_snaktype = json_qsnak['type']
-                            qsnak = m.PropertySnak(property=qual_prop)
-                            if json_qsnak['snakType'] == 'somevalue':
-                                qsnak.type = m.PropertySnak.Type.SOME_VALUE
-                            elif json_qsnak['snakType'] == 'novalue':
-                                qsnak.type = m.PropertySnak.Type.NO_VALUE
-                            else:
-                                qsnak.type = m.PropertySnak.Type.VALUE
-                                if json_snaktype == 'Item':
-                                    qsnak.value = items[json_qsnak['value']['item']['tokenId']]
-                                else:
-                                    qsnak.value = json_to_python(json_snaktype, json_qsnak['value'])
-                            qsnak.save()
-                            qualifier = m.Qualifier(statement=statement, snak=qsnak)
-                            qualifier.save()
-
-                        for json_record in snak['referenceRecords']:
-                            record = m.ReferenceRecord(statement=statement)
-                            record.save()
-
-                            for json_reference in json_record:
-                                ref_prop = m.Property.objects.get(display_id=json_reference['property'])
-                                json_rsnak = json_reference['snak']
-                                json_snaktype = json_rsnak['type']
-                                rsnak = m.PropertySnak(property=ref_prop)
-                                print(json_reference)
-                                if json_rsnak['snakType'] == 'somevalue':
-                                    rsnak.type = m.PropertySnak.Type.SOME_VALUE
-                                elif json_rsnak['snakType'] == 'novalue':
-                                    rsnak.type = m.PropertySnak.Type.NO_VALUE
-                                else:
-                                    rsnak.type = m.PropertySnak.Type.VALUE
-                                    if json_snaktype == 'Item':
-                                        rsnak.value = items[json_rsnak['value']['item']['tokenId']]
-                                    else:
-                                        rsnak.value = json_to_python(json_snaktype, json_rsnak['value'])
-                                rsnak.save()
-                                reference = m.ReferenceSnak(reference=record, snak=rsnak)
-                                reference.save()
-
-        return JsonResponse({'message': "ok", 'newItems': new_items})
+        ingestion = AnnotationIngestion()
+        try:
+            new_items = ingestion.ingest(request.body)
+        except ValidationError as e:
+            return JsonResponse({'message': "invalid annotations", 'errors': e.messages}, status=400)
+        return JsonResponse({'message': "ok", 'newItems': new_items, 'timings': ingestion.timings})
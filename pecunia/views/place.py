@@ -5,6 +5,7 @@ from django.views.generic import TemplateView
 
 from .wikibase import InstanceDashboardView
 from ..models import Item
+from ..statement_map import StatementMap
 
 
 class PlaceDashboard(InstanceDashboardView):
@@ -22,5 +23,5 @@ class PlaceDisplay(LoginRequiredMixin, TemplateView):
         except ObjectDoesNotExist as e:
             raise Http404 from e
 
-        context['place'] = place
+        context['place'] = StatementMap.load(place)
         return context
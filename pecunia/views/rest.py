@@ -1,67 +1,274 @@
+from django.core.paginator import Paginator
+from django.http import StreamingHttpResponse, Http404
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
 from rest_framework import viewsets, permissions
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
-from pecunia.models import Item, Property, Statement
+from pecunia.autocomplete import autocomplete_index
+from pecunia.entity_cache import EntityJsonCache, make_etag
+from pecunia.models import Item, Property, Statement, Backlink
+from pecunia.pagination import DisplayIdCursorPagination, iter_keyed_json, parse_positive_int, STREAM_CHUNK_SIZE
+from pecunia.search import TermSearch
 from pecunia.serializers import ItemSerializer, PropertySerializer, StatementSerializer
+from pecunia.snapshot import EntitySnapshot
+from pecunia.usage import PropertyUsageBrowser, MAX_PAGE_SIZE
 
+DEFAULT_PAGE_SIZE = 25
 
-class ItemViewSet(viewsets.ModelViewSet):
-    queryset = Item.objects.all().order_by('display_id')
-    serializer_class = ItemSerializer
-    permission_classes = [permissions.IsAuthenticated]
-    lookup_field = 'display_id'
+
+class EntityViewSetMixin:
+    """
+    Lists the entities as a dict keyed by display id, page by page (see DisplayIdCursorPagination), or all of them
+    streamed chunk by chunk with ?stream=1.
+    With ?label_like=, only the entities with a matching label or alias are listed (see TermSearch): the best
+    matches first, up to ?limit=, or all of them when streamed.
+    The related objects read by the serializer are prefetched according to the requested fields, and retrieved
+    entities are cached by revision.
+    """
+    pagination_class = DisplayIdCursorPagination
+    # Actions whose queryset is prefetched according to the fields of the serializer.
+    planned_actions = ('list', 'retrieve')
+    # Cache-Control directives of the responses, by action. Responses depend on the user, so they are private.
+    cache_control = {
+        'list': {'private': True, 'no_cache': True},
+        'retrieve': {'private': True, 'no_cache': True},
+    }
+    stream_chunk_size = STREAM_CHUNK_SIZE
+    search_query_param = 'label_like'
 
     def get_queryset(self):
-        qs = super().get_queryset()
+        queryset = super().get_queryset()
+        if self.action in self.planned_actions:
+            queryset = self.get_serializer().plan_queryset(queryset)
+        return queryset
 
-        query_params = self.request.query_params
-        if 'label_like' in query_params:
-            qs = qs.filter(labels__text__contains=query_params.get('label_like'))
-        return qs
+    def filter_queryset(self, queryset):
+        query = self.request.query_params.get(self.search_query_param)
+        if query is not None:
+            queryset = TermSearch().filter(queryset, query)
+        return super().filter_queryset(queryset)
 
-    def list(self, request, *args, **kwargs):
+    def retrieve(self, request, *args, **kwargs):
         """
-        Transforme la liste en dict avec clé Q<display_id>.
+        Serves the serialized entity from the entity cache as long as its revision is unchanged, so that retrieving an
+        unchanged entity costs one indexed query and one cache read.
+        Conditional requests (If-None-Match, If-Modified-Since) are answered with 304 before any serialization.
         """
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
-        data = serializer.data
+        try:
+            display_id = int(kwargs[self.lookup_field])
+        except (ValueError, TypeError):
+            raise Http404(f"Invalid {self.queryset.model._meta.object_name} id.")
+        row = (self.queryset.model.objects.filter(display_id=display_id)
+               .values_list('revision', 'modified').first())
+        if row is None:
+            raise Http404(f"No {self.queryset.model._meta.object_name} matches the given query.")
+        revision, modified = row
+        entity_id = f'{self.entity_prefix}{display_id}'
+        serializer = self.get_serializer()
+        validators = {
+            'etag': make_etag(entity_id, revision, serializer.fields, request.accepted_renderer.format),
+            'last_modified': int(modified.timestamp()) if modified else None,
+        }
+        response = get_conditional_response(request, **validators)
+        if response is None:
+            data = EntityJsonCache().get_or_set(entity_id, revision, serializer.fields,
+                                                lambda: self.get_serializer(self.get_object()).data)
+            response = Response(data)
+        response.headers['ETag'] = validators['etag']
+        if modified:
+            response.headers['Last-Modified'] = http_date(validators['last_modified'])
+        return response
 
-        # Transformer la liste en dict préfixé
-        prefixed_data = {item['id'] : item for item in data}
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if request.method == 'GET' and response.status_code in (200, 304) and self.action in self.cache_control:
+            patch_cache_control(response, **self.cache_control[self.action])
+        return response
 
-        return Response(prefixed_data)
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        if request.query_params.get('stream') in ('1', 'true'):
+            chunks = iter_keyed_json(queryset, lambda objs: self.get_serializer(objs, many=True).data,
+                                     chunk_size=self.stream_chunk_size)
+            return StreamingHttpResponse(chunks, content_type='application/json')
+        query = request.query_params.get(self.search_query_param)
+        if query is not None:
+            limit = parse_positive_int(request.query_params.get(self.paginator.page_size_query_param),
+                                       self.paginator.page_size, self.paginator.max_page_size)
+            serializer = self.get_serializer(TermSearch().search(queryset, query, limit), many=True)
+            return Response({item['id']: item for item in serializer.data})
+        serializer = self.get_serializer(self.paginate_queryset(queryset), many=True)
+        return self.get_paginated_response({item['id']: item for item in serializer.data})
 
 
-class PropertyViewSet(viewsets.ModelViewSet):
-    queryset = Property.objects.all().order_by('display_id')
-    serializer_class = PropertySerializer
+class ItemViewSet(EntityViewSetMixin, viewsets.ModelViewSet):
+    queryset = Item.objects.all().order_by('display_id')
+    serializer_class = ItemSerializer
     permission_classes = [permissions.IsAuthenticated]
     lookup_field = 'display_id'
+    entity_prefix = 'Q'
+    # Retrieved items are loaded by EntitySnapshot.
+    planned_actions = ('list',)
 
-    def get_queryset(self):
-        qs = super().get_queryset()
-
-        query_params = self.request.query_params
-        if 'label_like' in query_params:
-            qs = qs.filter(labels__text__contains=query_params.get('label_like'))
-        return qs
+    def get_object(self):
+        item = super().get_object()
+        if self.action == 'retrieve':
+            EntitySnapshot.load(item)
+        return item
 
-    def list(self, request, *args, **kwargs):
+    @action(detail=True)
+    def backlinks(self, request, display_id=None):
         """
-        Transforme la liste en dict avec clé Q<display_id>.
+        Lists the snaks using this item as value, page by page.
         """
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
-        data = serializer.data
+        links = (Backlink.objects.filter(target=self.get_object()).order_by('source_id', 'snak_id')
+                 .values_list('source__describedentity__item__display_id',
+                              'source__describedentity__property__display_id',
+                              'snak__property__display_id', 'role'))
+        limit = parse_positive_int(request.query_params.get('limit'), DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+        page = Paginator(links, limit).get_page(request.query_params.get('page'))
+        return Response({
+            'count': page.paginator.count,
+            'page': page.number,
+            'num_pages': page.paginator.num_pages,
+            'results': [{'source': f'Q{item_id}' if item_id is not None else f'P{property_id}',
+                         'property': f'P{snak_property_id}',
+                         'role': Backlink.Role(role).label}
+                        for item_id, property_id, snak_property_id, role in page],
+        })
 
-        # Transformer la liste en dict préfixé
-        prefixed_data = {item['id'] : item for item in data}
 
-        return Response(prefixed_data)
+class PropertyViewSet(EntityViewSetMixin, viewsets.ModelViewSet):
+    queryset = Property.objects.all().order_by('display_id')
+    serializer_class = PropertySerializer
+    permission_classes = [permissions.IsAuthenticated]
+    lookup_field = 'display_id'
+    entity_prefix = 'P'
+    # Properties change seldom, and the schema editor reads them on every interaction.
+    cache_control = EntityViewSetMixin.cache_control | {'retrieve': {'private': True, 'max_age': 60}}
+
+    @action(detail=True)
+    def usage(self, request, display_id=None):
+        """
+        Lists the subjects of the statements using this property, page by page, with its most used values.
+        The next page is requested with the cursor returned as 'next'.
+        """
+        page = PropertyUsageBrowser(self.get_object()).get_page(
+            parse_positive_int(request.query_params.get('after')),
+            parse_positive_int(request.query_params.get('limit'), DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+        )
+        return Response({
+            'count': page.count,
+            'next': page.next_cursor,
+            'results': [{'statement': statement_id, 'subject': str(subject)}
+                        for statement_id, subject in page.subjects],
+            'top_values': [{'value': str(value), 'count': count} for value, count in page.top_values],
+        })
 
 
 class StatementViewSet(viewsets.ModelViewSet):
     queryset = Statement.objects.all()
     serializer_class = StatementSerializer
     permission_classes = [permissions.IsAuthenticated]
+
+
+class EntitiesApiView(APIView):
+    """
+    Returns several items and properties at once, like Wikibase's wbgetentities.
+    Parameters: ids, e.g. Q1|Q2|P5; props, among labels, descriptions, aliases, claims and datatype (all by default);
+    languages, the languages of the terms to return (all by default).
+    The entities are loaded with a constant number of queries whatever their number, which is bounded by
+    MAX_ENTITIES.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    MAX_ENTITIES = 50
+    # Optional fields of each serializer, by name of the matching 'props' value.
+    PROPS = {
+        'labels': 'labels',
+        'descriptions': 'descriptions',
+        'aliases': 'aliases',
+        'claims': 'claims',
+        'datatype': 'type',
+    }
+    TERMS = ('labels', 'descriptions', 'aliases')
+
+    def get(self, request):
+        ids = self._split(request.query_params.get('ids'))
+        if not ids:
+            raise ValidationError({'ids': "At least one entity id is required."})
+        if len(ids) > self.MAX_ENTITIES:
+            raise ValidationError({'ids': f"At most {self.MAX_ENTITIES} entities can be requested at once."})
+        display_ids = {'Q': set(), 'P': set()}
+        for entity_id in ids:
+            if entity_id[:1] not in display_ids or not entity_id[1:].isdigit():
+                raise ValidationError({'ids': f"Invalid entity id '{entity_id}'."})
+            display_ids[entity_id[0]].add(int(entity_id[1:]))
+        props = set(self._split(request.query_params.get('props')) or self.PROPS)
+        unknown = props - self.PROPS.keys()
+        if unknown:
+            raise ValidationError({'props': f"Unknown props: {', '.join(sorted(unknown))}."})
+        languages = set(self._split(request.query_params.get('languages')))
+
+        found = {}
+        for prefix, model, serializer_class in (('Q', Item, ItemSerializer), ('P', Property, PropertySerializer)):
+            if display_ids[prefix]:
+                found |= self._serialize(serializer_class, model.objects.filter(display_id__in=display_ids[prefix]),
+                                         {self.PROPS[prop] for prop in props}, languages)
+        return Response({'entities': {entity_id: found.get(entity_id, {'id': entity_id, 'missing': ''})
+                                      for entity_id in ids}})
+
+    def _serialize(self, serializer_class, queryset, fields: set[str], languages: set[str]) -> dict[str, dict]:
+        serializer = serializer_class(context={})
+        for name in list(serializer.fields):
+            if name in self.PROPS.values() and name not in fields:
+                serializer.fields.pop(name)
+        entities = {}
+        for entity in serializer.plan_queryset(queryset):
+            data = serializer.to_representation(entity)
+            if languages:
+                for kind in self.TERMS:
+                    if kind in data:
+                        data[kind] = {language: term for language, term in data[kind].items() if language in languages}
+            entities[data['display_id']] = data
+        return entities
+
+    @staticmethod
+    def _split(value: str | None) -> list[str]:
+        return list(dict.fromkeys(part for part in (value or '').split('|') if part))
+
+
+class SearchApiView(APIView):
+    """
+    Searches items or properties by prefix of their labels and aliases, like Wikibase's wbsearchentities, from the
+    in-memory index of the process (see AutocompleteIndex).
+    Parameters: search; type, item (default) or property; language, the language of the terms to search and of the
+    labels and descriptions to return (all by default); limit (at most MAX_LIMIT).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    DEFAULT_LIMIT = 10
+    MAX_LIMIT = 50
+    TYPES = ('item', 'property')
+
+    def get(self, request):
+        search = request.query_params.get('search', '')
+        if not search.strip():
+            raise ValidationError({'search': "A search string is required."})
+        kind = request.query_params.get('type', 'item')
+        if kind not in self.TYPES:
+            raise ValidationError({'type': f"Type must be one of {', '.join(self.TYPES)}."})
+        limit = parse_positive_int(request.query_params.get('limit'), self.DEFAULT_LIMIT, self.MAX_LIMIT)
+        matches = autocomplete_index.search(search, kind, request.query_params.get('language') or None, limit)
+        return Response({
+            'searchinfo': {'search': search},
+            'search': [{
+                'id': str(match.ref),
+                'display_id': match.ref.display_id,
+                'label': match.label,
+                'description': match.description,
+                'match': {'type': match.match_type, 'language': match.match_language, 'text': match.match_text},
+            } for match in matches],
+        })
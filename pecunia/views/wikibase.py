@@ -1,7 +1,6 @@
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.core.exceptions import ObjectDoesNotExist
 from django.core.paginator import Paginator
-from django.db.models import Q
 from django.http import Http404
 from django.shortcuts import redirect
 from django.urls import reverse, reverse_lazy
@@ -9,7 +8,12 @@ from django.views.generic import DetailView, FormView, TemplateView
 
 import pecunia.models as m
 from pecunia.forms import ItemLabelDescriptionForm, PropertyLabelDescriptionForm
-from pecunia.models import PropertyMapping, ItemMapping
+from pecunia.labels import label_resolver
+from pecunia.models import ItemMapping
+from pecunia.pagination import parse_positive_int
+from pecunia.snapshot import EntitySnapshot
+from pecunia.statement_map import StatementMap
+from pecunia.usage import PropertyUsageBrowser, MAX_PAGE_SIZE
 
 DEFAULT_PAGINATOR_LIMIT = 25
 
@@ -20,10 +24,12 @@ class ModelDashboardView(TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         items = self.model.objects.all().order_by('display_id')
-        paginator = Paginator(items, self.request.GET.get("limit") or DEFAULT_PAGINATOR_LIMIT)
+        paginator = Paginator(items, parse_positive_int(self.request.GET.get("limit"), DEFAULT_PAGINATOR_LIMIT,
+                                                        MAX_PAGE_SIZE))
 
         page_number = self.request.GET.get("page")
         page_obj = paginator.get_page(page_number)
+        label_resolver.register(page_obj)
 
         context['page_obj'] = page_obj
         return context
@@ -31,6 +37,8 @@ class ModelDashboardView(TemplateView):
 
 class InstanceDashboardView(TemplateView):
     item_mapping_key = None
+    # Whether the template reads the statements of the listed items, which are then loaded for the whole page.
+    load_statements = False
 
     def dispatch(self, request, *args, **kwargs):
         if not ItemMapping.has(self.item_mapping_key):
@@ -39,19 +47,17 @@ class InstanceDashboardView(TemplateView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        items = m.Item.objects.filter(m.instance_of_q(ItemMapping.get(self.item_mapping_key))) \
+            .distinct().order_by('display_id')
+        paginator = Paginator(items, parse_positive_int(self.request.GET.get("limit"), DEFAULT_PAGINATOR_LIMIT,
+                                                        MAX_PAGE_SIZE))
 
-        items = m.Item.objects.all()
-        result = []
-        is_a_prop = PropertyMapping.get('is_a')
-        item_mapping = ItemMapping.get(self.item_mapping_key)
-        for item in items:
-            if not item.statements.exists():
-                continue
-            if item.statements.filter(mainsnak__property=is_a_prop,
-                                      mainsnak__value=item_mapping).exists():
-                result.append(item)
-
-        context['items'] = result
+        page_number = self.request.GET.get("page")
+        page_obj = paginator.get_page(page_number)
+        label_resolver.register(page_obj)
+
+        context['page_obj'] = page_obj
+        context['items'] = StatementMap.load_many(page_obj) if self.load_statements else page_obj
         return context
 
 
@@ -69,23 +75,19 @@ class ItemDisplay(TemplateView):
         item = m.Item.objects.get(display_id=self.kwargs['display_id'])
         context['item'] = item
 
-        props = m.Property.objects.filter(using_as_property_snaks__used_in_statement__subject=item).distinct()
-        statements = [(prop, item.statements.filter(mainsnak__property=prop)) for prop in props]
-        prop_order = ({m.PropertyMapping.get('is_a'): -1} |
-                      {pop.prop: pop.ordering
-                       for pop in m.PropertyOrderPreference.objects.filter(
-                          item__using_as_value_snaks__property=m.PropertyMapping.get('is_a'),
-                          item__using_as_value_snaks__used_in_statement__subject=item)}
-                      )
+        snapshot = EntitySnapshot.load(item)
+        is_a = m.PropertyMapping.get('is_a')
+        classes = [statement.mainsnak.value for statement in snapshot.claims.get(is_a.pk, [])
+                   if statement.mainsnak.type == m.PropertySnak.Type.VALUE]
+        prop_order = ({is_a.pk: -1} |
+                      {pop.prop_id: pop.ordering
+                       for pop in m.PropertyOrderPreference.objects.filter(item__in=classes)})
+        context['statements'] = snapshot.get_statement_groups(prop_order)
 
-        max_value = max(prop_order.values()) + 1
-        context['statements'] = sorted(statements, key=lambda x: prop_order.get(x[0], max_value))
-
-        context['linked_items'] = m.Item.objects.filter(
-            Q(statements__mainsnak__value=item) |
-            Q(statements__qualifiers__snak__value=item) |
-            Q(statements__reference_records__snaks__snak__value=item)
-        ).distinct()
+        linked_items = m.Item.objects.filter(outgoing_links__target=item).distinct().order_by('display_id')
+        paginator = Paginator(linked_items, parse_positive_int(self.request.GET.get("linked_limit"),
+                                                               DEFAULT_PAGINATOR_LIMIT, MAX_PAGE_SIZE))
+        context['linked_items'] = paginator.get_page(self.request.GET.get("linked_page"))
 
         return context
 
@@ -183,16 +185,10 @@ class PropertyDisplay(DetailView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        try:
-            prop = kwargs['object']
-            stmts = m.Statement.objects.filter(mainsnak__property=prop)
-            linked_items = []
-            for stmt in stmts:
-                linked_items.append(stmt.subject.display_id)
-            context['linked_items'] = sorted(linked_items)
-        except ObjectDoesNotExist as e:
-            raise Http404 from e
-
+        context['usage'] = PropertyUsageBrowser(kwargs['object']).get_page(
+            parse_positive_int(self.request.GET.get("after")),
+            parse_positive_int(self.request.GET.get("limit"), DEFAULT_PAGINATOR_LIMIT, MAX_PAGE_SIZE)
+        )
         return context
 
 